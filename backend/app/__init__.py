@@ -1,6 +1,6 @@
 from .api import api_router
 from .core.config import settings
 from .db.base import Base
-from .models import event, machine, user  # noqa: F401
+from .models import change_log, event, machine, revision, user  # noqa: F401
 
 __all__ = ["api_router", "settings", "Base"]
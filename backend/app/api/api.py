@@ -1,8 +1,13 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import events, machines, auth
+from app.api.endpoints import changes, events, executions, ingest, machines, auth, metrics, transfer
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(machines.router, prefix="/machines", tags=["machines"])
 api_router.include_router(events.router, prefix="/events", tags=["events"])
+api_router.include_router(executions.router, prefix="/executions", tags=["executions"])
+api_router.include_router(ingest.router, prefix="/ingest", tags=["ingest"])
+api_router.include_router(changes.router, prefix="/changes", tags=["changes"])
+api_router.include_router(transfer.router, tags=["transfer"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
@@ -0,0 +1,63 @@
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Type, TypeVar
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+
+from app.core.config import settings
+from app.schemas.bulk import BulkItemResult
+
+SchemaType = TypeVar("SchemaType", bound=BaseModel)
+
+# Holder of a key claimed by a row that doesn't have an id yet
+_NEW_ROW = object()
+
+def check_batch_size(items: List[Any]) -> None:
+    if len(items) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.BULK_MAX_ITEMS} items per bulk request",
+        )
+
+def error(index: int, detail: Any, id: Optional[str] = None) -> BulkItemResult:
+    return BulkItemResult(index=index, id=id, status="error", detail=detail)
+
+def validate_items(
+    items: List[Dict[str, Any]], schema: Type[SchemaType]
+) -> Tuple[List[Tuple[int, SchemaType]], List[Optional[BulkItemResult]]]:
+    """
+    Validate each raw item on its own so one bad item doesn't fail the batch.
+
+    Returns the valid items with their request index, and a results list with
+    the validation errors already filled in.
+    """
+    valid: List[Tuple[int, SchemaType]] = []
+    results: List[Optional[BulkItemResult]] = [None] * len(items)
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema.model_validate(item)))
+        except ValidationError as exc:
+            results[index] = error(
+                index, exc.errors(include_url=False, include_context=False)
+            )
+    return valid, results
+
+class UniqueKeys:
+    """
+    Who holds each value of a unique field (a machine's IP and port, an
+    event's name) while a batch is checked.
+
+    Starts from the rows already in the database and records every value
+    the batch takes, so an item collides with existing rows and with the
+    items before it, but not with the row it updates.
+    """
+
+    def __init__(self, owners: Dict[Hashable, str]):
+        self._holders: Dict[Hashable, Any] = dict(owners)
+
+    def claim(self, key: Hashable, id: Optional[str] = None) -> bool:
+        """Take `key` for row `id` (None for a new row); False if another row holds it"""
+        holder = self._holders.get(key)
+        if holder is not None and (id is None or holder != id):
+            return False
+        self._holders[key] = _NEW_ROW if id is None else id
+        return True
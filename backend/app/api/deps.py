@@ -1,13 +1,20 @@
-from typing import Generator
+import time
+from typing import AsyncGenerator, Generator
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
-from app.db.base import SessionLocal
+from app.db.session import AsyncSessionLocal, SessionLocal
 from app.core.config import settings
+from app.core.principal_cache import principal_cache
+from app.engine.history import HistoryBuffer, history_buffer
+from app.engine.ingest import IngestPipeline, ingest_pipeline
+from app.engine.runtime import ExecutionRuntime, execution_runtime
+from app.engine.series import TimeSeriesStore, series_store
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/login/access-token")
@@ -20,10 +27,36 @@ def get_db() -> Generator:
     finally:
         db.close()
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
+def get_execution_runtime() -> ExecutionRuntime:
+    """Dependency that provides the event execution runtime"""
+    return execution_runtime
+
+def get_execution_history() -> HistoryBuffer:
+    """Dependency that provides the execution history write buffer"""
+    return history_buffer
+
+def get_ingest_pipeline() -> IngestPipeline:
+    """Dependency that provides the telemetry ingest pipeline"""
+    return ingest_pipeline
+
+def get_series_store() -> TimeSeriesStore:
+    """Dependency that provides the in-memory channel history"""
+    return series_store
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency that provides an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)
 ) -> models.User:
     """Get the current user from the token"""
+    principal = principal_cache.get(token)
+    if principal is not None:
+        # Detached copy so a cached principal never touches the request session
+        return models.User(**principal)
+    started = time.perf_counter()
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
@@ -34,12 +67,18 @@ def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = crud.user.get(db, id=token_data.sub)
+    # Read before the user so a change committed meanwhile isn't cached
+    generation = principal_cache.generation(token_data.sub)
+    user = await crud.async_user.get(db, id=token_data.sub)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    principal_cache.observe_load(time.perf_counter() - started)
+    principal_cache.set(
+        token, user.to_dict(), expires_at=payload.get("exp"), generation=generation
+    )
     return user
 
-def get_current_active_user(
+async def get_current_active_user(
     current_user: models.User = Depends(get_current_user),
 ) -> models.User:
     """Check if the current user is active"""
@@ -47,7 +86,7 @@ def get_current_active_user(
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-def get_current_active_superuser(
+async def get_current_active_superuser(
     current_user: models.User = Depends(get_current_user),
 ) -> models.User:
     """Check if the current user is a superuser"""
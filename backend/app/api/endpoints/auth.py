@@ -3,27 +3,39 @@ from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
 from app.core import security
 from app.core.config import settings
-from app.core.security import get_password_hash
+from app.core.hashing import HashingPoolBusy
 from app.schemas.token import Token
 
 router = APIRouter()
 
+def _hashing_pool_busy(exc: HashingPoolBusy) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent logins, please retry shortly",
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 @router.post("/login/access-token", response_model=schemas.Token)
-def login_access_token(
-    db: Session = Depends(deps.get_db), form_data: OAuth2PasswordRequestForm = Depends()
+async def login_access_token(
+    db: AsyncSession = Depends(deps.get_async_db),
+    form_data: OAuth2PasswordRequestForm = Depends(),
 ) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    user = crud.user.authenticate(
-        db, email=form_data.username, password=form_data.password
-    )
+    try:
+        user = await crud.async_user.authenticate(
+            db, email=form_data.username, password=form_data.password
+        )
+    except HashingPoolBusy as exc:
+        raise _hashing_pool_busy(exc)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -61,5 +73,8 @@ def create_user(
             status_code=400,
             detail="The user with this email already exists in the system.",
         )
-    user = crud.user.create(db, obj_in=user_in)
+    try:
+        user = crud.user.create(db, obj_in=user_in)
+    except HashingPoolBusy as exc:
+        raise _hashing_pool_busy(exc)
     return user
@@ -0,0 +1,55 @@
+from typing import Any, AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, models
+from app.api import deps, ndjson
+from app.core.config import settings
+
+router = APIRouter()
+
+@router.get("/")
+async def read_changes(
+    since: int = Query(0, ge=0),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Stream what changed in machines and events after revision `since`.
+
+    The body is NDJSON, one line per changed row: `revision`, `table`, `id`,
+    `op` ("upsert" or "delete") and, for upserts, the row's current `data`.
+    The `X-Change-Revision` header is the revision the stream runs up to;
+    pass it back as `since` on the next sync.
+
+    Old entries are pruned: a `since` below the pruned revision answers 410,
+    and the client has to reload the listings and continue from the
+    revision in that response's `X-Change-Revision` header.
+    """
+    floor = await crud.async_change_log.get_floor(db)
+    head = await crud.async_change_log.get_head(db)
+    if since < floor:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Changes since this revision were pruned; resync from the listings",
+            headers={"X-Change-Revision": str(head)},
+        )
+
+    async def stream() -> AsyncIterator[bytes]:
+        cursor = since
+        while cursor < head:
+            changes, cursor = await crud.async_change_log.get_since(
+                db, since=cursor, until=head, limit=settings.CHANGES_PAGE_SIZE
+            )
+            if cursor is None:
+                break
+            for change in changes:
+                yield ndjson.line(change)
+
+    return StreamingResponse(
+        stream(),
+        media_type=ndjson.MEDIA_TYPE,
+        headers={"X-Change-Revision": str(head)},
+    )
@@ -1,55 +1,227 @@
-from typing import Any, List
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, models, schemas
-from app.api import deps
+from app.api import bulk, deps, etag, responses
+from app.crud.pagination import InvalidCursor
 
 router = APIRouter()
 
 @router.get("/", response_model=List[schemas.Event])
-def read_events(
-    db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+async def read_events(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    machine_id: Optional[str] = None,
+    fast: bool = False,
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    Retrieve events.
+    Retrieve events, optionally only those bound to one machine.
+
+    Pages are keyed on id: pass the `X-Next-Cursor` response header back as
+    `cursor` to fetch the next one. `skip` still works but gets slower the
+    deeper it goes. `fast=true` returns the same fields encoded straight from
+    database rows, skipping per-row model validation.
+
+    Responses carry an `ETag` that changes whenever the table does; send it
+    back in `If-None-Match` to get a 304 instead of the listing.
     """
-    events = crud.event.get_multi(db, skip=skip, limit=limit)
+    tag = etag.etag_for(
+        models.Event.__tablename__, await crud.async_event.get_revision(db)
+    )
+    cached = etag.not_modified(request, tag)
+    if cached:
+        return cached
+    response.headers["ETag"] = tag
+    try:
+        if fast:
+            fields = responses.schema_fields(schemas.Event)
+            rows, next_cursor = await crud.async_event.get_rows(
+                db,
+                fields=fields,
+                cursor=cursor,
+                skip=skip,
+                limit=limit,
+                filters={"machine_id": machine_id} if machine_id else None,
+            )
+            headers = {"ETag": tag}
+            if next_cursor:
+                headers["X-Next-Cursor"] = next_cursor
+            return responses.fast_list_response(fields, rows, headers=headers)
+        if skip and not cursor:
+            if machine_id:
+                return await crud.async_event.get_multi_by_machine(
+                    db, machine_id=machine_id, skip=skip, limit=limit
+                )
+            return await crud.async_event.get_multi(db, skip=skip, limit=limit)
+        if machine_id:
+            events, next_cursor = await crud.async_event.get_page_by_machine(
+                db, machine_id=machine_id, cursor=cursor, limit=limit
+            )
+        else:
+            events, next_cursor = await crud.async_event.get_page(
+                db, cursor=cursor, limit=limit
+            )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return events
 
 @router.post("/", response_model=schemas.Event)
-def create_event(
+async def create_event(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     event_in: schemas.EventCreate,
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Create new event.
     """
-    event = crud.event.get_by_name(db, name=event_in.name)
+    event = await crud.async_event.get_by_name(db, name=event_in.name)
     if event:
         raise HTTPException(
             status_code=400,
             detail="An event with this name already exists in the system.",
         )
-    event = crud.event.create(db=db, obj_in=event_in)
+    event = await crud.async_event.create(db=db, obj_in=event_in)
     return event
 
+@router.post("/bulk", response_model=List[schemas.BulkItemResult])
+async def create_events_bulk(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    events_in: List[Dict[str, Any]],
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Create many events in one transaction.
+
+    Each item is validated and checked for a duplicate name and an unknown
+    machine on its own; the ones that pass are inserted together. Results come
+    back per item, in request order.
+    """
+    bulk.check_batch_size(events_in)
+    valid, results = bulk.validate_items(events_in, schemas.EventCreate)
+    taken = await crud.async_event.get_existing_names(
+        db, names=[e.name for _, e in valid]
+    )
+    machine_ids = await crud.async_machine.get_existing_ids(
+        db, ids={e.machine_id for _, e in valid if e.machine_id}
+    )
+    to_create = []
+    for index, event_in in valid:
+        if event_in.name in taken:
+            results[index] = bulk.error(
+                index, "An event with this name already exists in the system."
+            )
+            continue
+        if event_in.machine_id and event_in.machine_id not in machine_ids:
+            results[index] = bulk.error(index, "Machine not found")
+            continue
+        taken.add(event_in.name)
+        to_create.append((index, event_in))
+    ids = await crud.async_event.create_multi(
+        db, objs_in=[event_in for _, event_in in to_create]
+    )
+    for (index, _), event_id in zip(to_create, ids):
+        results[index] = schemas.BulkItemResult(index=index, id=event_id, status="created")
+    return results
+
+@router.put("/bulk", response_model=List[schemas.BulkItemResult])
+async def update_events_bulk(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    events_in: List[Dict[str, Any]],
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Update many events in one transaction. Every item needs an `id`.
+
+    Renaming an event to a name another event, or an earlier item, already
+    holds is rejected like a duplicate on create.
+    """
+    bulk.check_batch_size(events_in)
+    valid, results = bulk.validate_items(events_in, schemas.EventBulkUpdate)
+    taken = bulk.UniqueKeys(
+        await crud.async_event.get_name_owners(
+            db, names=[e.name for _, e in valid if e.name is not None]
+        )
+    )
+    machine_ids = await crud.async_machine.get_existing_ids(
+        db, ids={e.machine_id for _, e in valid if e.machine_id}
+    )
+    to_update = []
+    for index, event_in in valid:
+        if event_in.machine_id and event_in.machine_id not in machine_ids:
+            results[index] = bulk.error(index, "Machine not found", id=event_in.id)
+            continue
+        if event_in.name is not None and not taken.claim(event_in.name, event_in.id):
+            results[index] = bulk.error(
+                index, "An event with this name already exists in the system.", id=event_in.id
+            )
+            continue
+        to_update.append((index, event_in))
+    updated = await crud.async_event.update_multi(
+        db,
+        objs_in=[
+            {"id": event_in.id, **event_in.model_dump(exclude_unset=True)}
+            for _, event_in in to_update
+        ],
+    )
+    for index, event_in in to_update:
+        if event_in.id in updated:
+            results[index] = schemas.BulkItemResult(
+                index=index, id=event_in.id, status="updated"
+            )
+        else:
+            results[index] = bulk.error(index, "Event not found", id=event_in.id)
+    return results
+
+@router.post("/bulk/delete", response_model=List[schemas.BulkItemResult])
+async def delete_events_bulk(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    event_ids: List[str],
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Delete many events in one statement.
+    """
+    bulk.check_batch_size(event_ids)
+    removed = await crud.async_event.remove_multi(db, ids=event_ids)
+    return [
+        schemas.BulkItemResult(index=index, id=event_id, status="deleted")
+        if event_id in removed
+        else bulk.error(index, "Event not found", id=event_id)
+        for index, event_id in enumerate(event_ids)
+    ]
+
 @router.get("/{event_id}", response_model=schemas.Event)
-def read_event(
+async def read_event(
+    request: Request,
+    response: Response,
     event_id: str,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    Get a specific event by id.
+    Get a specific event by id. Honours `If-None-Match` like the listing.
     """
-    event = crud.event.get(db, id=event_id)
+    tag = etag.etag_for(
+        models.Event.__tablename__, await crud.async_event.get_revision(db)
+    )
+    cached = etag.not_modified(request, tag)
+    if cached:
+        return cached
+    response.headers["ETag"] = tag
+    event = await crud.async_event.get(db, id=event_id)
     if not event:
         raise HTTPException(
             status_code=404, detail="Event not found"
@@ -57,9 +229,9 @@ def read_event(
     return event
 
 @router.put("/{event_id}", response_model=schemas.Event)
-def update_event(
+async def update_event(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     event_id: str,
     event_in: schemas.EventUpdate,
     current_user: models.User = Depends(deps.get_current_active_user),
@@ -67,36 +239,34 @@ def update_event(
     """
     Update an event.
     """
-    event = crud.event.get(db, id=event_id)
+    event = await crud.async_event.update_by_id(db, id=event_id, obj_in=event_in)
     if not event:
         raise HTTPException(
             status_code=404, detail="Event not found"
         )
-    event = crud.event.update(db, db_obj=event, obj_in=event_in)
     return event
 
 @router.delete("/{event_id}", response_model=schemas.Event)
-def delete_event(
+async def delete_event(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     event_id: str,
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Delete an event.
     """
-    event = crud.event.get(db, id=event_id)
+    event = await crud.async_event.remove_by_id(db, id=event_id)
     if not event:
         raise HTTPException(
             status_code=404, detail="Event not found"
         )
-    event = crud.event.remove(db=db, id=event_id)
     return event
 
 @router.post("/{event_id}/toggle", response_model=schemas.Event)
-def toggle_event(
+async def toggle_event(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     event_id: str,
     enabled: bool,
     current_user: models.User = Depends(deps.get_current_active_user),
@@ -104,10 +274,9 @@ def toggle_event(
     """
     Toggle an event's enabled status.
     """
-    event = crud.event.get(db, id=event_id)
+    event = await crud.async_event.toggle_by_id(db, id=event_id, enabled=enabled)
     if not event:
         raise HTTPException(
             status_code=404, detail="Event not found"
         )
-    event = crud.event.toggle_event(db, db_obj=event, enabled=enabled)
     return event
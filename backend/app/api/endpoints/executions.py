@@ -0,0 +1,164 @@
+from datetime import datetime, timezone
+from typing import Any, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, models, schemas
+from app.api import deps
+from app.engine.history import HistoryBuffer
+from app.engine.plan import PlanError
+from app.engine.runtime import RUNNING, ExecutionRuntime
+
+router = APIRouter()
+
+# lastStatus values the client knows, by execution status
+LAST_STATUS = {"completed": "success", "failed": "error", "stopped": "stopped"}
+
+def _utc(value: datetime) -> datetime:
+    # SQLite hands timestamps back without their (UTC) offset
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+@router.get("/", response_model=List[schemas.Execution])
+async def read_executions(
+    runtime: ExecutionRuntime = Depends(deps.get_execution_runtime),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Pending and running executions, followed by recently finished ones.
+    """
+    return [execution.to_dict() for execution in runtime.list()]
+
+@router.post("/", response_model=schemas.Execution, status_code=202)
+async def create_execution(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    runtime: ExecutionRuntime = Depends(deps.get_execution_runtime),
+    execution_in: schemas.ExecutionCreate,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Queue a run of an event, on the given machine or the event's own.
+
+    Returns at once with the execution as queued; progress is pushed as
+    `event_execution_started`, `event_execution_updated` and
+    `event_execution_completed` messages.
+    """
+    event = await crud.async_event.get(db, id=execution_in.event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if not event.enabled:
+        raise HTTPException(status_code=400, detail="Event is disabled")
+    machine_id = execution_in.machine_id or event.machine_id
+    machine = None
+    if machine_id is not None:
+        machine = await crud.async_machine.get(db, id=machine_id)
+        if not machine:
+            raise HTTPException(status_code=404, detail="Machine not found")
+    try:
+        execution = runtime.submit(
+            event,
+            machine_id=machine_id,
+            machine_type=machine.type if machine else None,
+            priority=execution_in.priority,
+        )
+    except PlanError as exc:
+        raise HTTPException(
+            status_code=400, detail={"path": exc.path, "message": exc.message}
+        )
+    return execution.to_dict()
+
+@router.get("/history", response_model=List[schemas.ExecutionRecord])
+async def read_execution_history(
+    db: AsyncSession = Depends(deps.get_async_db),
+    history: HistoryBuffer = Depends(deps.get_execution_history),
+    event_id: Optional[str] = None,
+    machine_id: Optional[str] = None,
+    before: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=500),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Finished executions, newest first, optionally of one event or on one
+    machine. Pass the last `startedAt` seen as `before` for the next page.
+    """
+    # Runs still waiting in the write buffer would be missing otherwise
+    pending = history.pending(event_id=event_id, machine_id=machine_id, before=before)
+    records = await crud.async_execution_history.get_recent(
+        db, event_id=event_id, machine_id=machine_id, before=before, limit=limit
+    )
+    rows = {record["id"]: record for record in pending}
+    for record in records:
+        rows.setdefault(record.id, dict(record.to_dict(), started_at=_utc(record.started_at)))
+    return sorted(rows.values(), key=lambda row: row["started_at"], reverse=True)[:limit]
+
+@router.get("/last-runs", response_model=List[schemas.LastRun])
+async def read_last_runs(
+    db: AsyncSession = Depends(deps.get_async_db),
+    runtime: ExecutionRuntime = Depends(deps.get_execution_runtime),
+    history: HistoryBuffer = Depends(deps.get_execution_history),
+    event_id: List[str] = Query(..., max_length=500),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    `lastRun` and `lastStatus` for each given event that has run. An event
+    with a run in progress reports "running".
+    """
+    wanted = set(event_id)
+    pending = [record for record in history.pending() if record["event_id"] in wanted]
+    records = await crud.async_execution_history.get_latest(db, event_ids=event_id)
+    last_runs = {
+        record.event_id: {
+            "event_id": record.event_id,
+            "last_run": _utc(record.started_at),
+            "last_status": LAST_STATUS.get(record.status, record.status),
+        }
+        for record in records.values()
+    }
+    # Oldest first, so the newest buffered run of an event wins
+    for record in reversed(pending):
+        last_run = last_runs.get(record["event_id"])
+        if last_run is None or record["started_at"] >= last_run["last_run"]:
+            last_runs[record["event_id"]] = {
+                "event_id": record["event_id"],
+                "last_run": record["started_at"],
+                "last_status": LAST_STATUS.get(record["status"], record["status"]),
+            }
+    for execution in runtime.list():
+        if execution.status == RUNNING and execution.event_id in wanted:
+            last_runs[execution.event_id] = {
+                "event_id": execution.event_id,
+                "last_run": execution.started_at,
+                "last_status": "running",
+            }
+    return [last_runs[id] for id in dict.fromkeys(event_id) if id in last_runs]
+
+@router.get("/{execution_id}", response_model=schemas.Execution)
+async def read_execution(
+    *,
+    runtime: ExecutionRuntime = Depends(deps.get_execution_runtime),
+    execution_id: str,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Get an execution by ID.
+    """
+    execution = runtime.get(execution_id)
+    if not execution:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    return execution.to_dict()
+
+@router.post("/{execution_id}/stop", response_model=schemas.Execution)
+async def stop_execution(
+    *,
+    runtime: ExecutionRuntime = Depends(deps.get_execution_runtime),
+    execution_id: str,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Stop a pending or running execution. Finished ones are returned as they are.
+    """
+    execution = await runtime.stop(execution_id)
+    if not execution:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    return execution.to_dict()
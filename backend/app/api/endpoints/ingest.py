@@ -0,0 +1,122 @@
+import hmac
+from typing import Any, List, Optional
+
+from fastapi import (
+    APIRouter, Depends, Header, HTTPException, Query, Request, WebSocket,
+    WebSocketDisconnect, status,
+)
+from pydantic import ValidationError
+
+from app.api import deps
+from app.core.config import settings
+from app.engine.ingest import IngestPipeline
+from app.schemas.ingest import Frame, FrameBatch
+
+router = APIRouter()
+
+
+def token_valid(token: Optional[str]) -> bool:
+    expected = settings.INGEST_TOKEN
+    return bool(expected) and token is not None and hmac.compare_digest(
+        token.encode(), expected.encode()
+    )
+
+
+def check_ingest_token(
+    x_ingest_token: Optional[str] = Header(None),
+    token: Optional[str] = Query(None),
+) -> None:
+    """Machines authenticate with the shared ingest token, not a user login"""
+    if not token_valid(x_ingest_token or token):
+        raise HTTPException(status_code=401, detail="Invalid ingest token")
+
+
+async def read_body(pipeline: IngestPipeline, request: Request) -> bytes:
+    """The request body, refused with 413 once it grows past the size limit"""
+    limit = settings.INGEST_MAX_BODY_MB * 1024 * 1024
+    length = request.headers.get("content-length", "")
+    chunks, size = [], 0
+    if not length.isdigit() or int(length) <= limit:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > limit:
+                break
+            chunks.append(chunk)
+        else:
+            return b"".join(chunks)
+    pipeline.rejected += 1
+    raise HTTPException(
+        status_code=413, detail=f"At most {settings.INGEST_MAX_BODY_MB} MB per batch"
+    )
+
+
+def parse_frames(pipeline: IngestPipeline, body: bytes) -> List[Frame]:
+    """Validate a JSON batch of frames; raises ValueError with the reason"""
+    try:
+        frames = FrameBatch.validate_json(body)
+    except ValidationError as exc:
+        pipeline.rejected += 1
+        errors = exc.errors(include_url=False, include_input=False, include_context=False)
+        raise ValueError(errors[:10])
+    if len(frames) > settings.INGEST_MAX_FRAMES:
+        pipeline.rejected += 1
+        raise ValueError(f"At most {settings.INGEST_MAX_FRAMES} frames per batch")
+    return frames
+
+
+@router.post("/", status_code=202, dependencies=[Depends(check_ingest_token)])
+async def ingest_frames(
+    request: Request,
+    pipeline: IngestPipeline = Depends(deps.get_ingest_pipeline),
+) -> Any:
+    """
+    Push a batch of telemetry frames.
+
+    The body is a JSON array of `[machine_id, timestamp, inputs, outputs]`
+    frames, e.g. `[["m1", 1700000000.1, {"temp": 21.5}, {"led": true}]]`.
+    Frames update the machines' live state in memory; nothing is written
+    per sample.
+    """
+    body = await read_body(pipeline, request)
+    try:
+        frames = parse_frames(pipeline, body)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=exc.args[0])
+    return {"accepted": pipeline.submit(frames)}
+
+
+@router.websocket("/ws")
+async def ingest_stream(
+    websocket: WebSocket,
+    pipeline: IngestPipeline = Depends(deps.get_ingest_pipeline),
+) -> None:
+    """
+    Stream of frame batches, one JSON array per message, over a single
+    connection. Invalid batches are answered with `{"error": ...}` and
+    skipped; nothing is sent back for accepted ones. A message over the
+    size limit closes the connection with 1009.
+    """
+    token = websocket.headers.get("x-ingest-token") or websocket.query_params.get("token")
+    if not token_valid(token):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    limit = settings.INGEST_MAX_MESSAGE_MB * 1024 * 1024
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            body = message.get("bytes") or message.get("text") or ""
+            if len(body) > limit:
+                pipeline.rejected += 1
+                await websocket.close(code=status.WS_1009_MESSAGE_TOO_BIG)
+                break
+            try:
+                frames = parse_frames(pipeline, body)
+            except ValueError as exc:
+                await websocket.send_json({"error": exc.args[0]})
+                continue
+            pipeline.submit(frames)
+    except WebSocketDisconnect:
+        pass
@@ -1,37 +1,83 @@
-from typing import Any, List
+import time
+from typing import Any, Dict, List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, models, schemas
-from app.api import deps
+from app.api import bulk, deps, etag, responses
+from app.crud.pagination import InvalidCursor
+from app.engine.series import TimeSeriesStore
 
 router = APIRouter()
 
+async def _etag(db: AsyncSession) -> str:
+    # Buffered statuses show in reads before a flush bumps the revision;
+    # the generation is read first so the tag can only lag the body
+    generation = crud.machine.status_buffer.generation
+    revision = await crud.async_machine.get_revision(db)
+    return etag.etag_for(models.Machine.__tablename__, revision, generation)
+
 @router.get("/", response_model=List[schemas.Machine])
-def read_machines(
-    db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+async def read_machines(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fast: bool = False,
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Retrieve machines.
+
+    Pages are keyed on id: pass the `X-Next-Cursor` response header back as
+    `cursor` to fetch the next one. `skip` still works but gets slower the
+    deeper it goes. `fast=true` returns the same fields encoded straight from
+    database rows, skipping per-row model validation.
+
+    Responses carry an `ETag` that changes whenever the table does; send it
+    back in `If-None-Match` to get a 304 instead of the listing.
     """
-    machines = crud.machine.get_multi(db, skip=skip, limit=limit)
+    tag = await _etag(db)
+    cached = etag.not_modified(request, tag)
+    if cached:
+        return cached
+    response.headers["ETag"] = tag
+    try:
+        if fast:
+            fields = responses.schema_fields(schemas.Machine)
+            rows, next_cursor = await crud.async_machine.get_rows(
+                db, fields=fields, cursor=cursor, skip=skip, limit=limit
+            )
+            headers = {"ETag": tag}
+            if next_cursor:
+                headers["X-Next-Cursor"] = next_cursor
+            return responses.fast_list_response(fields, rows, headers=headers)
+        if skip and not cursor:
+            return await crud.async_machine.get_multi(db, skip=skip, limit=limit)
+        machines, next_cursor = await crud.async_machine.get_page(
+            db, cursor=cursor, limit=limit
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return machines
 
 @router.post("/", response_model=schemas.Machine)
-def create_machine(
+async def create_machine(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     machine_in: schemas.MachineCreate,
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Create new machine.
     """
-    machine = crud.machine.get_by_ip_port(
+    machine = await crud.async_machine.get_by_ip_port(
         db, ip_address=machine_in.ip_address, port=machine_in.port
     )
     if machine:
@@ -39,19 +85,138 @@ def create_machine(
             status_code=400,
             detail="A machine with this IP and port already exists in the system.",
         )
-    machine = crud.machine.create(db=db, obj_in=machine_in)
+    machine = await crud.async_machine.create(db=db, obj_in=machine_in)
     return machine
 
+@router.post("/bulk", response_model=List[schemas.BulkItemResult])
+async def create_machines_bulk(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    machines_in: List[Dict[str, Any]],
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Create many machines in one transaction.
+
+    Each item is validated and checked for a duplicate IP and port on its own;
+    the ones that pass are inserted together. Results come back per item, in
+    request order.
+    """
+    bulk.check_batch_size(machines_in)
+    valid, results = bulk.validate_items(machines_in, schemas.MachineCreate)
+    taken = await crud.async_machine.get_existing_ip_ports(
+        db, ip_ports=[(m.ip_address, m.port) for _, m in valid]
+    )
+    to_create = []
+    for index, machine_in in valid:
+        key = (machine_in.ip_address, machine_in.port)
+        if key in taken:
+            results[index] = bulk.error(
+                index, "A machine with this IP and port already exists in the system."
+            )
+            continue
+        taken.add(key)
+        to_create.append((index, machine_in))
+    ids = await crud.async_machine.create_multi(
+        db, objs_in=[machine_in for _, machine_in in to_create]
+    )
+    for (index, _), machine_id in zip(to_create, ids):
+        results[index] = schemas.BulkItemResult(index=index, id=machine_id, status="created")
+    return results
+
+@router.put("/bulk", response_model=List[schemas.BulkItemResult])
+async def update_machines_bulk(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    machines_in: List[Dict[str, Any]],
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Update many machines in one transaction. Every item needs an `id`.
+
+    An item moving a machine to an IP and port another machine, or an
+    earlier item, already holds is rejected like a duplicate on create.
+    """
+    bulk.check_batch_size(machines_in)
+    valid, results = bulk.validate_items(machines_in, schemas.MachineBulkUpdate)
+    # A partial update may change only the IP or the port; the other half
+    # comes from the row as stored
+    current = await crud.async_machine.get_ip_ports_by_id(
+        db, ids=[m.id for _, m in valid if m.ip_address is not None or m.port is not None]
+    )
+    addresses = {}
+    for index, machine_in in valid:
+        if machine_in.id in current:
+            ip_address, port = current[machine_in.id]
+            addresses[index] = (
+                machine_in.ip_address if machine_in.ip_address is not None else ip_address,
+                machine_in.port if machine_in.port is not None else port,
+            )
+    taken = bulk.UniqueKeys(
+        await crud.async_machine.get_ip_port_owners(db, ip_ports=addresses.values())
+    )
+    to_update = []
+    for index, machine_in in valid:
+        if index in addresses and not taken.claim(addresses[index], machine_in.id):
+            results[index] = bulk.error(
+                index,
+                "A machine with this IP and port already exists in the system.",
+                id=machine_in.id,
+            )
+            continue
+        to_update.append((index, machine_in))
+    updated = await crud.async_machine.update_multi(
+        db,
+        objs_in=[
+            {"id": machine_in.id, **machine_in.model_dump(exclude_unset=True)}
+            for _, machine_in in to_update
+        ],
+    )
+    for index, machine_in in to_update:
+        if machine_in.id in updated:
+            results[index] = schemas.BulkItemResult(
+                index=index, id=machine_in.id, status="updated"
+            )
+        else:
+            results[index] = bulk.error(index, "Machine not found", id=machine_in.id)
+    return results
+
+@router.post("/bulk/delete", response_model=List[schemas.BulkItemResult])
+async def delete_machines_bulk(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    machine_ids: List[str],
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Delete many machines, and their events, in one statement.
+    """
+    bulk.check_batch_size(machine_ids)
+    removed = await crud.async_machine.remove_multi(db, ids=machine_ids)
+    return [
+        schemas.BulkItemResult(index=index, id=machine_id, status="deleted")
+        if machine_id in removed
+        else bulk.error(index, "Machine not found", id=machine_id)
+        for index, machine_id in enumerate(machine_ids)
+    ]
+
 @router.get("/{machine_id}", response_model=schemas.Machine)
-def read_machine(
+async def read_machine(
+    request: Request,
+    response: Response,
     machine_id: str,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    Get a specific machine by id.
+    Get a specific machine by id. Honours `If-None-Match` like the listing.
     """
-    machine = crud.machine.get(db, id=machine_id)
+    tag = await _etag(db)
+    cached = etag.not_modified(request, tag)
+    if cached:
+        return cached
+    response.headers["ETag"] = tag
+    machine = await crud.async_machine.get(db, id=machine_id)
     if not machine:
         raise HTTPException(
             status_code=404, detail="Machine not found"
@@ -59,9 +224,9 @@ def read_machine(
     return machine
 
 @router.put("/{machine_id}", response_model=schemas.Machine)
-def update_machine(
+async def update_machine(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     machine_id: str,
     machine_in: schemas.MachineUpdate,
     current_user: models.User = Depends(deps.get_current_active_user),
@@ -69,28 +234,65 @@ def update_machine(
     """
     Update a machine.
     """
-    machine = crud.machine.get(db, id=machine_id)
+    machine = await crud.async_machine.update_by_id(db, id=machine_id, obj_in=machine_in)
     if not machine:
         raise HTTPException(
             status_code=404, detail="Machine not found"
         )
-    machine = crud.machine.update(db, db_obj=machine, obj_in=machine_in)
     return machine
 
 @router.delete("/{machine_id}", response_model=schemas.Machine)
-def delete_machine(
+async def delete_machine(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     machine_id: str,
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Delete a machine.
     """
-    machine = crud.machine.get(db, id=machine_id)
+    machine = await crud.async_machine.remove_by_id(db, id=machine_id)
     if not machine:
         raise HTTPException(
             status_code=404, detail="Machine not found"
         )
-    machine = crud.machine.remove(db=db, id=machine_id)
     return machine
+
+@router.get("/{machine_id}/series/{channel}", response_model=schemas.ChannelSeries)
+async def read_machine_series(
+    machine_id: str,
+    channel: str,
+    start: Optional[float] = Query(None, alias="from", allow_inf_nan=False),
+    end: Optional[float] = Query(None, alias="to", allow_inf_nan=False),
+    points: int = Query(1000, ge=2, le=10000),
+    method: Literal["minmax", "lttb"] = "minmax",
+    db: AsyncSession = Depends(deps.get_async_db),
+    store: TimeSeriesStore = Depends(deps.get_series_store),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    History of one of a machine's inputs or outputs, downsampled to at most
+    `points` points for a chart. `from` and `to` are unix seconds and
+    default to the last hour.
+
+    `method=minmax` returns [time, min, max, avg] per time bucket, which
+    keeps spikes visible; `method=lttb` picks [time, value] samples with
+    Largest-Triangle-Three-Buckets. Long ranges are read from 1 s, 1 min or
+    1 h rollups rather than raw samples.
+    """
+    if not await crud.async_machine.get(db, id=machine_id):
+        raise HTTPException(status_code=404, detail="Machine not found")
+    end = time.time() if end is None else end
+    start = end - 3600 if start is None else start
+    if start >= end:
+        raise HTTPException(status_code=400, detail="`from` must be before `to`")
+    resolution, times, rows = await store.downsample(machine_id, channel, start, end, points, method)
+    return responses.FastJSONResponse({
+        "machineId": machine_id,
+        "channel": channel,
+        "from": start,
+        "to": end,
+        "method": method,
+        "resolution": resolution,
+        "points": np.column_stack((times, rows)).tolist(),
+    })
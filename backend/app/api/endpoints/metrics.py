@@ -0,0 +1,46 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+
+from app import crud, models
+from app.api import deps
+from app.core.hashing import hashing_pool
+from app.core.principal_cache import principal_cache
+from app.db.session import engine, pool_status
+from app.engine.cache import plan_cache
+from app.engine.connections import connection_manager
+from app.engine.dispatch import trigger_dispatcher
+from app.engine.history import history_buffer
+from app.engine.ingest import ingest_pipeline
+from app.engine.runtime import execution_runtime
+from app.engine.segments import segment_store
+from app.engine.series import series_store
+from app.engine.timers import timing_wheel
+from app.engine.triggers import trigger_index
+
+router = APIRouter()
+
+@router.get("/")
+def read_metrics(
+    current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    In-process cache and pool statistics.
+    """
+    return {
+        "principal_cache": principal_cache.stats(),
+        "hashing_pool": hashing_pool.stats(),
+        "db_pool": pool_status(engine),
+        "plan_cache": plan_cache.stats(),
+        "trigger_index": trigger_index.stats(),
+        "trigger_dispatch": trigger_dispatcher.stats(),
+        "timers": timing_wheel.stats(),
+        "executions": execution_runtime.stats(),
+        "execution_history": history_buffer.stats(),
+        "connections": connection_manager.stats(),
+        "machine_status_buffer": crud.machine.status_buffer.stats(),
+        "change_log": crud.change_log_retention.stats(),
+        "ingest": ingest_pipeline.stats(),
+        "series": series_store.stats(),
+        "segments": segment_store.stats(),
+    }
@@ -0,0 +1,217 @@
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, models, schemas
+from app.api import bulk, deps, ndjson
+from app.core.config import settings
+
+router = APIRouter()
+
+@router.get("/export")
+async def export_data(
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Stream every machine, with its events nested, as NDJSON.
+
+    Machine lines have `"kind": "machine"` and an `events` list; events not
+    bound to a machine follow as `"kind": "event"` lines. Rows are read in
+    batches from a server-side cursor, so memory use doesn't grow with the
+    size of the fleet. The output can be fed back to `POST /import`.
+    """
+    batch_size = settings.TRANSFER_BATCH_SIZE
+
+    async def stream() -> AsyncIterator[bytes]:
+        async for machines in crud.async_machine.stream_rows(db, batch_size=batch_size):
+            events = await crud.async_event.get_rows_by_machines(
+                db, machine_ids=[machine["id"] for machine in machines]
+            )
+            for machine in machines:
+                yield ndjson.line(
+                    {"kind": "machine", **machine, "events": events.get(machine["id"], [])}
+                )
+        async for unbound in crud.async_event.stream_rows(
+            db, batch_size=batch_size, filters={"machine_id": None}
+        ):
+            for event in unbound:
+                yield ndjson.line({"kind": "event", **event})
+
+    return StreamingResponse(
+        stream(),
+        media_type=ndjson.MEDIA_TYPE,
+        headers={"Content-Disposition": 'attachment; filename="mostwo-export.ndjson"'},
+    )
+
+class _Importer:
+    """Validates import records and writes them a batch at a time"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.machines: List[Tuple[int, schemas.MachineImport]] = []
+        self.events: List[Tuple[int, schemas.EventImport]] = []
+        self.pending = 0
+        self.created = {"machines": 0, "events": 0}
+        self.updated = {"machines": 0, "events": 0}
+        self.error_count = 0
+        self.errors: List[schemas.ImportLineError] = []
+
+    def error(self, line: int, detail: Any) -> None:
+        self.error_count += 1
+        if len(self.errors) < settings.IMPORT_MAX_ERRORS:
+            self.errors.append(schemas.ImportLineError(line=line, detail=detail))
+
+    def add(self, line: int, data: bytes) -> None:
+        try:
+            record = ndjson.loads(data)
+        except ValueError:
+            self.error(line, "Invalid JSON")
+            return
+        if not isinstance(record, dict):
+            self.error(line, "Expected a JSON object")
+            return
+        kind = record.pop("kind", None) or ("machine" if "ip_address" in record else "event")
+        try:
+            if kind == "machine":
+                machine_in = schemas.MachineImport.model_validate(record)
+                self.machines.append((line, machine_in))
+                self.pending += 1 + len(machine_in.events)
+            elif kind == "event":
+                self.events.append((line, schemas.EventImport.model_validate(record)))
+                self.pending += 1
+            else:
+                self.error(line, f"Unknown record kind {kind!r}")
+        except ValidationError as exc:
+            self.error(line, exc.errors(include_url=False, include_context=False))
+
+    async def flush(self) -> None:
+        machines, self.machines = self.machines, []
+        events, self.events = self.events, []
+        self.pending = 0
+        machine_ids = await self._write_machines(machines)
+        for line, machine_in in machines:
+            machine_id = machine_ids.get(line)
+            for event_in in machine_in.events:
+                if machine_id is None:
+                    self.error(line, f"Event {event_in.name!r} skipped with its machine")
+                    continue
+                event_in.machine_id = machine_id
+                events.append((line, event_in))
+        await self._write_events(events)
+
+    async def _write_machines(
+        self, machines: List[Tuple[int, schemas.MachineImport]]
+    ) -> Dict[int, str]:
+        """Upsert machines by id; returns the stored id per line"""
+        existing = await crud.async_machine.get_existing_ids(
+            self.db, ids=[m.id for _, m in machines if m.id]
+        )
+        taken = bulk.UniqueKeys(
+            await crud.async_machine.get_ip_port_owners(
+                self.db, ip_ports=[(m.ip_address, m.port) for _, m in machines]
+            )
+        )
+        ids: Dict[int, str] = {}
+        updates, creates = [], []
+        new_ids = set()
+        for line, machine_in in machines:
+            data = machine_in.model_dump(exclude={"events"})
+            update = machine_in.id in existing
+            if not update and machine_in.id in new_ids:
+                self.error(line, "Duplicate machine id in this import.")
+                continue
+            key = (machine_in.ip_address, machine_in.port)
+            if not taken.claim(key, machine_in.id if update else None):
+                self.error(line, "A machine with this IP and port already exists in the system.")
+                continue
+            if update:
+                updates.append(data)
+                ids[line] = machine_in.id
+                continue
+            if machine_in.id:
+                new_ids.add(machine_in.id)
+            creates.append((line, data))
+        created = await crud.async_machine.create_multi(
+            self.db, objs_in=[data for _, data in creates]
+        )
+        ids.update((line, machine_id) for (line, _), machine_id in zip(creates, created))
+        await crud.async_machine.update_multi(self.db, objs_in=updates)
+        self.created["machines"] += len(created)
+        self.updated["machines"] += len(updates)
+        return ids
+
+    async def _write_events(self, events: List[Tuple[int, schemas.EventImport]]) -> None:
+        existing = await crud.async_event.get_existing_ids(
+            self.db, ids=[e.id for _, e in events if e.id]
+        )
+        taken = bulk.UniqueKeys(
+            await crud.async_event.get_name_owners(self.db, names=[e.name for _, e in events])
+        )
+        machine_ids = await crud.async_machine.get_existing_ids(
+            self.db, ids={e.machine_id for _, e in events if e.machine_id}
+        )
+        updates, creates = [], []
+        new_ids = set()
+        for line, event_in in events:
+            if event_in.machine_id and event_in.machine_id not in machine_ids:
+                self.error(line, "Machine not found")
+                continue
+            data = event_in.model_dump()
+            update = event_in.id in existing
+            if not update and event_in.id in new_ids:
+                self.error(line, "Duplicate event id in this import.")
+                continue
+            if not taken.claim(event_in.name, event_in.id if update else None):
+                self.error(line, "An event with this name already exists in the system.")
+                continue
+            if update:
+                updates.append(data)
+                continue
+            if event_in.id:
+                new_ids.add(event_in.id)
+            creates.append(data)
+        created = await crud.async_event.create_multi(self.db, objs_in=creates)
+        await crud.async_event.update_multi(self.db, objs_in=updates)
+        self.created["events"] += len(created)
+        self.updated["events"] += len(updates)
+
+    def summary(self) -> schemas.ImportSummary:
+        return schemas.ImportSummary(
+            created=self.created,
+            updated=self.updated,
+            error_count=self.error_count,
+            errors=self.errors,
+        )
+
+@router.post("/import", response_model=schemas.ImportSummary)
+async def import_data(
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Load machines and events from an NDJSON upload, such as `GET /export`
+    produced.
+
+    The body is parsed line by line as it arrives and each record validated
+    on its own. Records are upserted by `id` and committed every
+    `TRANSFER_BATCH_SIZE` records, so a large backup never sits in memory
+    whole. Bad lines are reported back by line number and don't stop the
+    import; a line over `IMPORT_MAX_LINE_BYTES` does.
+    """
+    importer = _Importer(db)
+    try:
+        async for line, data in ndjson.iter_lines(
+            request.stream(), settings.IMPORT_MAX_LINE_BYTES
+        ):
+            importer.add(line, data)
+            if importer.pending >= settings.TRANSFER_BATCH_SIZE:
+                await importer.flush()
+    except ndjson.LineTooLong as exc:
+        importer.error(exc.line, f"{exc}; import stopped")
+    await importer.flush()
+    return importer.summary()
@@ -0,0 +1,42 @@
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+def etag_for(table: str, revision: int, generation: int = 0) -> str:
+    """
+    Strong validator for everything served from a table at a revision, and
+    at a `generation` of in-memory state overlaid on it, if there is any
+    """
+    if generation:
+        return f'"{table}-{revision}.{generation}"'
+    return f'"{table}-{revision}"'
+
+
+def matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names the given ETag"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        # If-None-Match uses weak comparison
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """
+    A 304 response when the client already holds this revision, else None.
+
+    The revision is read before the data, so a write landing in between can
+    only make the ETag older than the body, never newer.
+    """
+    if matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
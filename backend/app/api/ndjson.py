@@ -0,0 +1,48 @@
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Tuple
+
+from app.api.responses import dumps, orjson
+
+MEDIA_TYPE = "application/x-ndjson"
+
+
+class LineTooLong(ValueError):
+    def __init__(self, line: int):
+        super().__init__(f"Line {line} is longer than the allowed maximum")
+        self.line = line
+
+
+def line(content: Any) -> bytes:
+    return dumps(content) + b"\n"
+
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+async def iter_lines(
+    chunks: AsyncIterable[bytes], max_line_bytes: int
+) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Split a byte stream into (line number, line) pairs as it arrives.
+
+    Only the current partial line is buffered, so memory stays bounded by
+    `max_line_bytes` however large the upload is. Blank lines are skipped.
+    """
+    buffer = b""
+    number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        for data in complete:
+            number += 1
+            if len(data) > max_line_bytes:
+                raise LineTooLong(number)
+            if data.strip():
+                yield number, data
+        if len(buffer) > max_line_bytes:
+            raise LineTooLong(number + 1)
+    if buffer.strip():
+        yield number + 1, buffer
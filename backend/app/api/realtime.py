@@ -0,0 +1,52 @@
+import asyncio
+import logging
+from typing import Any
+
+from fastapi import FastAPI
+
+from app.core.config import settings
+from app.engine.runtime import ExecutionRuntime
+
+try:
+    import socketio
+except ImportError:  # pragma: no cover - optional dependency
+    socketio = None
+
+logger = logging.getLogger(__name__)
+
+SOCKETIO_PATH = "ws/socket.io"
+
+
+def with_socketio(application: FastAPI, runtime: ExecutionRuntime) -> Any:
+    """
+    Serve execution updates to socket.io clients at /ws/socket.io.
+
+    Returns an ASGI app wrapping `application`, or `application` itself
+    when python-socketio isn't installed. Every message the runtime
+    publishes is emitted to all connected clients under its own name.
+    """
+    if socketio is None:
+        logger.warning("python-socketio is not installed; execution updates won't be pushed")
+        return application
+    sio = socketio.AsyncServer(
+        async_mode="asgi", cors_allowed_origins=settings.BACKEND_CORS_ORIGINS
+    )
+
+    async def forward() -> None:
+        queue = runtime.broadcaster.subscribe()
+        try:
+            while True:
+                name, payload = await queue.get()
+                await sio.emit(name, payload)
+        finally:
+            runtime.broadcaster.unsubscribe(queue)
+
+    async def start_forwarding() -> None:
+        application.state.execution_forwarder = asyncio.create_task(forward())
+
+    async def stop_forwarding() -> None:
+        application.state.execution_forwarder.cancel()
+
+    application.router.add_event_handler("startup", start_forwarding)
+    application.router.add_event_handler("shutdown", stop_forwarding)
+    return socketio.ASGIApp(sio, other_asgi_app=application, socketio_path=SOCKETIO_PATH)
@@ -0,0 +1,48 @@
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Type
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Encode to JSON bytes with orjson when available, else the stdlib"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def schema_fields(schema: Type[BaseModel]) -> List[str]:
+    """Column names to select so fast rows match a response schema"""
+    return list(schema.model_fields)
+
+
+def rows_to_payload(fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    return [dict(zip(fields, row)) for row in rows]
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response for payloads that are already plain dicts and lists.
+
+    Skips response_model validation and jsonable_encoder, so only use it for
+    data built straight from database rows of the documented schema.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def fast_list_response(
+    fields: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    headers: Optional[Dict[str, str]] = None,
+) -> FastJSONResponse:
+    return FastJSONResponse(rows_to_payload(fields, rows), headers=headers)
@@ -0,0 +1,59 @@
+import asyncio
+from typing import Optional
+
+
+class BackgroundTask:
+    """
+    Mixin for a service driven by one `_run` coroutine on the event loop.
+
+    `start` is cheap and idempotent, so hot paths call it on every write: it
+    starts the task on the running loop unless it is already running there,
+    and does nothing without a running loop, in which case the caller
+    flushes explicitly. `close` cancels the task and then writes out what
+    it left behind.
+
+    Subclasses implement `_run` and may override `_should_run`, `_prepare`
+    and `_drain`.
+    """
+
+    _task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the task on the running loop if it isn't running there"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        if self._should_run():
+            self._prepare()
+            self._task = loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the task and wait for it to finish"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def close(self) -> None:
+        """Stop the task and write out what is still buffered"""
+        await self.stop()
+        await self._drain()
+
+    def _should_run(self) -> bool:
+        """Whether the task has anything to do, e.g. a configured store"""
+        return True
+
+    def _prepare(self) -> None:
+        """Create the loop-bound state `_run` uses, just before it starts"""
+
+    async def _drain(self) -> None:
+        """Write out what is still buffered once the task has stopped"""
+
+    async def _run(self) -> None:
+        raise NotImplementedError
@@ -7,6 +7,93 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-here"  # Change this in production
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
+
+    # Principal cache for authenticated requests (0 disables it)
+    PRINCIPAL_CACHE_MAX_SIZE: int = 1024
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+
+    # Largest batch accepted by the bulk create/update/delete endpoints
+    BULK_MAX_ITEMS: int = 1000
+
+    # Change log revisions read per query while streaming GET /changes, and
+    # how long entries are kept; clients further behind must resync
+    CHANGES_PAGE_SIZE: int = 500
+    CHANGE_LOG_RETENTION_DAYS: int = 7
+
+    # Compiled event plans kept in memory
+    PLAN_CACHE_MAX_SIZE: int = 1024
+
+    # Resolution of the timer wheel behind wait steps and time triggers
+    TIMER_TICK_MS: int = 10
+
+    # Event executions: runs in flight at once, runs of one event in flight
+    # at once, how often a run's progress is pushed to clients, and how many
+    # finished runs are kept for GET /executions/
+    EXECUTION_MAX_CONCURRENT: int = 64
+    EXECUTION_MAX_PER_EVENT: int = 4
+    EXECUTION_UPDATE_INTERVAL_MS: int = 100
+    EXECUTION_KEEP_FINISHED: int = 200
+
+    # Execution history: rows per batched insert, longest a finished run
+    # waits in memory before it's written, how long history is kept, and
+    # how many steps of each run are recorded with their timings
+    EXECUTION_HISTORY_BATCH_SIZE: int = 200
+    EXECUTION_HISTORY_FLUSH_MS: int = 1000
+    EXECUTION_HISTORY_RETENTION_DAYS: int = 30
+    EXECUTION_HISTORY_MAX_STEPS: int = 100
+
+    # Machine connections: health check round interval, probe timeout,
+    # probes in flight at once, the path probed on each machine, and the
+    # reconnect backoff after a failed probe (doubling from the base, with
+    # jitter, up to the max)
+    MACHINE_PROBE_INTERVAL_SECONDS: float = 10.0
+    MACHINE_PROBE_TIMEOUT_SECONDS: float = 2.0
+    MACHINE_PROBE_CONCURRENCY: int = 100
+    MACHINE_HEALTH_PATH: str = "/health"
+    MACHINE_RECONNECT_BACKOFF_SECONDS: float = 1.0
+    MACHINE_RECONNECT_BACKOFF_MAX_SECONDS: float = 60.0
+
+    # Buffered machine status changes are written in one batch this often;
+    # a crash loses at most this much
+    MACHINE_STATUS_FLUSH_MS: int = 500
+
+    # Shared secret machines send to push telemetry frames (X-Ingest-Token
+    # header or `token` query parameter); empty disables ingest. Batches
+    # larger than the max frame count or body size are rejected, and a
+    # WebSocket message over the message size closes its stream
+    INGEST_TOKEN: str = ""
+    INGEST_MAX_FRAMES: int = 10000
+    INGEST_MAX_BODY_MB: int = 16
+    INGEST_MAX_MESSAGE_MB: int = 4
+
+    # In-memory recent history per (machine, channel): samples kept per
+    # channel (36000 is an hour at 10 Hz) and the memory all channels share.
+    # A full channel with its rollups takes about 4 MB, so the default holds
+    # 50 channels at full history before cold ones keep less raw history
+    SERIES_CAPACITY: int = 36000
+    SERIES_MEMORY_MB: int = 256
+
+    # Compressed on-disk telemetry segments ("" keeps history in memory
+    # only): where they live, the size at which a segment is sealed, how
+    # often buffered samples are written (a crash loses at most this much)
+    # and how long segments are kept
+    SERIES_DATA_DIR: str = "data/series"
+    SERIES_SEGMENT_KB: int = 1024
+    SERIES_FLUSH_SECONDS: float = 60.0
+    SERIES_RETENTION_DAYS: float = 7.0
+
+    # NDJSON export/import: rows per query or commit, longest accepted line,
+    # and how many per-line errors an import reports back
+    TRANSFER_BATCH_SIZE: int = 500
+    IMPORT_MAX_LINE_BYTES: int = 1024 * 1024
+    IMPORT_MAX_ERRORS: int = 100
+
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 16  # running + queued, beyond this we shed load
+    PASSWORD_HASH_USE_PROCESSES: bool = False
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = 2
     SERVER_NAME: str = "localhost"
     SERVER_HOST: AnyHttpUrl = "http://localhost:8000"
     
@@ -26,6 +113,16 @@ class Settings(BaseSettings):
     
     # Database
     SQLALCHEMY_DATABASE_URI: Optional[str] = "sqlite:///./mostwo.db"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+
+    # SQLite tuning, applied on every new connection
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_CACHE_SIZE: int = -16000  # negative means KiB, i.e. ~16 MB
+    SQLITE_MMAP_SIZE: int = 64 * 1024 * 1024
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
     
     # First superuser
     FIRST_SUPERUSER: EmailStr = "admin@example.com"
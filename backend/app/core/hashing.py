@@ -0,0 +1,130 @@
+import asyncio
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core import security
+from app.core.config import settings
+
+
+class HashingPoolBusy(Exception):
+    """Raised when the hashing pool is at its queue-depth limit"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing pool is saturated")
+        self.retry_after = retry_after
+
+
+class HashingPool:
+    """
+    Dedicated, size-limited executor for bcrypt work.
+
+    Keeps password hashing off the shared request threadpool and applies
+    admission control: at most `max_pending` jobs may be running or queued,
+    anything beyond that is rejected immediately with `HashingPoolBusy`
+    instead of piling up behind a login storm.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_pending: int,
+        use_processes: bool = False,
+        retry_after: int = 1,
+    ):
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self.use_processes = use_processes
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.use_processes:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="pwhash"
+                    )
+            return self._executor
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """Admit a job and submit it; its slot is held until the job itself is done"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingPoolBusy(self.retry_after)
+        with self._lock:
+            self.pending += 1
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._done(None)
+            raise
+        # Released from the job rather than from the caller, so a caller that
+        # stops waiting (a cancelled request) doesn't free a slot still in use
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future: Optional[Future]) -> None:
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run `fn(*args)` on the pool and wait for the result"""
+        return self._submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Like `run`, but awaits the result instead of blocking a thread"""
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+    def hash(self, password: str) -> str:
+        return self.run(security.get_password_hash, password)
+
+    def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        return self.run(
+            security.verify_and_update_password, plain_password, hashed_password
+        )
+
+    async def verify_and_update_async(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        return await self.run_async(
+            security.verify_and_update_password, plain_password, hashed_password
+        )
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "use_processes": self.use_processes,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+            }
+
+
+hashing_pool = HashingPool(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    use_processes=settings.PASSWORD_HASH_USE_PROCESSES,
+    retry_after=settings.PASSWORD_HASH_RETRY_AFTER_SECONDS,
+)
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+
+
+class PrincipalCache:
+    """
+    In-process TTL/LRU cache of authenticated principals keyed by bearer token.
+
+    A hit skips both the JWT decode and the users table lookup in
+    `deps.get_current_user`. Entries expire at the earlier of the configured
+    TTL and the token's own `exp` claim, and can be dropped per user when
+    their privileges or credentials change.
+
+    Each invalidation also bumps the user's generation. A miss reads the
+    generation before loading the user and passes it to `set`, which
+    refuses to cache a row that was read before an invalidation.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str, Dict[str, Any]]]" = OrderedDict()
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.load_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl_seconds > 0
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Return the cached principal for a token, or None on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._discard(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[2]
+
+    def generation(self, user_id: Any) -> int:
+        """The user's generation; read it before loading the user for `set`"""
+        with self._lock:
+            return self._generations.get(str(user_id), 0)
+
+    def set(
+        self,
+        token: str,
+        principal: Dict[str, Any],
+        expires_at: Optional[float] = None,
+        generation: Optional[int] = None,
+    ) -> None:
+        """
+        Cache a principal. `expires_at` is the token's `exp` claim as a unix
+        timestamp; the entry never outlives the token itself. Nothing is
+        cached if the user was invalidated since `generation` was read.
+        """
+        if not self.enabled:
+            return
+        ttl = self.ttl_seconds
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        if ttl <= 0:
+            return
+        user_id = str(principal["id"])
+        with self._lock:
+            if generation is not None and generation != self._generations.get(user_id, 0):
+                return
+            self._discard(token)
+            self._entries[token] = (time.monotonic() + ttl, user_id, principal)
+            self._tokens_by_user.setdefault(user_id, set()).add(token)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+
+    def observe_load(self, seconds: float) -> None:
+        """Record how long a miss took to resolve (decode + user lookup)"""
+        with self._lock:
+            self.load_seconds += seconds
+
+    def invalidate_user(self, user_id: Any) -> None:
+        """Drop every cached token that resolves to the given user"""
+        user_id = str(user_id)
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for token in self._tokens_by_user.pop(user_id, set()):
+                self._entries.pop(token, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+            self.hits = 0
+            self.misses = 0
+            self.load_seconds = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            avg_load_ms = self.load_seconds * 1000 / self.misses if self.misses else 0.0
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "avg_load_ms": avg_load_ms,
+                "estimated_saved_ms": avg_load_ms * self.hits,
+            }
+
+    def _discard(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_user.get(entry[1])
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry[1]]
+
+
+principal_cache = PrincipalCache(
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
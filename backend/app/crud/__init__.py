@@ -1,6 +1,14 @@
+from .async_base import AsyncCRUDBase
 from .base import CRUDBase
-from .crud_event import event
-from .crud_machine import machine
-from .crud_user import user
+from .crud_change_log import async_change_log, change_log, change_log_retention
+from .crud_event import async_event, event
+from .crud_execution_history import async_execution_history, execution_history
+from .crud_machine import async_machine, machine
+from .crud_user import async_user, user
 
-__all__ = ["CRUDBase", "event", "machine", "user"]
+__all__ = [
+    "AsyncCRUDBase", "CRUDBase",
+    "change_log", "event", "execution_history", "machine", "user",
+    "async_change_log", "async_event", "async_execution_history", "async_machine",
+    "async_user", "change_log_retention",
+]
@@ -0,0 +1,130 @@
+from typing import Any, AsyncIterator, Callable, Dict, Generic, Iterable, List, Optional, Sequence, Set, Tuple, TypeVar, Union
+
+from sqlalchemy import Row, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.crud.base import CRUDBase, CreateSchemaType, ModelType, UpdateSchemaType
+
+CRUDType = TypeVar("CRUDType", bound=CRUDBase)
+T = TypeVar("T")
+
+
+class AsyncCRUDBase(Generic[CRUDType, ModelType, CreateSchemaType, UpdateSchemaType]):
+    def __init__(self, crud: CRUDType):
+        """
+        Async front for a sync CRUD object.
+
+        Each call runs the sync implementation through `AsyncSession.run_sync`,
+        so the query logic lives in one place while database I/O is awaited on
+        the async driver instead of holding a threadpool thread.
+
+        **Parameters**
+        * `crud`: The sync CRUD object to delegate to
+        """
+        self.crud = crud
+        self.model = crud.model
+
+    async def _run(
+        self, db: AsyncSession, fn: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        return await db.run_sync(lambda session: fn(session, *args, **kwargs))
+
+    async def get_revision(self, db: AsyncSession) -> int:
+        return await self._run(db, self.crud.get_revision)
+
+    async def get(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
+        return await self._run(db, self.crud.get, id=id)
+
+    async def get_multi(
+        self, db: AsyncSession, *, skip: int = 0, limit: int = 100
+    ) -> List[ModelType]:
+        return await self._run(db, self.crud.get_multi, skip=skip, limit=limit)
+
+    async def get_page(
+        self, db: AsyncSession, *, cursor: Optional[str] = None, limit: int = 100
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        return await self._run(db, self.crud.get_page, cursor=cursor, limit=limit)
+
+    async def get_rows(
+        self,
+        db: AsyncSession,
+        *,
+        fields: Sequence[str],
+        cursor: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[List[Row], Optional[str]]:
+        return await self._run(
+            db,
+            self.crud.get_rows,
+            fields=fields,
+            cursor=cursor,
+            skip=skip,
+            limit=limit,
+            filters=filters,
+        )
+
+    async def stream_rows(
+        self,
+        db: AsyncSession,
+        *,
+        batch_size: int = 500,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Every row of the table as plain column dicts, in id order, one batch
+        at a time from a server-side cursor. Only one batch is held in memory.
+        """
+        query = select(*self.model.__table__.columns).order_by(self.model.id)
+        if filters:
+            query = query.filter_by(**filters)
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for partition in result.mappings().partitions():
+            yield [dict(row) for row in partition]
+
+    async def get_existing_ids(
+        self, db: AsyncSession, *, ids: Iterable[str]
+    ) -> Set[str]:
+        return await self._run(db, self.crud.get_existing_ids, ids=list(ids))
+
+    async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
+        return await self._run(db, self.crud.create, obj_in=obj_in)
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: ModelType,
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> ModelType:
+        return await self._run(db, self.crud.update, db_obj=db_obj, obj_in=obj_in)
+
+    async def update_by_id(
+        self,
+        db: AsyncSession,
+        *,
+        id: Any,
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> Optional[ModelType]:
+        return await self._run(db, self.crud.update_by_id, id=id, obj_in=obj_in)
+
+    async def remove_by_id(self, db: AsyncSession, *, id: Any) -> Optional[ModelType]:
+        return await self._run(db, self.crud.remove_by_id, id=id)
+
+    async def remove(self, db: AsyncSession, *, id: str) -> ModelType:
+        return await self._run(db, self.crud.remove, id=id)
+
+    async def create_multi(
+        self, db: AsyncSession, *, objs_in: List[CreateSchemaType]
+    ) -> List[str]:
+        return await self._run(db, self.crud.create_multi, objs_in=objs_in)
+
+    async def update_multi(
+        self, db: AsyncSession, *, objs_in: List[Dict[str, Any]]
+    ) -> Set[str]:
+        return await self._run(db, self.crud.update_multi, objs_in=objs_in)
+
+    async def remove_multi(self, db: AsyncSession, *, ids: List[str]) -> Set[str]:
+        return await self._run(db, self.crud.remove_multi, ids=ids)
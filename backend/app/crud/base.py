@@ -1,16 +1,27 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union, cast
+from typing import Any, Dict, Generic, Iterable, List, Optional, Sequence, Set, Tuple, Type, TypeVar, Union, cast
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import Row, delete, insert, inspect, select, update
+from sqlalchemy.orm import Query, Session
 import uuid
 
+from app.crud.pagination import decode_cursor, encode_cursor
 from app.db.base import Base
+from app.models.change_log import ChangeLogEntry
+from app.models.revision import TableRevision
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    # (table, foreign key column) pairs whose rows go away with ours through
+    # ON DELETE CASCADE
+    cascades_to: Tuple[Tuple[str, str], ...] = ()
+    # Whether writes append to the change log behind GET /changes, which
+    # every authenticated user can read
+    logs_changes = True
+
     def __init__(self, model: Type[ModelType]):
         """
         CRUD object with default methods to Create, Read, Update, Delete (CRUD).
@@ -21,6 +32,62 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
         self.model = model
 
+    def get_revision(self, db: Session) -> int:
+        """Current revision of this model's table; changes on every write"""
+        revision = db.scalar(
+            select(TableRevision.revision).where(
+                TableRevision.table_name == self.model.__tablename__
+            )
+        )
+        return revision or 0
+
+    def _cascaded_ids(self, db: Session, ids: Iterable[Any]) -> Dict[str, List[str]]:
+        """Ids of dependent rows a delete of `ids` will cascade to; call before deleting"""
+        ids = list(ids)
+        cascaded = {}
+        for table_name, column in self.cascades_to:
+            table = Base.metadata.tables[table_name]
+            cascaded[table_name] = list(
+                db.scalars(select(table.c.id).where(table.c[column].in_(ids)))
+            )
+        return cascaded
+
+    def _record_changes(
+        self,
+        db: Session,
+        ids: Iterable[Any],
+        *,
+        deleted: bool = False,
+        cascaded: Optional[Dict[str, List[str]]] = None,
+    ) -> None:
+        # Runs inside the caller's transaction so the table revision and the
+        # change log commit together with the write itself
+        changes = {self.model.__tablename__: [str(id) for id in ids]}
+        changes.update(cascaded or {})
+        op = "delete" if deleted else "upsert"
+        for table_name, row_ids in changes.items():
+            if not row_ids:
+                continue
+            bumped = db.execute(
+                update(TableRevision)
+                .where(TableRevision.table_name == table_name)
+                .values(revision=TableRevision.revision + 1)
+                .execution_options(synchronize_session=False)
+            )
+            if bumped.rowcount == 0:
+                db.execute(
+                    insert(TableRevision).values(table_name=table_name, revision=1)
+                )
+            if not self.logs_changes:
+                continue
+            db.execute(
+                insert(ChangeLogEntry),
+                [
+                    {"table_name": table_name, "row_id": row_id, "op": op}
+                    for row_id in row_ids
+                ],
+            )
+
     def get(self, db: Session, id: Any) -> Optional[ModelType]:
         # Convert string ID to UUID if needed
         try:
@@ -34,9 +101,69 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def get_multi(
         self, db: Session, *, skip: int = 0, limit: int = 100
     ) -> List[ModelType]:
-        return db.query(self.model).offset(skip).limit(limit).all()
+        return (
+            db.query(self.model)
+            .order_by(self.model.id)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
 
-    def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
+    def get_page(
+        self, db: Session, *, cursor: Optional[str] = None, limit: int = 100
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """
+        Keyset pagination on the primary key.
+
+        Returns the page and an opaque cursor for the next one (None on the
+        last page). Each page is an index range scan, so its cost doesn't grow
+        with how deep into the table the client is.
+        """
+        return self._paginate(db.query(self.model), cursor=cursor, limit=limit)
+
+    def get_rows(
+        self,
+        db: Session,
+        *,
+        fields: Sequence[str],
+        cursor: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[List[Row], Optional[str]]:
+        """
+        Plain row tuples of the given columns for read-only listings.
+
+        Pages the same way as `get_page` (or `get_multi` when only `skip` is
+        given) but skips building ORM objects. `fields` must include "id".
+        """
+        query = db.query(*(getattr(self.model, field) for field in fields))
+        if filters:
+            query = query.filter_by(**filters)
+        if skip and not cursor:
+            return query.order_by(self.model.id).offset(skip).limit(limit).all(), None
+        return self._paginate(query, cursor=cursor, limit=limit)
+
+    def _paginate(
+        self, query: Query, *, cursor: Optional[str], limit: int
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        if cursor:
+            query = query.filter(self.model.id > decode_cursor(cursor))
+        # Fetch one extra row to learn whether another page exists
+        rows = query.order_by(self.model.id).limit(limit + 1).all()
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1].id)
+
+    def get_existing_ids(self, db: Session, *, ids: Iterable[str]) -> Set[str]:
+        """Which of the given ids exist, in a single query"""
+        ids = list(ids)
+        if not ids:
+            return set()
+        return set(db.scalars(select(self.model.id).where(self.model.id.in_(ids))))
+
+    def _create_data(self, obj_in: CreateSchemaType) -> Dict[str, Any]:
         obj_in_data = jsonable_encoder(obj_in, custom_encoder={
             uuid.UUID: lambda x: str(x)
         })
@@ -44,9 +171,13 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         # Handle ID generation if not provided
         if 'id' not in obj_in_data or not obj_in_data['id']:
             obj_in_data['id'] = str(uuid.uuid4())
-            
+        return obj_in_data
+
+    def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
+        obj_in_data = self._create_data(obj_in)
         db_obj = self.model(**obj_in_data)  # type: ignore
         db.add(db_obj)
+        self._record_changes(db, [obj_in_data["id"]])
         db.commit()
         db.refresh(db_obj)
         return db_obj
@@ -73,12 +204,132 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
         db.add(db_obj)
+        self._record_changes(db, [db_obj.id])
         db.commit()
         db.refresh(db_obj)
         return db_obj
 
+    def _column_values(
+        self, obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        if isinstance(obj_in, dict):
+            update_data = dict(obj_in)
+        else:
+            update_data = obj_in.model_dump(exclude_unset=True)
+        columns = inspect(self.model).column_attrs.keys()
+        return {
+            field: value
+            for field, value in update_data.items()
+            if field in columns and field != "id"
+        }
+
+    def update_by_id(
+        self,
+        db: Session,
+        *,
+        id: Any,
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> Optional[ModelType]:
+        """
+        Update only the given columns of a row and return it, or None if no
+        row has that id.
+
+        Uses a single UPDATE ... RETURNING where the database supports it
+        instead of a SELECT, UPDATE and refresh.
+        """
+        values = self._column_values(obj_in)
+        if not values:
+            return self.get(db, id=id)
+        if not db.get_bind().dialect.update_returning:
+            db_obj = self.get(db, id=id)
+            return self.update(db, db_obj=db_obj, obj_in=values) if db_obj else None
+        db_obj = db.scalars(
+            update(self.model)
+            .where(self.model.id == id)
+            .values(**values)
+            .returning(self.model),
+            execution_options={"synchronize_session": False},
+        ).first()
+        if db_obj is not None:
+            self._record_changes(db, [db_obj.id])
+        db.commit()
+        return db_obj
+
+    def remove_by_id(self, db: Session, *, id: Any) -> Optional[ModelType]:
+        """
+        Delete a row and return it as it was, or None if no row has that id.
+
+        A single DELETE ... RETURNING where supported; dependent rows go
+        through the foreign keys' ON DELETE rules rather than ORM cascades.
+        """
+        if not db.get_bind().dialect.delete_returning:
+            db_obj = self.get(db, id=id)
+            return self.remove(db, id=id) if db_obj else None
+        cascaded = self._cascaded_ids(db, [id])
+        db_obj = db.scalars(
+            delete(self.model)
+            .where(self.model.id == id)
+            .returning(self.model),
+            execution_options={"synchronize_session": False},
+        ).first()
+        if db_obj is not None:
+            self._record_changes(db, [db_obj.id], deleted=True, cascaded=cascaded)
+        db.commit()
+        return db_obj
+
+    def create_multi(
+        self, db: Session, *, objs_in: List[CreateSchemaType]
+    ) -> List[str]:
+        """Insert many rows with one executemany and one commit, returning their ids"""
+        rows = [self._create_data(obj_in) for obj_in in objs_in]
+        if rows:
+            db.execute(insert(self.model), rows)
+            self._record_changes(db, [row["id"] for row in rows])
+        db.commit()
+        return [row["id"] for row in rows]
+
+    def update_multi(
+        self, db: Session, *, objs_in: List[Dict[str, Any]]
+    ) -> Set[str]:
+        """
+        Apply partial updates keyed by `id` in one transaction.
+
+        Rows whose id doesn't exist are skipped; the ids that were updated
+        are returned.
+        """
+        existing = self.get_existing_ids(db, ids=[obj["id"] for obj in objs_in])
+        rows = [obj for obj in objs_in if obj["id"] in existing and len(obj) > 1]
+        if rows:
+            db.execute(update(self.model), rows)
+            self._record_changes(db, [row["id"] for row in rows])
+        db.commit()
+        return existing
+
+    def remove_multi(self, db: Session, *, ids: List[str]) -> Set[str]:
+        """Delete many rows in one statement, returning the ids that existed"""
+        if not ids:
+            return set()
+        cascaded = self._cascaded_ids(db, ids)
+        statement = delete(self.model).where(self.model.id.in_(ids))
+        if db.get_bind().dialect.delete_returning:
+            removed = set(
+                db.scalars(
+                    statement.returning(self.model.id).execution_options(
+                        synchronize_session=False
+                    )
+                )
+            )
+        else:
+            removed = self.get_existing_ids(db, ids=ids)
+            db.execute(statement.execution_options(synchronize_session=False))
+        self._record_changes(db, removed, deleted=True, cascaded=cascaded)
+        db.commit()
+        return removed
+
     def remove(self, db: Session, *, id: str) -> ModelType:
         obj = db.query(self.model).get(id)
+        cascaded = self._cascaded_ids(db, [id])
         db.delete(obj)
+        self._record_changes(db, [id], deleted=True, cascaded=cascaded)
         db.commit()
         return obj
@@ -0,0 +1,247 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from app import models
+from app.core.background import BackgroundTask
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# `table_revisions` row holding the revision the change log is pruned through
+FLOOR_KEY = "change_log_floor"
+
+class CRUDChangeLog:
+    """
+    Reads the change log written by `CRUDBase` mutations.
+
+    Within a range of revisions only the latest change per row is returned,
+    with the row's current values for upserts, so a client catching up pays
+    for what changed rather than for the size of the tables.
+
+    `prune` keeps the log bounded: entries superseded by a later change to
+    the same row are dropped (a client reading past them still gets the
+    later one), and so is everything older than the retention window. The
+    highest revision dropped that way is the floor; a client whose `since`
+    is below it has missed changes and must resync from the tables.
+    """
+    models_by_table = {
+        models.Machine.__tablename__: models.Machine,
+        models.Event.__tablename__: models.Event,
+    }
+
+    def __init__(self):
+        self.model = models.ChangeLogEntry
+
+    def get_floor(self, db: Session) -> int:
+        """Revision the log is pruned through; changes after it are complete"""
+        floor = db.scalar(
+            select(models.TableRevision.revision).where(
+                models.TableRevision.table_name == FLOOR_KEY
+            )
+        )
+        return floor or 0
+
+    def get_head(self, db: Session) -> int:
+        """Latest revision written, or 0 for an empty log"""
+        head = db.scalar(select(func.max(self.model.revision))) or 0
+        # A log pruned empty still remembers how far it got
+        return max(head, self.get_floor(db))
+
+    def prune(self, db: Session, *, before: datetime, batch_size: int = 1000) -> int:
+        """
+        Drop superseded entries and those written before `before`, raising
+        the floor past the latter. Deletes `batch_size` rows per transaction;
+        returns how many went.
+        """
+        newer = aliased(self.model)
+        superseded = (
+            select(self.model.revision)
+            .where(
+                select(newer.revision)
+                .where(
+                    newer.table_name == self.model.table_name,
+                    newer.row_id == self.model.row_id,
+                    newer.revision > self.model.revision,
+                )
+                .exists()
+            )
+            .limit(batch_size)
+        )
+        removed = self._delete_batches(db, superseded, batch_size)
+
+        floor = db.scalar(
+            select(func.max(self.model.revision)).where(
+                self.model.changed_at < before.astimezone(timezone.utc).replace(tzinfo=None)
+            )
+        )
+        if floor is None or floor <= self.get_floor(db):
+            return removed
+        # Raise the floor first so no reader trusts a partially pruned range
+        bumped = db.execute(
+            update(models.TableRevision)
+            .where(models.TableRevision.table_name == FLOOR_KEY)
+            .values(revision=floor)
+            .execution_options(synchronize_session=False)
+        )
+        if bumped.rowcount == 0:
+            db.execute(insert(models.TableRevision).values(table_name=FLOOR_KEY, revision=floor))
+        db.commit()
+        expired = select(self.model.revision).where(self.model.revision <= floor).limit(batch_size)
+        return removed + self._delete_batches(db, expired, batch_size)
+
+    def _delete_batches(self, db: Session, revisions: Any, batch_size: int) -> int:
+        removed = 0
+        while True:
+            count = db.execute(
+                delete(self.model)
+                .where(self.model.revision.in_(revisions.scalar_subquery()))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            removed += count
+            if count < batch_size:
+                return removed
+
+    def get_since(
+        self, db: Session, *, since: int, until: int, limit: int = 500
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Net changes in the next `limit` revisions after `since`, up to `until`.
+
+        Returns the changes in revision order and the last revision scanned,
+        which is where the next call should continue from (None once there
+        is nothing left).
+        """
+        entries = db.execute(
+            select(
+                self.model.revision,
+                self.model.table_name,
+                self.model.row_id,
+                self.model.op,
+            )
+            .where(
+                self.model.revision > since,
+                self.model.revision <= until,
+                # Only the tables the feed serves, whatever else was logged
+                self.model.table_name.in_(self.models_by_table),
+            )
+            .order_by(self.model.revision)
+            .limit(limit)
+        ).all()
+        if not entries:
+            return [], None
+
+        latest = {}
+        for entry in entries:
+            key = (entry.table_name, entry.row_id)
+            # Re-insert so the dict stays ordered by each row's last revision
+            latest.pop(key, None)
+            latest[key] = entry
+
+        rows = {}
+        for table_name, model in self.models_by_table.items():
+            ids = [
+                row_id
+                for (table, row_id), entry in latest.items()
+                if table == table_name and entry.op == "upsert"
+            ]
+            if ids:
+                for obj in db.query(model).filter(model.id.in_(ids)):
+                    rows[(table_name, obj.id)] = obj.to_dict()
+
+        changes = []
+        for key, entry in latest.items():
+            data = rows.get(key)
+            # An upserted row that is gone has been deleted in a later
+            # revision; send the tombstone now rather than stale values
+            op = entry.op if data is not None else "delete"
+            changes.append({
+                "revision": entry.revision,
+                "table": entry.table_name,
+                "id": entry.row_id,
+                "op": op,
+                "data": data,
+            })
+        return changes, entries[-1].revision
+
+class AsyncCRUDChangeLog:
+    def __init__(self, crud: CRUDChangeLog):
+        self.crud = crud
+
+    async def get_floor(self, db: AsyncSession) -> int:
+        return await db.run_sync(self.crud.get_floor)
+
+    async def get_head(self, db: AsyncSession) -> int:
+        return await db.run_sync(self.crud.get_head)
+
+    async def prune(
+        self, db: AsyncSession, *, before: datetime, batch_size: int = 1000
+    ) -> int:
+        return await db.run_sync(
+            lambda session: self.crud.prune(session, before=before, batch_size=batch_size)
+        )
+
+    async def get_since(
+        self, db: AsyncSession, *, since: int, until: int, limit: int = 500
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        return await db.run_sync(
+            lambda session: self.crud.get_since(
+                session, since=since, until=until, limit=limit
+            )
+        )
+
+class ChangeLogRetention(BackgroundTask):
+    """Background task pruning the change log every `interval` seconds"""
+
+    def __init__(
+        self,
+        crud: AsyncCRUDChangeLog,
+        session_factory: Callable[[], AsyncSession],
+        *,
+        retention: timedelta = timedelta(days=7),
+        interval: float = 3600.0,
+    ):
+        self.crud = crud
+        self.session_factory = session_factory
+        self.retention = retention
+        self.interval = interval
+        self.runs = 0
+        self.pruned = 0
+
+    async def prune(self, now: Optional[datetime] = None) -> int:
+        before = (now or datetime.now(timezone.utc)) - self.retention
+        async with self.session_factory() as db:
+            removed = await self.crud.prune(db, before=before)
+        self.runs += 1
+        self.pruned += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "pruned": self.pruned,
+            "retention_days": self.retention.total_seconds() / 86400,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.prune()
+            except Exception:
+                logger.exception("Pruning the change log failed")
+
+change_log = CRUDChangeLog()
+async_change_log = AsyncCRUDChangeLog(change_log)
+change_log_retention = ChangeLogRetention(
+    async_change_log,
+    AsyncSessionLocal,
+    retention=timedelta(days=settings.CHANGE_LOG_RETENTION_DAYS),
+)
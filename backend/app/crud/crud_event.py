@@ -1,35 +1,163 @@
-from typing import List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import models, schemas
+from app.crud.async_base import AsyncCRUDBase
 from app.crud.base import CRUDBase
+from app.engine.cache import plan_cache
+from app.engine.triggers import trigger_index
 
 class CRUDEvent(CRUDBase[models.Event, schemas.EventCreate, schemas.EventUpdate]):
+    def _record_changes(self, db: Session, ids: Iterable[Any], **kwargs: Any) -> None:
+        # Every event write passes through here; compiled plans for these
+        # events are dropped and the trigger index resyncs once it commits
+        ids = list(ids)
+        super()._record_changes(db, ids, **kwargs)
+        plan_cache.invalidate_on_commit(db, ids)
+        trigger_index.mark_stale_on_commit(db)
+
     def get_multi_by_machine(
         self, db: Session, *, machine_id: str, skip: int = 0, limit: int = 100
     ) -> List[models.Event]:
         return (
             db.query(self.model)
             .filter(models.Event.machine_id == machine_id)
+            .order_by(models.Event.id)
             .offset(skip)
             .limit(limit)
             .all()
         )
+
+    def get_page_by_machine(
+        self,
+        db: Session,
+        *,
+        machine_id: str,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+    ) -> Tuple[List[models.Event], Optional[str]]:
+        query = db.query(self.model).filter(models.Event.machine_id == machine_id)
+        return self._paginate(query, cursor=cursor, limit=limit)
     
+    def get_rows_by_machines(
+        self, db: Session, *, machine_ids: Iterable[str]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Column dicts of the events bound to each of the given machines"""
+        by_machine: Dict[str, List[Dict[str, Any]]] = {}
+        machine_ids = list(machine_ids)
+        if not machine_ids:
+            return by_machine
+        rows = db.execute(
+            select(*models.Event.__table__.columns)
+            .where(models.Event.machine_id.in_(machine_ids))
+            .order_by(models.Event.machine_id, models.Event.id)
+        ).mappings()
+        for row in rows:
+            by_machine.setdefault(row["machine_id"], []).append(dict(row))
+        return by_machine
+
     def get_by_name(self, db: Session, *, name: str) -> Optional[models.Event]:
         return db.query(models.Event).filter(models.Event.name == name).first()
+
+    def get_existing_names(self, db: Session, *, names: Iterable[str]) -> Set[str]:
+        """Which event names are already taken, in a single query"""
+        return set(self.get_name_owners(db, names=names))
+
+    def get_name_owners(self, db: Session, *, names: Iterable[str]) -> Dict[str, str]:
+        """The id of the event holding each taken name"""
+        names = list(names)
+        if not names:
+            return {}
+        rows = db.execute(
+            select(models.Event.name, models.Event.id).where(models.Event.name.in_(names))
+        )
+        return {name: id for name, id in rows}
     
     def get_enabled_events(self, db: Session) -> List[models.Event]:
         return db.query(self.model).filter(models.Event.enabled == True).all()
+
+    def get_enabled_triggers(self, db: Session) -> List[Tuple[str, Any, Optional[str]]]:
+        """(id, trigger, machine_id) of every enabled event, for the trigger index"""
+        return [
+            tuple(row)
+            for row in db.execute(
+                select(models.Event.id, models.Event.trigger, models.Event.machine_id)
+                .where(models.Event.enabled == True)
+            )
+        ]
     
     def toggle_event(
         self, db: Session, *, db_obj: models.Event, enabled: bool
     ) -> models.Event:
         db_obj.enabled = enabled
         db.add(db_obj)
+        self._record_changes(db, [db_obj.id])
         db.commit()
         db.refresh(db_obj)
         return db_obj
 
+    def toggle_by_id(
+        self, db: Session, *, id: str, enabled: bool
+    ) -> Optional[models.Event]:
+        return self.update_by_id(db, id=id, obj_in={"enabled": enabled})
+
+class AsyncCRUDEvent(
+    AsyncCRUDBase[CRUDEvent, models.Event, schemas.EventCreate, schemas.EventUpdate]
+):
+    async def get_multi_by_machine(
+        self, db: AsyncSession, *, machine_id: str, skip: int = 0, limit: int = 100
+    ) -> List[models.Event]:
+        return await self._run(
+            db, self.crud.get_multi_by_machine, machine_id=machine_id, skip=skip, limit=limit
+        )
+
+    async def get_page_by_machine(
+        self,
+        db: AsyncSession,
+        *,
+        machine_id: str,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+    ) -> Tuple[List[models.Event], Optional[str]]:
+        return await self._run(
+            db, self.crud.get_page_by_machine, machine_id=machine_id, cursor=cursor, limit=limit
+        )
+
+    async def get_rows_by_machines(
+        self, db: AsyncSession, *, machine_ids: Iterable[str]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        return await self._run(
+            db, self.crud.get_rows_by_machines, machine_ids=list(machine_ids)
+        )
+
+    async def get_by_name(self, db: AsyncSession, *, name: str) -> Optional[models.Event]:
+        return await self._run(db, self.crud.get_by_name, name=name)
+
+    async def get_existing_names(
+        self, db: AsyncSession, *, names: Iterable[str]
+    ) -> Set[str]:
+        return await self._run(db, self.crud.get_existing_names, names=list(names))
+
+    async def get_name_owners(
+        self, db: AsyncSession, *, names: Iterable[str]
+    ) -> Dict[str, str]:
+        return await self._run(db, self.crud.get_name_owners, names=list(names))
+
+    async def get_enabled_events(self, db: AsyncSession) -> List[models.Event]:
+        return await self._run(db, self.crud.get_enabled_events)
+
+    async def toggle_event(
+        self, db: AsyncSession, *, db_obj: models.Event, enabled: bool
+    ) -> models.Event:
+        return await self._run(db, self.crud.toggle_event, db_obj=db_obj, enabled=enabled)
+
+    async def toggle_by_id(
+        self, db: AsyncSession, *, id: str, enabled: bool
+    ) -> Optional[models.Event]:
+        return await self._run(db, self.crud.toggle_by_id, id=id, enabled=enabled)
+
 event = CRUDEvent(models.Event)
+async_event = AsyncCRUDEvent(event)
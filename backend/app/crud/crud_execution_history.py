@@ -0,0 +1,132 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import models
+
+class CRUDExecutionHistory:
+    """
+    Append-only store of finished executions.
+
+    Rows arrive in batches from the execution history buffer and are never
+    updated; reads are by event or machine, newest first, and old rows go
+    by age through `prune`.
+    """
+
+    def __init__(self):
+        self.model = models.ExecutionRecord
+
+    def insert_many(self, db: Session, *, rows: List[Dict[str, Any]]) -> int:
+        """Append rows with one executemany and one commit"""
+        if rows:
+            db.execute(insert(self.model), rows)
+        db.commit()
+        return len(rows)
+
+    def get_recent(
+        self,
+        db: Session,
+        *,
+        event_id: Optional[str] = None,
+        machine_id: Optional[str] = None,
+        before: Optional[datetime] = None,
+        limit: int = 50,
+    ) -> List[models.ExecutionRecord]:
+        """
+        Latest runs, newest first, of one event and/or on one machine.
+        Pass the last `started_at` seen as `before` for the next page.
+        """
+        query = select(self.model)
+        if event_id is not None:
+            query = query.where(self.model.event_id == event_id)
+        if machine_id is not None:
+            query = query.where(self.model.machine_id == machine_id)
+        if before is not None:
+            query = query.where(self.model.started_at < before)
+        query = query.order_by(self.model.started_at.desc()).limit(limit)
+        return list(db.scalars(query))
+
+    def get_latest(
+        self, db: Session, *, event_ids: Iterable[str]
+    ) -> Dict[str, models.ExecutionRecord]:
+        """Most recent run of each of the given events that has one"""
+        event_ids = list(event_ids)
+        if not event_ids:
+            return {}
+        latest = (
+            select(
+                self.model.event_id,
+                func.max(self.model.started_at).label("started_at"),
+            )
+            .where(self.model.event_id.in_(event_ids))
+            .group_by(self.model.event_id)
+            .subquery()
+        )
+        records = {}
+        for record in db.scalars(
+            select(self.model).join(
+                latest,
+                (self.model.event_id == latest.c.event_id)
+                & (self.model.started_at == latest.c.started_at),
+            )
+        ):
+            records.setdefault(record.event_id, record)
+        return records
+
+    def prune(self, db: Session, *, before: datetime, batch_size: int = 1000) -> int:
+        """
+        Delete runs started before `before`, `batch_size` rows per
+        transaction so pruning never holds the write lock for long.
+        """
+        removed = 0
+        while True:
+            ids = select(self.model.id).where(self.model.started_at < before).limit(batch_size)
+            count = db.execute(
+                delete(self.model)
+                .where(self.model.id.in_(ids.scalar_subquery()))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            removed += count
+            if count < batch_size:
+                return removed
+
+class AsyncCRUDExecutionHistory:
+    def __init__(self, crud: CRUDExecutionHistory):
+        self.crud = crud
+
+    async def insert_many(self, db: AsyncSession, *, rows: List[Dict[str, Any]]) -> int:
+        return await db.run_sync(lambda session: self.crud.insert_many(session, rows=rows))
+
+    async def get_recent(
+        self,
+        db: AsyncSession,
+        *,
+        event_id: Optional[str] = None,
+        machine_id: Optional[str] = None,
+        before: Optional[datetime] = None,
+        limit: int = 50,
+    ) -> List[models.ExecutionRecord]:
+        return await db.run_sync(
+            lambda session: self.crud.get_recent(
+                session, event_id=event_id, machine_id=machine_id, before=before, limit=limit
+            )
+        )
+
+    async def get_latest(
+        self, db: AsyncSession, *, event_ids: Iterable[str]
+    ) -> Dict[str, models.ExecutionRecord]:
+        return await db.run_sync(lambda session: self.crud.get_latest(session, event_ids=event_ids))
+
+    async def prune(
+        self, db: AsyncSession, *, before: datetime, batch_size: int = 1000
+    ) -> int:
+        return await db.run_sync(
+            lambda session: self.crud.prune(session, before=before, batch_size=batch_size)
+        )
+
+execution_history = CRUDExecutionHistory()
+async_execution_history = AsyncCRUDExecutionHistory(execution_history)
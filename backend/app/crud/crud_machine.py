@@ -1,29 +1,214 @@
-from typing import Optional
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
 
+from sqlalchemy import Row, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import models, schemas
+from app.core.config import settings
+from app.crud.async_base import AsyncCRUDBase
 from app.crud.base import CRUDBase
+from app.crud.status_buffer import StatusBuffer
+from app.db.session import AsyncSessionLocal
+from app.engine.registry import machine_registry
+from app.engine.triggers import trigger_index
 
 class CRUDMachine(CRUDBase[models.Machine, schemas.MachineCreate, schemas.MachineUpdate]):
+    cascades_to = (("events", "machine_id"),)
+
+    def __init__(self, model):
+        super().__init__(model)
+        # Heartbeat-driven status changes go through here instead of a
+        # commit each; reads below overlay what is still buffered
+        self.status_buffer = StatusBuffer(
+            self, AsyncSessionLocal, flush_interval=settings.MACHINE_STATUS_FLUSH_MS / 1000
+        )
+
+    def _record_changes(
+        self,
+        db: Session,
+        ids: Iterable[Any],
+        *,
+        deleted: bool = False,
+        cascaded: Optional[Dict[str, List[str]]] = None,
+    ) -> None:
+        ids = list(ids)
+        super()._record_changes(db, ids, deleted=deleted, cascaded=cascaded)
+        machine_registry.record_on_commit(db, ids, deleted=deleted)
+        # Deleting a machine takes its events, and their triggers, with it
+        if cascaded and cascaded.get("events"):
+            trigger_index.mark_stale_on_commit(db)
+
+    def get(self, db: Session, id: Any) -> Optional[models.Machine]:
+        return self.status_buffer.apply(super().get(db, id=id))
+
+    def get_multi(
+        self, db: Session, *, skip: int = 0, limit: int = 100
+    ) -> List[models.Machine]:
+        return self.status_buffer.apply_all(super().get_multi(db, skip=skip, limit=limit))
+
+    def get_page(
+        self, db: Session, *, cursor: Optional[str] = None, limit: int = 100
+    ) -> Tuple[List[models.Machine], Optional[str]]:
+        machines, next_cursor = super().get_page(db, cursor=cursor, limit=limit)
+        return self.status_buffer.apply_all(machines), next_cursor
+
+    def get_rows(
+        self, db: Session, *, fields: Sequence[str], **kwargs: Any
+    ) -> Tuple[List[Row], Optional[str]]:
+        rows, next_cursor = super().get_rows(db, fields=fields, **kwargs)
+        return self.status_buffer.apply_rows(rows, fields), next_cursor
+
     def get_by_name(self, db: Session, *, name: str) -> Optional[models.Machine]:
-        return db.query(models.Machine).filter(models.Machine.name == name).first()
+        return self.status_buffer.apply(
+            db.query(models.Machine).filter(models.Machine.name == name).first()
+        )
     
     def get_by_ip_port(
         self, db: Session, *, ip_address: str, port: int
     ) -> Optional[models.Machine]:
-        return db.query(models.Machine).filter(
+        return self.status_buffer.apply(db.query(models.Machine).filter(
             models.Machine.ip_address == ip_address,
             models.Machine.port == port
-        ).first()
+        ).first())
+
+    def get_existing_ip_ports(
+        self, db: Session, *, ip_ports: Iterable[Tuple[str, int]]
+    ) -> Set[Tuple[str, int]]:
+        """Which (ip_address, port) pairs are already taken, in a single query"""
+        return set(self.get_ip_port_owners(db, ip_ports=ip_ports))
+
+    def get_ip_port_owners(
+        self, db: Session, *, ip_ports: Iterable[Tuple[str, int]]
+    ) -> Dict[Tuple[str, int], str]:
+        """The id of the machine holding each taken (ip_address, port) pair"""
+        wanted = set(ip_ports)
+        if not wanted:
+            return {}
+        # Probe on the leading ip_address column: SQLite can't seek an index
+        # with a row-value IN list, so matching pairs are picked out here.
+        rows = db.execute(
+            select(models.Machine.ip_address, models.Machine.port, models.Machine.id).where(
+                models.Machine.ip_address.in_({ip for ip, _ in wanted})
+            )
+        )
+        return {
+            (ip_address, port): id
+            for ip_address, port, id in rows
+            if (ip_address, port) in wanted
+        }
+
+    def get_ip_ports_by_id(
+        self, db: Session, *, ids: Iterable[str]
+    ) -> Dict[str, Tuple[str, int]]:
+        """Current (ip_address, port) of each of the given machines"""
+        ids = list(ids)
+        if not ids:
+            return {}
+        rows = db.execute(
+            select(models.Machine.id, models.Machine.ip_address, models.Machine.port).where(
+                models.Machine.id.in_(ids)
+            )
+        )
+        return {id: (ip_address, port) for id, ip_address, port in rows}
     
+    def set_status(self, *, id: str, status: str) -> None:
+        """
+        Record a machine's status through the write-behind buffer. It is
+        visible to reads here at once and reaches the database with the
+        next batched flush.
+        """
+        self.status_buffer.set(id, status)
+
+    def _discard_buffered_status(
+        self, id: Any, obj_in: Union[schemas.MachineUpdate, Dict[str, Any]]
+    ) -> None:
+        data = obj_in if isinstance(obj_in, dict) else obj_in.model_dump(exclude_unset=True)
+        if "status" in data:
+            self.status_buffer.discard([id])
+
+    def update(
+        self,
+        db: Session,
+        *,
+        db_obj: models.Machine,
+        obj_in: Union[schemas.MachineUpdate, Dict[str, Any]]
+    ) -> models.Machine:
+        self._discard_buffered_status(db_obj.id, obj_in)
+        return super().update(db, db_obj=db_obj, obj_in=obj_in)
+
+    def update_by_id(
+        self,
+        db: Session,
+        *,
+        id: Any,
+        obj_in: Union[schemas.MachineUpdate, Dict[str, Any]]
+    ) -> Optional[models.Machine]:
+        self._discard_buffered_status(id, obj_in)
+        return super().update_by_id(db, id=id, obj_in=obj_in)
+
+    def remove_by_id(self, db: Session, *, id: Any) -> Optional[models.Machine]:
+        self.status_buffer.discard([id])
+        return super().remove_by_id(db, id=id)
+
+    def remove_multi(self, db: Session, *, ids: List[str]) -> Set[str]:
+        self.status_buffer.discard(ids)
+        return super().remove_multi(db, ids=ids)
+
+    def remove(self, db: Session, *, id: str) -> models.Machine:
+        self.status_buffer.discard([id])
+        return super().remove(db, id=id)
+
     def update_status(
         self, db: Session, *, db_obj: models.Machine, status: str
     ) -> models.Machine:
+        self.status_buffer.discard([db_obj.id])
         db_obj.status = status
         db.add(db_obj)
+        self._record_changes(db, [db_obj.id])
         db.commit()
         db.refresh(db_obj)
         return db_obj
 
+    def update_status_by_id(
+        self, db: Session, *, id: str, status: str
+    ) -> Optional[models.Machine]:
+        return self.update_by_id(db, id=id, obj_in={"status": status})
+
+class AsyncCRUDMachine(
+    AsyncCRUDBase[CRUDMachine, models.Machine, schemas.MachineCreate, schemas.MachineUpdate]
+):
+    async def get_by_ip_port(
+        self, db: AsyncSession, *, ip_address: str, port: int
+    ) -> Optional[models.Machine]:
+        return await self._run(
+            db, self.crud.get_by_ip_port, ip_address=ip_address, port=port
+        )
+
+    async def get_existing_ip_ports(
+        self, db: AsyncSession, *, ip_ports: Iterable[Tuple[str, int]]
+    ) -> Set[Tuple[str, int]]:
+        return await self._run(db, self.crud.get_existing_ip_ports, ip_ports=list(ip_ports))
+
+    async def get_ip_port_owners(
+        self, db: AsyncSession, *, ip_ports: Iterable[Tuple[str, int]]
+    ) -> Dict[Tuple[str, int], str]:
+        return await self._run(db, self.crud.get_ip_port_owners, ip_ports=list(ip_ports))
+
+    async def get_ip_ports_by_id(
+        self, db: AsyncSession, *, ids: Iterable[str]
+    ) -> Dict[str, Tuple[str, int]]:
+        return await self._run(db, self.crud.get_ip_ports_by_id, ids=list(ids))
+
+    async def update_status(
+        self, db: AsyncSession, *, db_obj: models.Machine, status: str
+    ) -> models.Machine:
+        return await self._run(db, self.crud.update_status, db_obj=db_obj, status=status)
+
+    async def update_status_by_id(
+        self, db: AsyncSession, *, id: str, status: str
+    ) -> Optional[models.Machine]:
+        return await self._run(db, self.crud.update_status_by_id, id=id, status=status)
+
 machine = CRUDMachine(models.Machine)
+async_machine = AsyncCRUDMachine(machine)
@@ -1,20 +1,26 @@
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.security import get_password_hash, verify_password
+from app.core.hashing import hashing_pool
+from app.core.principal_cache import principal_cache
+from app.crud.async_base import AsyncCRUDBase
 from app.crud.base import CRUDBase
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
+    # Accounts are not part of the public change feed
+    logs_changes = False
+
     def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
         return db.query(User).filter(User.email == email).first()
 
     def create(self, db: Session, *, obj_in: UserCreate) -> User:
         db_obj = User(
             email=obj_in.email,
-            hashed_password=get_password_hash(obj_in.password),
+            hashed_password=hashing_pool.hash(obj_in.password),
             full_name=obj_in.full_name,
             is_superuser=obj_in.is_superuser,
         )
@@ -23,25 +29,93 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         db.refresh(db_obj)
         return db_obj
 
-    def update(
-        self, db: Session, *, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]
-    ) -> User:
+    def _update_data(
+        self, obj_in: Union[UserUpdate, Dict[str, Any]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Column values for an update, and whether it changes the user's rights"""
         if isinstance(obj_in, dict):
-            update_data = obj_in
+            update_data = dict(obj_in)
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        if "password" in update_data and update_data["password"]:
-            hashed_password = get_password_hash(update_data["password"])
-            del update_data["password"]
-            update_data["hashed_password"] = hashed_password
-        return super().update(db, db_obj=db_obj, obj_in=update_data)
+        password = update_data.pop("password", None)
+        if password:
+            update_data["hashed_password"] = hashing_pool.hash(password)
+        revokes = any(
+            field in update_data
+            for field in ("is_active", "is_superuser", "hashed_password")
+        )
+        # The flags are properties over underscored columns
+        for field in ("is_active", "is_superuser"):
+            if field in update_data:
+                update_data["_" + field] = update_data.pop(field)
+        return update_data, revokes
+
+    def update(
+        self, db: Session, *, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]
+    ) -> User:
+        update_data, revokes = self._update_data(obj_in)
+        user = super().update(db, db_obj=db_obj, obj_in=update_data)
+        # Cached principals read before the commit are refused by the
+        # generation this bumps; see PrincipalCache
+        if revokes:
+            principal_cache.invalidate_user(user.id)
+        return user
+
+    def update_by_id(
+        self, db: Session, *, id: Any, obj_in: Union[UserUpdate, Dict[str, Any]]
+    ) -> Optional[User]:
+        update_data, revokes = self._update_data(obj_in)
+        user = super().update_by_id(db, id=id, obj_in=update_data)
+        if revokes and user is not None:
+            principal_cache.invalidate_user(user.id)
+        return user
+
+    def update_multi(self, db: Session, *, objs_in: List[Dict[str, Any]]) -> Set[str]:
+        rows = []
+        revokes = False
+        for obj in objs_in:
+            update_data, revoked = self._update_data(obj)
+            rows.append(update_data)
+            revokes = revokes or revoked
+        updated = super().update_multi(db, objs_in=rows)
+        if revokes:
+            for user_id in updated:
+                principal_cache.invalidate_user(user_id)
+        return updated
+
+    def remove(self, db: Session, *, id: str) -> User:
+        user = super().remove(db, id=id)
+        principal_cache.invalidate_user(id)
+        return user
+
+    def remove_by_id(self, db: Session, *, id: Any) -> Optional[User]:
+        user = super().remove_by_id(db, id=id)
+        # The returned row is expired by the commit and can't be reloaded
+        if user is not None:
+            principal_cache.invalidate_user(id)
+        return user
+
+    def remove_multi(self, db: Session, *, ids: List[str]) -> Set[str]:
+        removed = super().remove_multi(db, ids=ids)
+        for user_id in removed:
+            principal_cache.invalidate_user(user_id)
+        return removed
 
     def authenticate(self, db: Session, *, email: str, password: str) -> Optional[User]:
         user = self.get_by_email(db, email=email)
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
+        verified, new_hash = hashing_pool.verify_and_update(
+            password, user.hashed_password
+        )
+        if not verified:
             return None
+        if new_hash:
+            # Stored hash used an outdated cost factor, upgrade it transparently
+            user.hashed_password = new_hash
+            db.add(user)
+            db.commit()
+            db.refresh(user)
         return user
 
     def is_active(self, user: User) -> bool:
@@ -50,4 +124,27 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
     def is_superuser(self, user: User) -> bool:
         return user.is_superuser
 
+class AsyncCRUDUser(AsyncCRUDBase[CRUDUser, User, UserCreate, UserUpdate]):
+    async def get_by_email(self, db: AsyncSession, *, email: str) -> Optional[User]:
+        return await self._run(db, self.crud.get_by_email, email=email)
+
+    async def authenticate(
+        self, db: AsyncSession, *, email: str, password: str
+    ) -> Optional[User]:
+        """`CRUDUser.authenticate` with the bcrypt check awaited on the hashing pool"""
+        user = await self.get_by_email(db, email=email)
+        if not user:
+            return None
+        verified, new_hash = await hashing_pool.verify_and_update_async(
+            password, user.hashed_password
+        )
+        if not verified:
+            return None
+        if new_hash:
+            user.hashed_password = new_hash
+            db.add(user)
+            await db.commit()
+        return user
+
 user = CRUDUser(User)
+async_user = AsyncCRUDUser(user)
@@ -0,0 +1,27 @@
+import base64
+import binascii
+import json
+from typing import Any, Dict
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor can't be decoded"""
+
+
+def encode_cursor(last_key: Any) -> str:
+    """Opaque cursor pointing just past the row with sort key `last_key`"""
+    raw = json.dumps({"k": last_key}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Any:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        data: Dict[str, Any] = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key = data["k"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as exc:
+        raise InvalidCursor("Invalid pagination cursor") from exc
+    # Only keys `encode_cursor` could have written reach the query
+    if not isinstance(key, (str, int)) or isinstance(key, bool):
+        raise InvalidCursor("Invalid pagination cursor")
+    return key
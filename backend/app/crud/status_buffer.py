@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.background import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class StatusBuffer(BackgroundTask):
+    """
+    Write-behind table of machine statuses.
+
+    `set` only records the latest status per machine in memory; repeated
+    updates to the same machine between flushes coalesce, last writer
+    wins. A background task writes whatever changed every `flush_interval`
+    seconds as one batched UPDATE and one commit through `crud`, so a crash
+    loses at most one interval of status changes. Reads through the CRUD
+    object overlay buffered statuses on what the database returns, including
+    the batch being written until it has committed.
+
+    `generation` counts buffered updates, so a validator for those reads can
+    change as soon as they do rather than when the next flush commits.
+    """
+
+    def __init__(
+        self,
+        crud: Any,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+        flush_interval: float = 0.5,
+    ):
+        self.crud = crud
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, str] = {}
+        # The batch a flush is writing; still overlaid, as it isn't committed
+        self._writing: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.updates = 0
+        self.coalesced = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    def set(self, machine_id: str, status: str) -> None:
+        with self._lock:
+            if machine_id in self._pending:
+                self.coalesced += 1
+            self._pending[machine_id] = status
+            self.generation += 1
+            self.updates += 1
+        self.start()
+
+    def get(self, machine_id: str) -> Optional[str]:
+        status = self._pending.get(machine_id)
+        return status if status is not None else self._writing.get(machine_id)
+
+    def discard(self, machine_ids: Iterable[str]) -> None:
+        """
+        Forget buffered statuses superseded by a direct write, including
+        ones in a batch being flushed that hasn't written them yet.
+        """
+        with self._lock:
+            for machine_id in machine_ids:
+                self._pending.pop(machine_id, None)
+                self._writing.pop(machine_id, None)
+
+    def apply(self, obj: T) -> T:
+        """Overlay the buffered status on a loaded machine without dirtying it"""
+        if obj is not None and (self._pending or self._writing):
+            status = self.get(obj.id)
+            if status is not None:
+                set_committed_value(obj, "status", status)
+        return obj
+
+    def apply_all(self, objs: List[T]) -> List[T]:
+        if self._pending or self._writing:
+            for obj in objs:
+                self.apply(obj)
+        return objs
+
+    def apply_rows(
+        self, rows: List[Sequence[Any]], fields: Sequence[str]
+    ) -> List[Sequence[Any]]:
+        """Same overlay for plain row tuples of the given columns"""
+        if not (self._pending or self._writing) or "status" not in fields:
+            return rows
+        id_at, status_at = list(fields).index("id"), list(fields).index("status")
+        patched = []
+        for row in rows:
+            status = self.get(row[id_at])
+            if status is not None:
+                row = (*row[:status_at], status, *row[status_at + 1:])
+            patched.append(row)
+        return patched
+
+    def flush(self, db: Session) -> int:
+        """Write buffered statuses in one batch; returns how many were written"""
+        with self._lock:
+            self._writing, self._pending = self._pending, {}
+        if not self._writing:
+            return 0
+        with self._lock:
+            rows = [{"id": id, "status": status} for id, status in self._writing.items()]
+        try:
+            self.crud.update_multi(db, objs_in=rows)
+        except Exception:
+            db.rollback()
+            self.failed_flushes += 1
+            with self._lock:
+                # Statuses set while we were writing are newer; keep those
+                self._pending = {**self._writing, **self._pending}
+                self._writing = {}
+            raise
+        with self._lock:
+            self._writing = {}
+        self.flushes += 1
+        self.written += len(rows)
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "updates": self.updates,
+            "coalesced": self.coalesced,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "flush_interval_ms": self.flush_interval * 1000,
+        }
+
+    def _should_run(self) -> bool:
+        return self.session_factory is not None
+
+    async def _drain(self) -> None:
+        if self._pending and self.session_factory is not None:
+            async with self.session_factory() as db:
+                await db.run_sync(self.flush)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if not self._pending:
+                continue
+            try:
+                async with self.session_factory() as db:
+                    await db.run_sync(self.flush)
+            except Exception:
+                logger.exception("Flushing machine statuses failed")
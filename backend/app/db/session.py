@@ -1,15 +1,140 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
+import json
+import uuid
+from typing import Any, Dict, Optional, Union
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import URL, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import sessionmaker
 
-from app.core.config import settings
+from app.core.config import Settings, settings
+from app.db.pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool
 
-engine = create_engine(
-    settings.SQLALCHEMY_DATABASE_URI, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_serializer(obj: Any) -> str:
+    """JSON column serializer that also accepts UUIDs"""
+    return json.dumps(obj, default=_json_default)
+
+
+def _sqlite_pragmas(config: Settings) -> Dict[str, Any]:
+    return {
+        "journal_mode": config.SQLITE_JOURNAL_MODE,
+        "synchronous": config.SQLITE_SYNCHRONOUS,
+        "cache_size": config.SQLITE_CACHE_SIZE,
+        "mmap_size": config.SQLITE_MMAP_SIZE,
+        "busy_timeout": config.SQLITE_BUSY_TIMEOUT_MS,
+        "foreign_keys": "ON",
+    }
+
+
+# Async drivers used when the configured URL names a sync one
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def _engine_options(url: URL, config: Settings, poolclass: Any) -> Dict[str, Any]:
+    is_sqlite = url.get_backend_name() == "sqlite"
+    in_memory = is_sqlite and url.database in (None, "", ":memory:")
+
+    engine_args: Dict[str, Any] = {"json_serializer": json_serializer}
+    if is_sqlite:
+        engine_args["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000,
+        }
+    if not in_memory:
+        engine_args.update(
+            poolclass=poolclass,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_pre_ping=not is_sqlite,
+        )
+    return engine_args
+
+
+def _install_sqlite_pragmas(engine: Engine, url: URL, config: Settings) -> None:
+    if url.get_backend_name() != "sqlite":
+        return
+    pragmas = _sqlite_pragmas(config)
+    if url.database in (None, "", ":memory:"):
+        pragmas.pop("journal_mode")
+        pragmas.pop("mmap_size")
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_db_engine(
+    database_uri: Optional[str] = None, config: Settings = settings
+) -> Engine:
+    """
+    Build the application's SQLAlchemy engine.
+
+    Every engine in the process should come from here so that pool sizing,
+    SQLite pragmas and pool metrics are applied consistently.
+    """
+    url = make_url(database_uri or config.SQLALCHEMY_DATABASE_URI)
+    engine = create_engine(url, **_engine_options(url, config, InstrumentedQueuePool))
+    _install_sqlite_pragmas(engine, url, config)
+    return engine
+
+
+def async_database_uri(database_uri: str) -> URL:
+    """Swap a sync driver for its asyncio counterpart (sqlite -> aiosqlite)"""
+    url = make_url(database_uri)
+    if url.get_dialect().is_async:
+        return url
+    async_driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if async_driver is None:
+        raise ValueError(f"No async driver configured for {url.drivername}")
+    return url.set(drivername=async_driver)
+
+
+def create_async_db_engine(
+    database_uri: Optional[str] = None, config: Settings = settings
+) -> AsyncEngine:
+    """Async counterpart of `create_db_engine` with the same tuning applied"""
+    url = async_database_uri(database_uri or config.SQLALCHEMY_DATABASE_URI)
+    engine = create_async_engine(
+        url, **_engine_options(url, config, InstrumentedAsyncQueuePool)
+    )
+    _install_sqlite_pragmas(engine.sync_engine, url, config)
+    return engine
+
+
+def pool_status(bind: Union[Engine, AsyncEngine]) -> Dict[str, Any]:
+    """Pool occupancy and checkout wait statistics for an engine"""
+    pool = bind.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        return pool.status_dict()
+    return {"status": pool.status()}
+
+
+engine = create_db_engine()
+SessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+    expire_on_commit=False
+)
 
 def get_db():
     db = SessionLocal()
@@ -17,3 +142,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Async engine and sessions for the API; scripts keep using the sync ones above
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
@@ -0,0 +1,35 @@
+from .cache import PlanCache, plan_cache
+from .conditions import ConditionError, compile_condition, compile_vectorized
+from .connections import ConnectionManager, MachineConnection, connection_manager
+from .dispatch import TriggerDispatcher, trigger_dispatcher
+from .executor import ActionDriver, ExecutionEngine, StepFailed
+from .history import HistoryBuffer, history_buffer
+from .ingest import IngestPipeline, ingest_pipeline
+from .plan import OutputHandle, Plan, PlanError, StepInfo, compile_actions
+from .registry import MachineRegistry, machine_registry
+from .runtime import Broadcaster, Execution, ExecutionRuntime, execution_runtime
+from .segments import SegmentStore, decode_block, encode_block, segment_store
+from .series import RingBuffer, RollupTier, Series, TimeSeriesStore, series_store
+from .simulation import SimulationResult, SimulatorDriver, TraceEntry, VirtualClockLoop, run_simulated, simulate
+from .state import MachineState, StateDriver, machine_state
+from .timers import TimeTrigger, Timer, TimingWheel, timing_wheel
+from .triggers import TriggerIndex, trigger_index
+
+__all__ = [
+    "PlanCache", "plan_cache",
+    "ConditionError", "compile_condition", "compile_vectorized",
+    "ConnectionManager", "MachineConnection", "connection_manager",
+    "TriggerDispatcher", "trigger_dispatcher",
+    "ActionDriver", "ExecutionEngine", "StepFailed",
+    "HistoryBuffer", "history_buffer",
+    "IngestPipeline", "ingest_pipeline",
+    "OutputHandle", "Plan", "PlanError", "StepInfo", "compile_actions",
+    "MachineRegistry", "machine_registry",
+    "Broadcaster", "Execution", "ExecutionRuntime", "execution_runtime",
+    "SegmentStore", "decode_block", "encode_block", "segment_store",
+    "RingBuffer", "RollupTier", "Series", "TimeSeriesStore", "series_store",
+    "SimulationResult", "SimulatorDriver", "TraceEntry", "VirtualClockLoop", "run_simulated", "simulate",
+    "MachineState", "StateDriver", "machine_state",
+    "TimeTrigger", "Timer", "TimingWheel", "timing_wheel",
+    "TriggerIndex", "trigger_index",
+]
@@ -0,0 +1,169 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.engine.plan import Plan, compile_actions, content_hash
+from app.models.event import Event
+
+# Session.info key for event ids whose plans go stale when the session commits
+_PENDING_KEY = "plan_cache_invalidate"
+# Session.info key for the cache revision the session's transaction began at
+_REVISION_KEY = "plan_cache_revision"
+
+
+class PlanCache:
+    """
+    Compiled plans keyed by event id and the machine they run on, backed by
+    a second map keyed by content hash so events with identical actions
+    share one plan. Output handles are bound to that machine, so an event
+    run on several machines has a plan for each.
+
+    A lookup by event id is a dict hit; the hash is only computed when an
+    event's plan isn't cached yet. CRUD writes to events drop their entries,
+    found through a reverse index by event id, once the write commits, and
+    each drop advances the cache's `revision`. Events loaded from the
+    database carry the revision their transaction began at (see the session
+    hooks below): a copy read before the event last changed still gets a
+    plan, but it isn't cached, so a run that loaded an event before an
+    update can't shadow the new plan.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._by_event: "OrderedDict[Tuple[str, Optional[str]], Plan]" = OrderedDict()
+        self._keys_by_event: Dict[str, Set[Tuple[str, Optional[str]]]] = {}
+        self._by_hash: "OrderedDict[str, Plan]" = OrderedDict()
+        # Revision at which each event was last written
+        self._changed_at: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.revision = 0
+        self.hits = 0
+        self.misses = 0
+        self.compiles = 0
+
+    def get(
+        self,
+        event_id: Any,
+        actions: Any,
+        machine_id: Optional[str] = None,
+        revision: Optional[int] = None,
+    ) -> Plan:
+        """
+        Plan for an event, compiling it on first use; raises PlanError.
+        `revision` is the cache revision the event was read at, None for
+        an event that is current.
+        """
+        event_id = str(event_id)
+        key = (event_id, machine_id)
+        with self._lock:
+            plan = self._by_event.get(key)
+            if plan is not None:
+                self._by_event.move_to_end(key)
+                self.hits += 1
+                return plan
+            self.misses += 1
+        digest = content_hash(actions, machine_id)
+        with self._lock:
+            plan = self._by_hash.get(digest)
+        if plan is None:
+            plan = compile_actions(actions, machine_id, digest=digest)
+            with self._lock:
+                self.compiles += 1
+        with self._lock:
+            self._put(self._by_hash, digest, plan)
+            current = revision is None or revision >= self._changed_at.get(event_id, 0)
+            if current:
+                self._by_event[key] = plan
+                self._keys_by_event.setdefault(event_id, set()).add(key)
+                while len(self._by_event) > self.max_size:
+                    self._drop(next(iter(self._by_event)))
+        return plan
+
+    def invalidate(self, event_ids: Iterable[Any]) -> None:
+        with self._lock:
+            self.revision += 1
+            for event_id in {str(event_id) for event_id in event_ids}:
+                self._changed_at[event_id] = self.revision
+                # Every machine's plan for this event
+                for key in self._keys_by_event.pop(event_id, ()):
+                    del self._by_event[key]
+
+    def invalidate_on_commit(self, db: Session, event_ids: Iterable[Any]) -> None:
+        """
+        Drop these events' plans when `db` commits. Dropping them before the
+        commit would let a concurrent run re-cache the old actions.
+        """
+        db.info.setdefault(_PENDING_KEY, set()).update(str(id) for id in event_ids)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_event.clear()
+            self._keys_by_event.clear()
+            self._by_hash.clear()
+            self.hits = 0
+            self.misses = 0
+            self.compiles = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "events": len(self._by_event),
+                "plans": len(self._by_hash),
+                "max_size": self.max_size,
+                "revision": self.revision,
+                "hits": self.hits,
+                "misses": self.misses,
+                "compiles": self.compiles,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _drop(self, key: Tuple[str, Optional[str]]) -> None:
+        del self._by_event[key]
+        keys = self._keys_by_event.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_event[key[0]]
+
+    def _put(self, entries: "OrderedDict[Any, Any]", key: Any, value: Any) -> None:
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+
+
+plan_cache = PlanCache(max_size=settings.PLAN_CACHE_MAX_SIZE)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    event_ids = session.info.pop(_PENDING_KEY, None)
+    if event_ids:
+        plan_cache.invalidate(event_ids)
+
+
+@event.listens_for(Session, "after_begin")
+def _remember_revision(session: Session, transaction: Any, connection: Any) -> None:
+    # Taken before anything is read, so it is never newer than what the
+    # transaction sees
+    session.info[_REVISION_KEY] = plan_cache.revision
+
+
+@event.listens_for(Event, "load")
+def _stamp_loaded(target: Event, context: Any) -> None:
+    target.plan_revision = context.session.info.get(_REVISION_KEY)
+
+
+@event.listens_for(Event, "refresh")
+def _stamp_refreshed(target: Event, context: Any, attrs: Any) -> None:
+    target.plan_revision = context.session.info.get(_REVISION_KEY)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(_PENDING_KEY, None)
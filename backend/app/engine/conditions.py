@@ -0,0 +1,513 @@
+"""
+Compile `Condition` trees (and / or / not / input / compare / time) into
+Python closures.
+
+Operands are resolved once at compile time: literal values are baked in and
+input references become (machine_id, input_id) keys into an input snapshot.
+Branches that don't depend on inputs or the clock are folded to constants,
+and `and` / `or` short-circuit at run time.
+
+A compiled condition is called as `condition(inputs, machine_id, now)`:
+
+* `inputs` maps (machine_id, input_id) to the latest value,
+* `machine_id` is the machine the run is for, used by operands without an
+  explicit `machineId`,
+* `now` is an aware datetime, or None for the current time.
+
+`compile_vectorized` builds the same tree over NumPy arrays instead: one
+call evaluates a condition for every machine in a snapshot matrix.
+"""
+import operator
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, List, Mapping, Optional, Sequence, Set, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is only needed for vectorized mode
+    np = None
+
+Inputs = Mapping[Tuple[Optional[str], str], Any]
+CompiledCondition = Callable[[Inputs, Optional[str], Optional[datetime]], bool]
+
+
+class ConditionError(ValueError):
+    """A condition tree that can't be compiled; `path` locates the bad node"""
+
+    def __init__(self, path: str, message: str):
+        super().__init__(f"{path}: {message}")
+        self.path = path
+        self.message = message
+
+
+def _contains(left: Any, right: Any) -> bool:
+    return right in left
+
+
+def _starts_with(left: Any, right: Any) -> bool:
+    return left.startswith(right)
+
+
+def _ends_with(left: Any, right: Any) -> bool:
+    return left.endswith(right)
+
+
+OPERATORS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "gt": operator.gt,
+    "lt": operator.lt,
+    "gte": operator.ge,
+    "lte": operator.le,
+    "contains": _contains,
+    "startsWith": _starts_with,
+    "endsWith": _ends_with,
+}
+INPUT_OPERATORS = frozenset({"eq", "ne", "gt", "lt", "gte", "lte", "between"})
+TIME_OPERATORS = frozenset({"before", "after", "between", "weekday"})
+
+
+class _Constant:
+    """Marks a subtree folded to a fixed result at compile time"""
+
+    def __init__(self, value: bool):
+        self.value = value
+
+
+def _always(value: bool) -> CompiledCondition:
+    def constant(inputs: Inputs, machine_id: Optional[str], now: Optional[datetime]) -> bool:
+        return value
+    return constant
+
+
+def compile_condition(tree: Any, machine_id: Optional[str] = None) -> CompiledCondition:
+    """
+    Compile a condition tree. `machine_id` binds inputs that don't name a
+    machine; leave it None to take the machine from each call instead.
+    """
+    node = _ScalarCompiler(machine_id).node(tree, "condition")
+    if isinstance(node, _Constant):
+        return _always(node.value)
+    return node
+
+
+def _minutes(value: Any, path: str) -> int:
+    try:
+        hours, minutes = str(value).split(":")
+        hours, minutes = int(hours), int(minutes)
+    except ValueError:
+        raise ConditionError(path, f"invalid time {value!r}, expected HH:MM")
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ConditionError(path, f"invalid time {value!r}, expected HH:MM")
+    return hours * 60 + minutes
+
+
+def _time_test(tree: Mapping[str, Any], path: str) -> Callable[[Optional[datetime]], bool]:
+    """Shared by both compilers: a check of the wall clock in the condition's timezone"""
+    op = tree.get("operator")
+    if op not in TIME_OPERATORS:
+        raise ConditionError(path, f"unknown time operator {op!r}")
+    zone = None
+    if tree.get("timezone"):
+        try:
+            zone = ZoneInfo(tree["timezone"])
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ConditionError(path, f"unknown timezone {tree['timezone']!r}")
+    weekdays = tree.get("weekdays")
+    days = frozenset(weekdays) if weekdays is not None else None
+    if op == "weekday" and days is None:
+        raise ConditionError(path, "weekdays is required")
+    start = _minutes(tree.get("time"), path) if op != "weekday" else 0
+    end = _minutes(tree.get("time2"), path) if op == "between" else 0
+
+    def test(now: Optional[datetime]) -> bool:
+        now = now or datetime.now(timezone.utc)
+        local = now.astimezone(zone) if zone else now.astimezone()
+        # weekdays are 0-6 starting on Sunday
+        if days is not None and (local.weekday() + 1) % 7 not in days:
+            return False
+        minute = local.hour * 60 + local.minute
+        if op == "before":
+            return minute < start
+        if op == "after":
+            return minute >= start
+        if op == "between":
+            if start <= end:
+                return start <= minute < end
+            return minute >= start or minute < end
+        return True
+
+    return test
+
+
+def next_fire_time(tree: Mapping[str, Any], after: datetime) -> datetime:
+    """
+    When a time condition next turns true, strictly after `after` (an aware
+    datetime). A scheduler can sleep until then instead of polling: "after"
+    and "between" fire at their start time, "before" and "weekday" at
+    midnight, all limited to `weekdays` when given.
+    """
+    path = "condition"
+    _time_test(tree, path)  # validates the node
+    op = tree["operator"]
+    zone = ZoneInfo(tree["timezone"]) if tree.get("timezone") else None
+    weekdays = tree.get("weekdays")
+    start = _minutes(tree["time"], path) if op in ("after", "between") else 0
+    local = after.astimezone(zone) if zone else after.astimezone()
+    # Eight days covers every weekday plus today's start having passed
+    for offset in range(8):
+        day = local.date() + timedelta(days=offset)
+        if weekdays is not None and (day.weekday() + 1) % 7 not in weekdays:
+            continue
+        candidate = datetime(day.year, day.month, day.day, start // 60, start % 60)
+        candidate = candidate.replace(tzinfo=zone) if zone else candidate.astimezone()
+        if candidate > after:
+            return candidate
+    raise ConditionError(path, "weekdays selects no day")
+
+
+class _ScalarCompiler:
+    def __init__(self, machine_id: Optional[str]):
+        self.machine_id = machine_id
+
+    def node(self, tree: Any, path: str) -> Any:
+        if not isinstance(tree, Mapping):
+            raise ConditionError(path, "condition must be an object")
+        compile_node = {
+            "and": self._and,
+            "or": self._or,
+            "not": self._not,
+            "input": self._input,
+            "compare": self._compare,
+            "time": self._time,
+        }.get(tree.get("type"))
+        if compile_node is None:
+            raise ConditionError(path, f"unknown condition type {tree.get('type')!r}")
+        return compile_node(tree, path)
+
+    def _children(self, tree: Mapping[str, Any], path: str) -> List[Any]:
+        conditions = tree.get("conditions")
+        if not isinstance(conditions, (list, tuple)):
+            raise ConditionError(path, "conditions must be a list")
+        return [self.node(child, f"{path}.conditions[{i}]") for i, child in enumerate(conditions)]
+
+    def _and(self, tree: Mapping[str, Any], path: str) -> Any:
+        children = []
+        for child in self._children(tree, path):
+            if isinstance(child, _Constant):
+                if not child.value:
+                    return _Constant(False)
+                continue
+            children.append(child)
+        if not children:
+            return _Constant(True)
+        if len(children) == 1:
+            return children[0]
+        children = tuple(children)
+
+        def all_of(inputs: Inputs, machine_id: Optional[str], now: Optional[datetime]) -> bool:
+            for child in children:
+                if not child(inputs, machine_id, now):
+                    return False
+            return True
+
+        return all_of
+
+    def _or(self, tree: Mapping[str, Any], path: str) -> Any:
+        children = []
+        for child in self._children(tree, path):
+            if isinstance(child, _Constant):
+                if child.value:
+                    return _Constant(True)
+                continue
+            children.append(child)
+        if not children:
+            return _Constant(False)
+        if len(children) == 1:
+            return children[0]
+        children = tuple(children)
+
+        def any_of(inputs: Inputs, machine_id: Optional[str], now: Optional[datetime]) -> bool:
+            for child in children:
+                if child(inputs, machine_id, now):
+                    return True
+            return False
+
+        return any_of
+
+    def _not(self, tree: Mapping[str, Any], path: str) -> Any:
+        child = self.node(tree.get("condition"), f"{path}.condition")
+        if isinstance(child, _Constant):
+            return _Constant(not child.value)
+
+        def negate(inputs: Inputs, machine_id: Optional[str], now: Optional[datetime]) -> bool:
+            return not child(inputs, machine_id, now)
+
+        return negate
+
+    def _reader(self, input_id: Any, machine_id: Any, path: str) -> Callable[[Inputs, Optional[str]], Any]:
+        if not isinstance(input_id, str) or not input_id:
+            raise ConditionError(path, "inputId is required")
+        bound = machine_id or self.machine_id
+        if bound is not None:
+            key = (bound, input_id)
+            return lambda inputs, machine_id: inputs.get(key)
+        return lambda inputs, machine_id: inputs.get((machine_id, input_id))
+
+    def _input(self, tree: Mapping[str, Any], path: str) -> Any:
+        op = tree.get("operator")
+        if op not in INPUT_OPERATORS:
+            raise ConditionError(path, f"unknown input operator {op!r}")
+        read = self._reader(tree.get("inputId"), tree.get("machineId"), path)
+        value = tree.get("value")
+        if op == "between":
+            low, high = value, tree.get("value2")
+
+            def between(inputs: Inputs, machine_id: Optional[str], now: Optional[datetime]) -> bool:
+                current = read(inputs, machine_id)
+                try:
+                    return current is not None and low <= current <= high
+                except TypeError:
+                    return False
+
+            return between
+        return self._test(read, OPERATORS[op], lambda inputs, machine_id: value)
+
+    def _operand(self, operand: Any, path: str) -> Tuple[bool, Any]:
+        """(is_constant, value or reader) for one side of a compare"""
+        if not isinstance(operand, Mapping):
+            raise ConditionError(path, "operand must be an object")
+        if operand.get("type") == "value":
+            return True, operand.get("value")
+        if operand.get("type") == "input":
+            return False, self._reader(operand.get("inputId"), operand.get("machineId"), path)
+        raise ConditionError(path, f"unknown operand type {operand.get('type')!r}")
+
+    def _compare(self, tree: Mapping[str, Any], path: str) -> Any:
+        op = tree.get("operator")
+        if op not in OPERATORS:
+            raise ConditionError(path, f"unknown compare operator {op!r}")
+        compare = OPERATORS[op]
+        left_constant, left = self._operand(tree.get("left"), f"{path}.left")
+        right_constant, right = self._operand(tree.get("right"), f"{path}.right")
+        if left_constant and right_constant:
+            try:
+                return _Constant(bool(compare(left, right)))
+            except (TypeError, AttributeError):
+                return _Constant(False)
+        if left_constant:
+            left = (lambda value: lambda inputs, machine_id: value)(left)
+        if right_constant:
+            right = (lambda value: lambda inputs, machine_id: value)(right)
+        return self._test(left, compare, right)
+
+    @staticmethod
+    def _test(left: Callable, compare: Callable[[Any, Any], Any], right: Callable) -> CompiledCondition:
+        def test(inputs: Inputs, machine_id: Optional[str], now: Optional[datetime]) -> bool:
+            a = left(inputs, machine_id)
+            b = right(inputs, machine_id)
+            # A missing input never satisfies a comparison
+            if a is None or b is None:
+                return False
+            try:
+                return bool(compare(a, b))
+            except (TypeError, AttributeError):
+                return False
+
+        return test
+
+    def _time(self, tree: Mapping[str, Any], path: str) -> Any:
+        check = _time_test(tree, path)
+        return lambda inputs, machine_id, now: check(now)
+
+
+def referenced_inputs(
+    tree: Any, machine_id: Optional[str] = None
+) -> Set[Tuple[Optional[str], str]]:
+    """
+    (machine_id, input_id) pairs a condition reads. Inputs that don't name a
+    machine resolve to `machine_id`, or stay None for "any machine". Nodes
+    that don't parse are skipped rather than rejected.
+    """
+    found: Set[Tuple[Optional[str], str]] = set()
+    pending = [tree]
+    while pending:
+        node = pending.pop()
+        if not isinstance(node, Mapping):
+            continue
+        refs = [node]
+        if node.get("type") == "compare":
+            refs = [node.get("left"), node.get("right")]
+        for ref in refs:
+            if isinstance(ref, Mapping) and ref.get("type") == "input" and ref.get("inputId"):
+                found.add((ref.get("machineId") or machine_id, ref["inputId"]))
+        children = node.get("conditions")
+        if isinstance(children, (list, tuple)):
+            pending.extend(children)
+        if "condition" in node:
+            pending.append(node["condition"])
+    return found
+
+
+# Vectorized mode
+
+VectorCondition = Callable[[Any, Optional[datetime]], Any]
+
+VECTOR_OPERATORS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "gt": operator.gt,
+    "lt": operator.lt,
+    "gte": operator.ge,
+    "lte": operator.le,
+}
+
+
+def compile_vectorized(tree: Any, columns: Sequence[str]) -> VectorCondition:
+    """
+    Compile a condition to run over many machines at once.
+
+    `columns` names the input id held in each column of the snapshot
+    matrix. The result is called as `condition(values, now)` with `values` a
+    float array of shape (machines, len(columns)), NaN where a machine has no
+    reading, and returns a boolean array with one entry per machine.
+
+    Only numeric and boolean comparisons vectorize; string operators and
+    inputs pinned to one `machineId` raise ConditionError.
+    """
+    if np is None:
+        raise RuntimeError("Vectorized conditions need numpy installed")
+    node = _VectorCompiler({name: index for index, name in enumerate(columns)}).node(
+        tree, "condition"
+    )
+
+    def evaluate(values: Any, now: Optional[datetime] = None) -> Any:
+        values = np.asarray(values, dtype=np.float64)
+        if isinstance(node, _Constant):
+            return np.full(values.shape[0], node.value)
+        return np.broadcast_to(node(values, now), (values.shape[0],))
+
+    return evaluate
+
+
+class _VectorCompiler:
+    def __init__(self, columns: Mapping[str, int]):
+        self.columns = columns
+
+    def node(self, tree: Any, path: str) -> Any:
+        if not isinstance(tree, Mapping):
+            raise ConditionError(path, "condition must be an object")
+        kind = tree.get("type")
+        if kind in ("and", "or"):
+            return self._combine(tree, path, kind == "and")
+        if kind == "not":
+            child = self.node(tree.get("condition"), f"{path}.condition")
+            if isinstance(child, _Constant):
+                return _Constant(not child.value)
+            return lambda values, now: ~child(values, now)
+        if kind == "input":
+            return self._input(tree, path)
+        if kind == "compare":
+            return self._compare(tree, path)
+        if kind == "time":
+            # The clock is the same for every machine: one scalar check per call
+            check = _time_test(tree, path)
+            return lambda values, now: np.bool_(check(now))
+        raise ConditionError(path, f"unknown condition type {kind!r}")
+
+    def _combine(self, tree: Mapping[str, Any], path: str, conjunction: bool) -> Any:
+        conditions = tree.get("conditions")
+        if not isinstance(conditions, (list, tuple)):
+            raise ConditionError(path, "conditions must be a list")
+        children = []
+        for i, child in enumerate(conditions):
+            child = self.node(child, f"{path}.conditions[{i}]")
+            if isinstance(child, _Constant):
+                if child.value != conjunction:
+                    return _Constant(child.value)
+                continue
+            children.append(child)
+        if not children:
+            return _Constant(conjunction)
+        if len(children) == 1:
+            return children[0]
+        children = tuple(children)
+        combine = np.logical_and if conjunction else np.logical_or
+
+        def combined(values: Any, now: Optional[datetime]) -> Any:
+            result = children[0](values, now)
+            for child in children[1:]:
+                # Stop once every machine is decided
+                if conjunction and not result.any():
+                    break
+                if not conjunction and result.all():
+                    break
+                result = combine(result, child(values, now))
+            return result
+
+        return combined
+
+    def _column(self, input_id: Any, machine_id: Any, path: str) -> int:
+        if machine_id:
+            raise ConditionError(path, "inputs pinned to one machine can't be vectorized")
+        if input_id not in self.columns:
+            raise ConditionError(path, f"input {input_id!r} has no snapshot column")
+        return self.columns[input_id]
+
+    def _input(self, tree: Mapping[str, Any], path: str) -> Any:
+        op = tree.get("operator")
+        column = self._column(tree.get("inputId"), tree.get("machineId"), path)
+        if op == "between":
+            low = self._number(tree.get("value"), f"{path}.value")
+            high = self._number(tree.get("value2"), f"{path}.value2")
+            return lambda values, now: (values[:, column] >= low) & (values[:, column] <= high)
+        if op not in VECTOR_OPERATORS:
+            raise ConditionError(path, f"operator {op!r} can't be vectorized")
+        return self._test(
+            lambda values: values[:, column],
+            VECTOR_OPERATORS[op],
+            self._number(tree.get("value"), f"{path}.value"),
+        )
+
+    def _compare(self, tree: Mapping[str, Any], path: str) -> Any:
+        op = tree.get("operator")
+        if op not in VECTOR_OPERATORS:
+            raise ConditionError(path, f"operator {op!r} can't be vectorized")
+        sides = []
+        for side in ("left", "right"):
+            operand = tree.get(side)
+            if not isinstance(operand, Mapping):
+                raise ConditionError(f"{path}.{side}", "operand must be an object")
+            if operand.get("type") == "value":
+                sides.append(self._number(operand.get("value"), f"{path}.{side}.value"))
+            else:
+                column = self._column(operand.get("inputId"), operand.get("machineId"), f"{path}.{side}")
+                sides.append((lambda c: lambda values: values[:, c])(column))
+        left, right = sides
+        if not callable(left) and not callable(right):
+            return _Constant(bool(VECTOR_OPERATORS[op](left, right)))
+        if not callable(left):
+            # Flip so the constant is on the right, as _test expects
+            flipped = {"gt": "lt", "lt": "gt", "gte": "lte", "lte": "gte"}.get(op, op)
+            return self._test(right, VECTOR_OPERATORS[flipped], left)
+        return self._test(left, VECTOR_OPERATORS[op], right)
+
+    @staticmethod
+    def _number(value: Any, path: str) -> float:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise ConditionError(path, f"expected a number, got {value!r}") from None
+
+    @staticmethod
+    def _test(left: Callable, compare: Callable[[Any, Any], Any], right: Any) -> Any:
+        if callable(right):
+            def test(values: Any, now: Optional[datetime]) -> Any:
+                a, b = left(values), right(values)
+                # NaN (no reading) never satisfies a comparison, ne included
+                return compare(a, b) & ~(np.isnan(a) | np.isnan(b))
+        else:
+            def test(values: Any, now: Optional[datetime]) -> Any:
+                a = left(values)
+                return compare(a, right) & ~np.isnan(a)
+        return test
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Set, Tuple
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.engine.simulation import SIMULATOR_TYPE
+
+logger = logging.getLogger(__name__)
+
+ONLINE = "online"
+OFFLINE = "offline"
+ERROR = "error"
+
+Endpoint = Tuple[str, int]
+
+
+class MachineConnection:
+    """
+    One keep-alive HTTP connection to a machine endpoint.
+
+    Probes reuse the same pooled connection. When one fails the connection
+    is dropped and the next attempt waits out a jittered exponential
+    backoff (full jitter: a random delay up to `base * 2**failures`, capped
+    at `backoff_max`), so a rack that goes dark doesn't get reconnect
+    storms in lockstep.
+    """
+
+    def __init__(
+        self,
+        endpoint: Endpoint,
+        *,
+        health_path: str = "/health",
+        timeout: float = 2.0,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        rng: random.Random = random,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.endpoint = endpoint
+        self.health_path = health_path
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.transport = transport
+        self.rng = rng
+        self.clock = clock
+        self.machine_ids: Set[str] = set()
+        self.status = OFFLINE
+        self.failures = 0
+        self.retry_at = 0.0
+        self.connects = 0
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            ip_address, port = self.endpoint
+            self._client = httpx.AsyncClient(
+                base_url=f"http://{ip_address}:{port}",
+                limits=httpx.Limits(max_connections=1, max_keepalive_connections=1),
+                timeout=self.timeout,
+                transport=self.transport,
+            )
+            self.connects += 1
+        return self._client
+
+    def backoff(self) -> float:
+        ceiling = min(self.backoff_max, self.backoff_base * 2 ** (self.failures - 1))
+        return self.rng.uniform(0, ceiling)
+
+    async def probe(self) -> str:
+        """Check the machine's health endpoint and return its status"""
+        if self.clock() < self.retry_at:
+            return self.status
+        try:
+            response = await self.client.get(self.health_path)
+        except httpx.HTTPError as exc:
+            self.failures += 1
+            self.retry_at = self.clock() + self.backoff()
+            self.status = OFFLINE
+            logger.debug("Probe of %s:%s failed: %s", *self.endpoint, exc)
+            await self.close()
+        else:
+            self.failures = 0
+            self.retry_at = 0.0
+            self.status = ONLINE if response.is_success else ERROR
+        return self.status
+
+    async def close(self) -> None:
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+
+class ConnectionManager:
+    """
+    Keeps one connection per machine (ip_address, port) and the machines'
+    `status` column current.
+
+    Every `probe_interval` seconds the manager reloads the machine list and
+    probes every endpoint concurrently (at most `max_concurrent_probes` at
+    a time). Statuses that changed go through the machine status buffer,
+    which writes them in batches. Simulated machines have no endpoint and
+    are always online, and so is a machine that pushed telemetry within the
+    last two probe intervals, whatever its endpoint answers.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        *,
+        probe_interval: float = 10.0,
+        max_concurrent_probes: int = 100,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        clock: Callable[[], float] = time.monotonic,
+        **connection_options: Any,
+    ):
+        self.session_factory = session_factory
+        self.probe_interval = probe_interval
+        self.max_concurrent_probes = max_concurrent_probes
+        self.transport = transport
+        self.clock = clock
+        self.connection_options = connection_options
+        self.connections: Dict[Endpoint, MachineConnection] = {}
+        self.statuses: Dict[str, str] = {}
+        # Clock time of each machine's latest telemetry push
+        self.pushed: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.probes = 0
+        self.status_changes = 0
+
+    def sync(self, machines: Iterable[Mapping[str, Any]]) -> None:
+        """Open connections for new endpoints and drop those no machine uses"""
+        from app import crud
+
+        wanted: Dict[Endpoint, Set[str]] = {}
+        self.statuses = {}
+        for machine in machines:
+            status = crud.machine.status_buffer.get(machine["id"]) or machine["status"]
+            self.statuses[machine["id"]] = status
+            if machine["type"] == SIMULATOR_TYPE:
+                self._set_status(machine["id"], ONLINE)
+                continue
+            wanted.setdefault((machine["ip_address"], machine["port"]), set()).add(machine["id"])
+        # Forget pushes that no longer keep a machine online
+        cutoff = self.clock() - 2 * self.probe_interval
+        self.pushed = {id: at for id, at in self.pushed.items() if at > cutoff}
+        for endpoint in self.connections.keys() - wanted.keys():
+            connection = self.connections.pop(endpoint)
+            asyncio.get_running_loop().create_task(connection.close())
+        for endpoint, machine_ids in wanted.items():
+            connection = self.connections.get(endpoint)
+            if connection is None:
+                connection = self.connections[endpoint] = MachineConnection(
+                    endpoint, transport=self.transport, clock=self.clock,
+                    **self.connection_options,
+                )
+            connection.machine_ids = machine_ids
+
+    def heard_from(self, machine_ids: Iterable[str]) -> None:
+        """Machines that just pushed telemetry; marks any not online online"""
+        now = self.clock()
+        for machine_id in machine_ids:
+            self.pushed[machine_id] = now
+            if self.statuses.get(machine_id, ONLINE) != ONLINE:
+                self._set_status(machine_id, ONLINE)
+
+    async def refresh(self) -> None:
+        """Reload the machine list from the database"""
+        from app import crud
+
+        machines = []
+        async with self.session_factory() as db:
+            async for batch in crud.async_machine.stream_rows(db):
+                machines.extend(batch)
+        self.sync(machines)
+
+    async def probe_all(self) -> int:
+        """Probe every endpoint concurrently; returns how many statuses changed"""
+        semaphore = asyncio.Semaphore(self.max_concurrent_probes)
+        changes = self.status_changes
+
+        async def probe(connection: MachineConnection) -> None:
+            async with semaphore:
+                status = await connection.probe()
+            cutoff = self.clock() - 2 * self.probe_interval
+            for machine_id in connection.machine_ids:
+                if self.pushed.get(machine_id, cutoff) > cutoff:
+                    self._set_status(machine_id, ONLINE)
+                else:
+                    self._set_status(machine_id, status)
+
+        connections = list(self.connections.values())
+        await asyncio.gather(*(probe(connection) for connection in connections))
+        self.probes += len(connections)
+        return self.status_changes - changes
+
+    async def run_once(self) -> None:
+        await self.refresh()
+        await self.probe_all()
+
+    def _set_status(self, machine_id: str, status: str) -> None:
+        from app import crud
+
+        if self.statuses.get(machine_id) != status:
+            self.statuses[machine_id] = status
+            crud.machine.set_status(id=machine_id, status=status)
+            self.status_changes += 1
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.gather(*(connection.close() for connection in self.connections.values()))
+        self.connections.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for connection in self.connections.values():
+            counts[connection.status] = counts.get(connection.status, 0) + 1
+        return {
+            "endpoints": len(self.connections),
+            "by_status": counts,
+            "backing_off": sum(
+                1 for connection in self.connections.values()
+                if connection.retry_at > self.clock()
+            ),
+            "probes": self.probes,
+            "status_changes": self.status_changes,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            started = self.clock()
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Machine health check round failed")
+            await asyncio.sleep(max(self.probe_interval - (self.clock() - started), 0))
+
+
+connection_manager = ConnectionManager(
+    AsyncSessionLocal,
+    probe_interval=settings.MACHINE_PROBE_INTERVAL_SECONDS,
+    max_concurrent_probes=settings.MACHINE_PROBE_CONCURRENCY,
+    health_path=settings.MACHINE_HEALTH_PATH,
+    timeout=settings.MACHINE_PROBE_TIMEOUT_SECONDS,
+    backoff_base=settings.MACHINE_RECONNECT_BACKOFF_SECONDS,
+    backoff_max=settings.MACHINE_RECONNECT_BACKOFF_MAX_SECONDS,
+)
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.engine.conditions import ConditionError
+from app.engine.plan import PlanError
+from app.engine.runtime import ExecutionRuntime, execution_runtime
+from app.engine.state import MachineState, machine_state
+from app.engine.timers import TimeTrigger, TimingWheel, timing_wheel
+from app.engine.triggers import TriggerIndex, trigger_index
+
+logger = logging.getLogger(__name__)
+
+
+class TriggerDispatcher:
+    """
+    Runs input-triggered events when the inputs they read change.
+
+    Registered as an ingest sink: for every batch it looks up, per machine,
+    only the events the trigger index lists for the inputs that batch
+    carried, and evaluates their compiled triggers against the latest
+    values in `MachineState`. An event fires on a rising edge, when its
+    trigger turns true for a machine, and not again until it has been false.
+    Firing loads the event and submits it to the runtime, on the event's
+    own machine or, for triggers on "any machine", the one that changed.
+
+    Events with a "time" trigger instead get a `TimeTrigger` on `timers`
+    and fire at each of its fire times, on their own machine if they have
+    one.
+
+    The index is loaded when the app starts and re-synced off the event loop
+    whenever an event write marks it stale; time triggers are re-armed from
+    each sync.
+    """
+
+    def __init__(
+        self,
+        index: TriggerIndex,
+        state: MachineState,
+        runtime: ExecutionRuntime,
+        session_factory: Callable[[], Session],
+        async_session_factory: Callable[[], AsyncSession],
+        timers: TimingWheel = timing_wheel,
+    ):
+        self.index = index
+        self.state = state
+        self.runtime = runtime
+        self.session_factory = session_factory
+        self.async_session_factory = async_session_factory
+        self.timers = timers
+        # (event id, machine id) pairs whose trigger was true when last evaluated
+        self._active: Set[Tuple[str, Optional[str]]] = set()
+        # Time-triggered event id -> the trigger and machine it was armed for, and its timer
+        self._scheduled: Dict[str, Tuple[Tuple[Any, Optional[str]], TimeTrigger]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.evaluated = 0
+        self.fired = 0
+        self.failed = 0
+        index.subscribe(self._index_stale)
+
+    def __call__(self, frames: Sequence[Any]) -> None:
+        """Ingest sink; evaluates the triggers reading the inputs in `frames`"""
+        index = self.index
+        if index.stale:
+            self.start()
+        if index.revision is None:
+            return
+        changed: Dict[str, Set[str]] = {}
+        for machine_id, _, inputs, _ in frames:
+            if inputs:
+                changed.setdefault(machine_id, set()).update(inputs)
+        if not changed:
+            return
+        values = self.state.inputs
+        now = datetime.now(timezone.utc)
+        active = self._active
+        for machine_id, input_ids in changed.items():
+            events = index.events_for_inputs((machine_id, input_id) for input_id in input_ids)
+            for event_id in events:
+                entry = index.condition(event_id)
+                if entry is None:
+                    continue
+                condition, bound = entry
+                target = bound or machine_id
+                key = (event_id, target)
+                self.evaluated += 1
+                if not condition(values, target, now):
+                    active.discard(key)
+                elif key not in active:
+                    active.add(key)
+                    self._spawn(self._fire(event_id, target))
+
+    def start(self) -> None:
+        """Sync the index in a worker thread unless a sync is already running"""
+        if self._sync_task is not None and not self._sync_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._loop = loop
+        self._sync_task = loop.create_task(self._sync())
+
+    async def close(self) -> None:
+        self._loop = None
+        for task in [self._sync_task, *self._tasks]:
+            if task is not None:
+                task.cancel()
+        self._sync_task = None
+        self._tasks.clear()
+        for _, time_trigger in self._scheduled.values():
+            time_trigger.cancel()
+        self._scheduled.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": len(self._active),
+            "scheduled": len(self._scheduled),
+            "evaluated": self.evaluated,
+            "fired": self.fired,
+            "failed": self.failed,
+        }
+
+    def _spawn(self, coroutine: Any) -> None:
+        try:
+            task = asyncio.get_running_loop().create_task(coroutine)
+        except RuntimeError:
+            coroutine.close()
+            return
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _sync(self) -> None:
+        def sync() -> None:
+            with self.session_factory() as db:
+                self.index.sync(db)
+
+        try:
+            await asyncio.to_thread(sync)
+        except Exception:
+            logger.exception("Syncing the trigger index failed")
+            return
+        self._schedule()
+
+    def _index_stale(self) -> None:
+        # Called from whichever thread committed the write
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self.start)
+        except RuntimeError:
+            # The loop closed without the dispatcher being closed
+            self._loop = None
+
+    def _schedule(self) -> None:
+        """Arm a timer per time-triggered event, re-arming those whose trigger changed"""
+        wanted = {}
+        for event_id in self.index.events_for_type("time"):
+            entry = self.index.trigger(event_id)
+            if entry is not None:
+                wanted[event_id] = entry
+        for event_id, (entry, time_trigger) in list(self._scheduled.items()):
+            if wanted.get(event_id) != entry:
+                time_trigger.cancel()
+                del self._scheduled[event_id]
+        for event_id, entry in wanted.items():
+            if event_id in self._scheduled:
+                continue
+            trigger, machine_id = entry
+            time_trigger = TimeTrigger(self.timers, trigger, partial(self._on_time, event_id, machine_id))
+            try:
+                time_trigger.arm()
+            except ConditionError as exc:
+                logger.warning("Event %s has a time trigger that never fires: %s", event_id, exc)
+                continue
+            self._scheduled[event_id] = (entry, time_trigger)
+
+    def _on_time(self, event_id: str, machine_id: Optional[str], fire_at: datetime) -> None:
+        self._spawn(self._fire(event_id, machine_id))
+
+    async def _fire(self, event_id: str, machine_id: Optional[str]) -> None:
+        from app import crud
+
+        try:
+            async with self.async_session_factory() as db:
+                event = await crud.async_event.get(db, id=event_id)
+                machine = None
+                if machine_id is not None:
+                    machine = await crud.async_machine.get(db, id=machine_id)
+            if event is None or not event.enabled or (machine_id and machine is None):
+                return
+            self.runtime.submit(
+                event, machine_id=machine_id, machine_type=machine.type if machine else None
+            )
+            self.fired += 1
+        except PlanError as exc:
+            self.failed += 1
+            logger.warning("Event %s triggered but can't run: %s", event_id, exc)
+        except Exception:
+            self.failed += 1
+            logger.exception("Submitting triggered event %s failed", event_id)
+
+
+trigger_dispatcher = TriggerDispatcher(
+    trigger_index, machine_state, execution_runtime, SessionLocal, AsyncSessionLocal
+)
@@ -0,0 +1,102 @@
+"""
+Downsampling of channel history for trend charts.
+
+Everything here works on aggregate rows: a sorted time column plus a
+(min, max, sum, count) row per time, which is what rollup tiers store and
+what raw samples become with `as_rows`. Combining rows is associative, so
+a range can be answered from a mix of tiers and raw samples.
+"""
+from typing import Tuple
+
+import numpy as np
+
+MIN, MAX, SUM, COUNT = range(4)
+
+METHODS = ("minmax", "lttb")
+
+
+def as_rows(values: np.ndarray) -> np.ndarray:
+    """Aggregate rows for raw samples: each one its own bucket of one"""
+    return np.column_stack((values, values, values, np.ones_like(values)))
+
+
+def combine(ids: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge consecutive rows sharing a bucket id (ids must be sorted).
+    Returns the index of each bucket's first row and the merged rows.
+    """
+    starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+    merged = np.empty((len(starts), 4), dtype=np.float64)
+    merged[:, MIN] = np.minimum.reduceat(rows[:, MIN], starts)
+    merged[:, MAX] = np.maximum.reduceat(rows[:, MAX], starts)
+    merged[:, SUM:] = np.add.reduceat(rows[:, SUM:], starts, axis=0)
+    return starts, merged
+
+
+def buckets(
+    times: np.ndarray, rows: np.ndarray, start: float, end: float, points: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Min, max and average over `points` equal buckets spanning [start, end].
+    Returns bucket start times and an (n, 3) array; empty buckets are left
+    out, so gaps in the data stay visible.
+    """
+    if not len(times):
+        return times, np.empty((0, 3), dtype=np.float64)
+    width = (end - start) / points or 1.0
+    ids = np.minimum(np.floor((times - start) / width), points - 1)
+    starts, merged = combine(ids, rows)
+    stats = np.column_stack((merged[:, MIN], merged[:, MAX], merged[:, SUM] / merged[:, COUNT]))
+    return start + ids[starts] * width, stats
+
+
+def lttb(times: np.ndarray, values: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `threshold` points that keep
+    the visual shape of the series. The first and last points are always
+    kept; from each bucket in between the point forming the largest
+    triangle with the previously kept point and the next bucket's average
+    is chosen.
+    """
+    n = len(times)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:threshold], dtype=np.intp)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(times[:n - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(values[:n - 1], edges[:-1]) / counts
+    next_x = np.append(mean_x[1:], times[-1])
+    next_y = np.append(mean_y[1:], values[-1])
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = times[a], values[a]
+        area = np.abs(
+            (ax - next_x[i]) * (values[lo:hi] - ay) - (ax - times[lo:hi]) * (next_y[i] - ay)
+        )
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(
+    times: np.ndarray,
+    rows: np.ndarray,
+    start: float,
+    end: float,
+    points: int,
+    method: str = "minmax",
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    At most `points` points for [start, end]: bucket (min, max, avg) rows
+    for "minmax", or (value,) rows of the selected averages for "lttb".
+    """
+    if method == "lttb":
+        averages = rows[:, SUM] / rows[:, COUNT]
+        selected = lttb(times, averages, points)
+        return times[selected], averages[selected, None]
+    return buckets(times, rows, start, end, points)
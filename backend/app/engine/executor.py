@@ -0,0 +1,142 @@
+import asyncio
+from typing import Any, Callable, List, Optional, Union
+
+import httpx
+
+from app.engine import plan as p
+from app.engine.cache import PlanCache, plan_cache
+from app.engine.conditions import Inputs
+from app.engine.timers import TimingWheel
+
+StepCallback = Callable[[p.StepInfo], None]
+
+
+class StepFailed(RuntimeError):
+    def __init__(self, step: p.StepInfo, message: str):
+        super().__init__(f"Step {step.id} ({step.type}) failed: {message}")
+        self.step = step
+
+
+class ActionDriver:
+    """
+    Performs the side effects of a plan. Subclass per deployment (GPIO,
+    simulator, remote machine API); the base class covers HTTP with httpx
+    and leaves hardware and MQTT to subclasses.
+    """
+
+    def set_output(self, handle: p.OutputHandle, value: Union[bool, int, float]) -> None:
+        raise NotImplementedError
+
+    def read_inputs(self) -> Inputs:
+        """Latest input values keyed by (machine_id, input_id), for conditions"""
+        raise NotImplementedError
+
+    async def mqtt_publish(self, topic: str, payload: bytes, qos: int, retain: bool) -> None:
+        raise NotImplementedError("No MQTT client configured")
+
+    async def http_request(
+        self, method: str, url: str, headers: Any, body: Optional[bytes]
+    ) -> int:
+        async with httpx.AsyncClient() as client:
+            response = await client.request(method, url, headers=headers, content=body)
+        return response.status_code
+
+
+class ExecutionEngine:
+    """
+    Runs compiled plans on the event loop.
+
+    Dispatch is a loop over the plan's instruction tuple with no JSON
+    parsing or validation; only waits, parallel branches and network steps
+    await. Loop back-edges yield to the event loop so an endless loop of
+    instant steps can't starve other runs.
+    """
+
+    def __init__(
+        self,
+        driver: ActionDriver,
+        cache: PlanCache = plan_cache,
+        timers: Optional[TimingWheel] = None,
+    ):
+        self.driver = driver
+        self.cache = cache
+        # Waits go through the timing wheel when given, else asyncio.sleep
+        self.sleep = timers.sleep if timers is not None else asyncio.sleep
+
+    def plan_for(self, event: Any, machine_id: Optional[str] = None) -> p.Plan:
+        """Plan for running `event` on a machine, the event's own by default"""
+        if machine_id is None:
+            machine_id = event.machine_id
+        return self.cache.get(
+            event.id, event.actions, machine_id=machine_id,
+            revision=getattr(event, "plan_revision", None),
+        )
+
+    async def run(
+        self,
+        plan: p.Plan,
+        *,
+        machine_id: Optional[str] = None,
+        on_step: Optional[StepCallback] = None,
+    ) -> int:
+        """Run a plan to completion and return how many instructions it dispatched"""
+        driver = self.driver
+        code = plan.code
+        end = len(code)
+        counters: List[Optional[int]] = [None] * plan.loop_slots
+        dispatched = 0
+        pc = 0
+        while pc < end:
+            ins = code[pc]
+            op = ins.op
+            dispatched += 1
+            if on_step is not None and ins.step is not None:
+                on_step(ins.step)
+            if op == p.SET_OUTPUT:
+                driver.set_output(ins.handle, ins.value)
+                pc += 1
+            elif op == p.WAIT:
+                await self.sleep(ins.seconds)
+                pc += 1
+            elif op == p.BRANCH:
+                if ins.condition(driver.read_inputs(), machine_id, None):
+                    pc += 1
+                else:
+                    pc = ins.else_target
+            elif op == p.JUMP:
+                pc = ins.target
+            elif op == p.LOOP:
+                if ins.count == 0:
+                    pc = ins.end
+                else:
+                    counters[ins.slot] = ins.count
+                    pc += 1
+            elif op == p.LOOP_NEXT:
+                remaining = counters[ins.slot]
+                if remaining is not None:
+                    remaining -= 1
+                    counters[ins.slot] = remaining
+                if remaining is None or remaining > 0:
+                    pc = ins.start
+                    await asyncio.sleep(0)
+                else:
+                    pc += 1
+            elif op == p.PARALLEL:
+                counts = await asyncio.gather(*(
+                    self.run(branch, machine_id=machine_id, on_step=on_step)
+                    for branch in ins.branches
+                ))
+                dispatched += sum(counts)
+                pc += 1
+            elif op == p.MQTT_PUBLISH:
+                await driver.mqtt_publish(ins.topic, ins.payload, ins.qos, ins.retain)
+                pc += 1
+            elif op == p.HTTP_REQUEST:
+                status = await driver.http_request(ins.method, ins.url, ins.headers, ins.body)
+                expected = ins.expected_status
+                if (status not in expected) if expected is not None else not 200 <= status < 300:
+                    raise StepFailed(ins.step, f"unexpected HTTP status {status}")
+                pc += 1
+            else:  # pragma: no cover - compile_actions only emits the ops above
+                raise StepFailed(ins.step, f"unknown instruction {op}")
+        return dispatched
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.background import BackgroundTask
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryBuffer(BackgroundTask):
+    """
+    Write-behind buffer between the execution runtime and the
+    `execution_history` table.
+
+    Finished executions are queued in memory and appended by a background
+    task in one executemany per batch, every `flush_interval` seconds or as
+    soon as `batch_size` rows are waiting, so history costs one commit per
+    batch instead of one per run. A failed flush keeps its rows for the
+    next attempt; past `max_pending` the oldest rows are dropped. Rows
+    older than `retention` are pruned every `prune_interval` seconds.
+
+    Reads overlay `pending()`, the rows not committed yet, rather than
+    flushing, so reading history never forces a write.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        *,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        retention: timedelta = timedelta(days=30),
+        prune_interval: float = 3600.0,
+        max_pending: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self.max_pending = max_pending
+        self.clock = clock
+        self._pending: Deque[Dict[str, Any]] = deque()
+        # The batch being inserted, still invisible to other connections
+        self._writing: List[Dict[str, Any]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flushing: Optional[asyncio.Lock] = None
+        self._next_prune = 0.0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.pruned = 0
+
+    def record(self, execution: Any) -> None:
+        """Queue a finished execution; never blocks or touches the database"""
+        self._pending.append(execution.to_record())
+        if len(self._pending) > self.max_pending:
+            self._pending.popleft()
+            self.dropped += 1
+        self.start()
+        if len(self._pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def pending(
+        self,
+        *,
+        event_id: Optional[str] = None,
+        machine_id: Optional[str] = None,
+        before: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Records not yet committed, newest first, filtered like
+        `get_recent`. Take this before reading the table: a batch that
+        commits in between then shows up in both, never in neither.
+        """
+        if before is not None and before.tzinfo is None:
+            before = before.replace(tzinfo=timezone.utc)
+        records = [
+            record
+            for record in (*self._writing, *self._pending)
+            if (event_id is None or record["event_id"] == event_id)
+            and (machine_id is None or record["machine_id"] == machine_id)
+            and (before is None or record["started_at"] < before)
+        ]
+        records.sort(key=lambda record: record["started_at"], reverse=True)
+        return records
+
+    async def flush(self) -> int:
+        """Write everything queued so far; returns how many rows were written"""
+        from app import crud
+
+        if self._flushing is None:
+            self._flushing = asyncio.Lock()
+        async with self._flushing:
+            written = 0
+            while self._pending:
+                rows = [
+                    self._pending.popleft()
+                    for _ in range(min(self.batch_size, len(self._pending)))
+                ]
+                self._writing = rows
+                try:
+                    async with self.session_factory() as db:
+                        await crud.async_execution_history.insert_many(db, rows=rows)
+                except Exception:
+                    logger.exception("Writing %d execution history rows failed", len(rows))
+                    self.failed_flushes += 1
+                    self._pending.extendleft(reversed(rows))
+                    while len(self._pending) > self.max_pending:
+                        self._pending.popleft()
+                        self.dropped += 1
+                    break
+                finally:
+                    self._writing = []
+                self.flushes += 1
+                written += len(rows)
+            self.written += written
+            return written
+
+    async def prune(self, now: Optional[datetime] = None) -> int:
+        """Delete history older than the retention window"""
+        from app import crud
+
+        before = (now or datetime.now(timezone.utc)) - self.retention
+        async with self.session_factory() as db:
+            removed = await crud.async_execution_history.prune(
+                db, before=before, batch_size=self.batch_size
+            )
+        self.pruned += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+            "pruned": self.pruned,
+            "retention_days": self.retention.total_seconds() / 86400,
+        }
+
+    def _prepare(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._flushing = asyncio.Lock()
+
+    async def _drain(self) -> None:
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if self.clock() >= self._next_prune:
+                self._next_prune = self.clock() + self.prune_interval
+                try:
+                    await self.prune()
+                except Exception:
+                    logger.exception("Pruning execution history failed")
+
+
+history_buffer = HistoryBuffer(
+    AsyncSessionLocal,
+    batch_size=settings.EXECUTION_HISTORY_BATCH_SIZE,
+    flush_interval=settings.EXECUTION_HISTORY_FLUSH_MS / 1000,
+    retention=timedelta(days=settings.EXECUTION_HISTORY_RETENTION_DAYS),
+)
@@ -0,0 +1,122 @@
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from app.engine.connections import ONLINE, ConnectionManager, connection_manager
+from app.engine.dispatch import trigger_dispatcher
+from app.engine.registry import MachineRegistry, machine_registry
+from app.engine.segments import segment_store
+from app.engine.series import series_store
+from app.engine.state import MachineState, machine_state
+
+logger = logging.getLogger(__name__)
+
+Sink = Callable[[Sequence[Any]], None]
+
+
+class IngestPipeline:
+    """
+    In-memory path for telemetry frames pushed by machines.
+
+    A validated batch updates the latest input and output values in
+    `MachineState`, marks the machines it came from as online through the
+    buffered status writes, and is handed to every registered sink (e.g.
+    time series storage). Nothing here touches the database per sample.
+
+    Machines are marked online the first time they are seen, and again
+    whenever the connection manager has them as anything else; pushing
+    telemetry also keeps its probes from marking them offline.
+
+    Given a `MachineRegistry`, frames from ids that aren't machines are
+    dropped before any of that, and deleted machines are forgotten.
+    """
+
+    def __init__(
+        self,
+        state: MachineState,
+        sinks: Iterable[Sink] = (),
+        connections: Optional[ConnectionManager] = None,
+        machines: Optional[MachineRegistry] = None,
+    ):
+        self.state = state
+        self.sinks: List[Sink] = list(sinks)
+        self.connections = connections
+        self.machines = machines
+        self.last_seen: Dict[str, float] = {}
+        self.batches = 0
+        self.frames = 0
+        self.samples = 0
+        self.rejected = 0
+        self.unknown = 0
+        self.sink_errors = 0
+        if machines is not None:
+            machines.subscribe(self._forget_all)
+
+    def add_sink(self, sink: Sink) -> None:
+        self.sinks.append(sink)
+
+    def submit(self, frames: Sequence[Any]) -> int:
+        """Apply a batch of `schemas.ingest.Frame`; returns how many were taken"""
+        from app import crud
+
+        if self.machines is not None:
+            known = self.machines.known()
+            taken = [frame for frame in frames if frame[0] in known]
+            self.unknown += len(frames) - len(taken)
+            frames = taken
+            if not frames:
+                return 0
+        state = self.state
+        last_seen = self.last_seen
+        samples = 0
+        for machine_id, timestamp, inputs, outputs in frames:
+            if inputs:
+                state.set_inputs(machine_id, inputs)
+            for output_id, value in outputs.items():
+                state.set_output(machine_id, output_id, value)
+            samples += len(inputs) + len(outputs)
+            if machine_id not in last_seen:
+                crud.machine.set_status(id=machine_id, status=ONLINE)
+            if timestamp > last_seen.get(machine_id, 0.0):
+                last_seen[machine_id] = timestamp
+        if self.connections is not None:
+            self.connections.heard_from({frame[0] for frame in frames})
+        for sink in self.sinks:
+            try:
+                sink(frames)
+            except Exception:
+                self.sink_errors += 1
+                logger.exception("Telemetry sink %r failed", sink)
+        self.batches += 1
+        self.frames += len(frames)
+        self.samples += samples
+        return len(frames)
+
+    def forget(self, machine_id: str) -> None:
+        """Drop a machine so its next frame marks it online again"""
+        self.last_seen.pop(machine_id, None)
+
+    def _forget_all(self, machine_ids: Iterable[str]) -> None:
+        for machine_id in machine_ids:
+            self.forget(machine_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "machines": len(self.last_seen),
+            "batches": self.batches,
+            "frames": self.frames,
+            "samples": self.samples,
+            "rejected": self.rejected,
+            "unknown": self.unknown,
+            "sink_errors": self.sink_errors,
+        }
+
+
+# Deleted machines' stored telemetry goes with them
+machine_registry.subscribe(segment_store.remove_machines)
+
+ingest_pipeline = IngestPipeline(
+    machine_state,
+    sinks=[trigger_dispatcher, series_store.ingest, segment_store.ingest],
+    connections=connection_manager,
+    machines=machine_registry,
+)
@@ -0,0 +1,329 @@
+"""
+Compile an event's `actions` JSON into an immutable execution plan.
+
+A plan is a flat tuple of instructions: loops become a counter and a jump
+back (or are unrolled when short), conditionals become a compiled condition
+and a jump, output targets are resolved to handles, waits to seconds and
+payloads to bytes. Running a plan never looks at the source JSON again.
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, ClassVar, Dict, FrozenSet, List, Optional, Tuple, Union
+
+from app.engine.conditions import CompiledCondition, ConditionError, compile_condition
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+# Finite loops whose unrolled body stays under this many instructions are
+# unrolled instead of run through a counter
+UNROLL_LIMIT = 64
+
+HTTP_METHODS = frozenset({"GET", "POST", "PUT", "DELETE", "PATCH"})
+
+SET_OUTPUT, WAIT, BRANCH, JUMP, LOOP, LOOP_NEXT, PARALLEL, MQTT_PUBLISH, HTTP_REQUEST = range(9)
+
+
+class PlanError(ValueError):
+    """An action list that can't be compiled; `path` locates the bad step"""
+
+    def __init__(self, path: str, message: str):
+        super().__init__(f"{path}: {message}")
+        self.path = path
+        self.message = message
+
+
+@dataclass(frozen=True)
+class StepInfo:
+    id: str
+    type: str
+    name: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class OutputHandle:
+    """An output on one machine, or on every machine that has it when machine_id is None"""
+    machine_id: Optional[str]
+    output_id: str
+
+
+@dataclass(frozen=True)
+class SetOutput:
+    op: ClassVar[int] = SET_OUTPUT
+    step: StepInfo
+    handle: OutputHandle
+    value: Union[bool, int, float]
+
+
+@dataclass(frozen=True)
+class Wait:
+    op: ClassVar[int] = WAIT
+    step: StepInfo
+    seconds: float
+
+
+@dataclass(frozen=True)
+class Branch:
+    """Fall through into the true steps, or jump to `else_target`"""
+    op: ClassVar[int] = BRANCH
+    step: StepInfo
+    condition: CompiledCondition
+    else_target: int
+
+
+@dataclass(frozen=True)
+class Jump:
+    op: ClassVar[int] = JUMP
+    step: Optional[StepInfo]
+    target: int
+
+
+@dataclass(frozen=True)
+class Loop:
+    """Start a loop: load `count` into a counter slot, or skip to `end` if zero"""
+    op: ClassVar[int] = LOOP
+    step: StepInfo
+    slot: int
+    count: Optional[int]
+    end: int
+
+
+@dataclass(frozen=True)
+class LoopNext:
+    """End of a loop body: jump back to `start` while the counter lasts"""
+    op: ClassVar[int] = LOOP_NEXT
+    step: Optional[StepInfo]
+    slot: int
+    start: int
+
+
+@dataclass(frozen=True)
+class Parallel:
+    op: ClassVar[int] = PARALLEL
+    step: StepInfo
+    branches: Tuple["Plan", ...]
+
+
+@dataclass(frozen=True)
+class MQTTPublish:
+    op: ClassVar[int] = MQTT_PUBLISH
+    step: StepInfo
+    topic: str
+    payload: bytes
+    qos: int
+    retain: bool
+
+
+@dataclass(frozen=True)
+class HTTPRequest:
+    op: ClassVar[int] = HTTP_REQUEST
+    step: StepInfo
+    method: str
+    url: str
+    headers: Tuple[Tuple[str, str], ...]
+    body: Optional[bytes]
+    # None accepts any 2xx
+    expected_status: Optional[FrozenSet[int]]
+
+
+Instruction = Union[
+    SetOutput, Wait, Branch, Jump, Loop, LoopNext, Parallel, MQTTPublish, HTTPRequest
+]
+
+
+@dataclass(frozen=True)
+class Plan:
+    code: Tuple[Instruction, ...]
+    loop_slots: int
+    step_count: int
+    content_hash: str
+
+
+def dumps(value: Any, sort_keys: bool = False) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return json.dumps(value, separators=(",", ":"), sort_keys=sort_keys).encode()
+
+
+def content_hash(actions: Any, machine_id: Optional[str] = None) -> str:
+    """Stable hash of an action list and the machine its outputs resolve against"""
+    return hashlib.sha1(dumps([machine_id, actions], sort_keys=True)).hexdigest()
+
+
+
+def compile_actions(
+    actions: Any, machine_id: Optional[str] = None, digest: Optional[str] = None
+) -> Plan:
+    """
+    Compile an event's action list.
+
+    `machine_id` is the event's machine; `set_output` steps without their own
+    `machineId` are bound to it (or to every machine when it is None too).
+    """
+    if not isinstance(actions, list):
+        raise PlanError("actions", "must be a list of steps")
+    compiler = _Compiler(machine_id)
+    compiler.block(actions, "actions")
+    return Plan(
+        code=tuple(compiler.code),
+        loop_slots=compiler.loop_slots,
+        step_count=compiler.step_count,
+        content_hash=digest or content_hash(actions, machine_id),
+    )
+
+
+class _Compiler:
+    def __init__(self, machine_id: Optional[str]):
+        self.machine_id = machine_id
+        self.code: List[Instruction] = []
+        self.loop_slots = 0
+        self.step_count = 0
+        self.depth = 0
+        self._handles: Dict[Tuple[Optional[str], str], OutputHandle] = {}
+
+    def block(self, steps: Any, path: str) -> None:
+        if not isinstance(steps, list):
+            raise PlanError(path, "must be a list of steps")
+        for index, step in enumerate(steps):
+            self.step(step, f"{path}[{index}]")
+
+    def step(self, step: Any, path: str) -> None:
+        if not isinstance(step, dict):
+            raise PlanError(path, "step must be an object")
+        step_type = step.get("type")
+        compile_step = self._steps.get(step_type)
+        if compile_step is None:
+            raise PlanError(path, f"unknown step type {step_type!r}")
+        self.step_count += 1
+        info = StepInfo(id=str(step.get("id", path)), type=step_type, name=step.get("name"))
+        compile_step(self, step, info, path)
+
+    def _set_output(self, step: Dict[str, Any], info: StepInfo, path: str) -> None:
+        output_id = step.get("outputId")
+        value = step.get("value")
+        if not isinstance(output_id, str) or not output_id:
+            raise PlanError(path, "outputId is required")
+        if not isinstance(value, (bool, int, float)):
+            raise PlanError(path, "value must be a boolean or a number")
+        key = (step.get("machineId") or self.machine_id, output_id)
+        handle = self._handles.get(key)
+        if handle is None:
+            handle = self._handles[key] = OutputHandle(*key)
+        self.code.append(SetOutput(info, handle, value))
+
+    def _wait(self, step: Dict[str, Any], info: StepInfo, path: str) -> None:
+        duration = step.get("duration")
+        if isinstance(duration, bool) or not isinstance(duration, (int, float)) or duration < 0:
+            raise PlanError(path, "duration must be a non-negative number of milliseconds")
+        self.code.append(Wait(info, duration / 1000.0))
+
+    def _conditional(self, step: Dict[str, Any], info: StepInfo, path: str) -> None:
+        try:
+            condition = compile_condition(step.get("condition"), self.machine_id)
+        except ConditionError as exc:
+            raise PlanError(f"{path}.{exc.path}", exc.message)
+        branch_at = len(self.code)
+        self.code.append(None)  # patched once the true steps are placed
+        self.block(step.get("trueSteps", []), f"{path}.trueSteps")
+        false_steps = step.get("falseSteps") or []
+        if false_steps:
+            jump_at = len(self.code)
+            self.code.append(None)
+            else_target = len(self.code)
+            self.block(false_steps, f"{path}.falseSteps")
+            self.code[jump_at] = Jump(None, len(self.code))
+        else:
+            else_target = len(self.code)
+        self.code[branch_at] = Branch(info, condition, else_target)
+
+    def _loop(self, step: Dict[str, Any], info: StepInfo, path: str) -> None:
+        count = step.get("count")
+        if count is not None and (
+            isinstance(count, bool) or not isinstance(count, int) or count < 0
+        ):
+            raise PlanError(path, "count must be a non-negative integer")
+        body = step.get("steps", [])
+        steps_before, slots_before = self.step_count, self.loop_slots
+        start = len(self.code)
+        self.block(body, f"{path}.steps")
+        body_length = len(self.code) - start
+        if count is not None and count * body_length <= UNROLL_LIMIT:
+            # Short finite loop: repeat the body in place, no counter at run time
+            if count == 0:
+                del self.code[start:]
+                return
+            # step_count counts each source step once, however often it runs
+            source_steps = self.step_count
+            for _ in range(count - 1):
+                self.block(body, f"{path}.steps")
+            self.step_count = source_steps
+            return
+        del self.code[start:]
+        self.step_count, self.loop_slots = steps_before, slots_before
+        slot = self.loop_slots
+        self.loop_slots += 1
+        self.code.append(None)
+        body_start = len(self.code)
+        self.block(body, f"{path}.steps")
+        self.code.append(LoopNext(None, slot, body_start))
+        self.code[start] = Loop(info, slot, count, len(self.code))
+
+    def _parallel(self, step: Dict[str, Any], info: StepInfo, path: str) -> None:
+        branches = step.get("steps", [])
+        if not isinstance(branches, list):
+            raise PlanError(path, "steps must be a list")
+        plans = []
+        for index, branch in enumerate(branches):
+            compiler = _Compiler(self.machine_id)
+            compiler._handles = self._handles
+            compiler.step(branch, f"{path}.steps[{index}]")
+            self.step_count += compiler.step_count
+            plans.append(
+                Plan(tuple(compiler.code), compiler.loop_slots, compiler.step_count, "")
+            )
+        self.code.append(Parallel(info, tuple(plans)))
+
+    def _mqtt_publish(self, step: Dict[str, Any], info: StepInfo, path: str) -> None:
+        topic = step.get("topic")
+        if not isinstance(topic, str) or not topic:
+            raise PlanError(path, "topic is required")
+        payload = step.get("payload", "")
+        payload = payload.encode() if isinstance(payload, str) else dumps(payload)
+        qos = step.get("qos", 0)
+        if qos not in (0, 1, 2):
+            raise PlanError(path, "qos must be 0, 1 or 2")
+        self.code.append(MQTTPublish(info, topic, payload, qos, bool(step.get("retain", False))))
+
+    def _http_request(self, step: Dict[str, Any], info: StepInfo, path: str) -> None:
+        method = str(step.get("method", "GET")).upper()
+        if method not in HTTP_METHODS:
+            raise PlanError(path, f"unsupported method {method!r}")
+        url = step.get("url")
+        if not isinstance(url, str) or not url:
+            raise PlanError(path, "url is required")
+        headers = dict(step.get("headers") or {})
+        body = step.get("body")
+        if body is not None and not isinstance(body, (str, bytes)):
+            body = dumps(body)
+            headers.setdefault("Content-Type", "application/json")
+        elif isinstance(body, str):
+            body = body.encode()
+        expected = step.get("expectedStatus")
+        if expected is not None:
+            expected = frozenset(expected if isinstance(expected, list) else [expected])
+        self.code.append(
+            HTTPRequest(info, method, url, tuple(headers.items()), body, expected)
+        )
+
+    _steps = {
+        "set_output": _set_output,
+        "wait": _wait,
+        "conditional": _conditional,
+        "loop": _loop,
+        "parallel": _parallel,
+        "mqtt_publish": _mqtt_publish,
+        "http_request": _http_request,
+    }
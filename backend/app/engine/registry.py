@@ -0,0 +1,104 @@
+import logging
+import threading
+from typing import Any, Callable, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Session.info key holding the machine ids a transaction added and removed
+_PENDING_KEY = "machine_registry_changes"
+
+Changes = Tuple[Set[str], Set[str]]
+
+
+class MachineRegistry:
+    """
+    Ids of the machines in the database, so the ingest path can check
+    pushed frames against them without a query per batch.
+
+    The ids are loaded once, on first use, and then kept current in memory:
+    CRUD writes to machines record the ids they added and removed on the
+    session, applied when it commits. Callbacks given to `subscribe` are
+    called with the ids of deleted machines, from the committing thread, to
+    drop whatever was kept for them.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+        self._ids: Optional[Set[str]] = None
+        # Changes committed while a load runs, replayed over what it read
+        self._loading: Optional[List[Changes]] = None
+        self._listeners: List[Callable[[Set[str]], None]] = []
+        self._lock = threading.Lock()
+
+    def known(self) -> Set[str]:
+        """The current ids; loads them on first use"""
+        if self._ids is None:
+            self.load()
+        return self._ids
+
+    def load(self) -> None:
+        from app import models
+
+        with self._lock:
+            self._loading = []
+        try:
+            with self.session_factory() as db:
+                ids = set(db.scalars(select(models.Machine.id)))
+        except Exception:
+            with self._lock:
+                self._loading = None
+            raise
+        with self._lock:
+            for added, removed in self._loading:
+                ids |= added
+                ids -= removed
+            self._ids = ids
+            self._loading = None
+
+    def subscribe(self, callback: Callable[[Set[str]], None]) -> None:
+        """Call `callback` with the ids of machines whose delete committed"""
+        self._listeners.append(callback)
+
+    def record_on_commit(self, db: Session, ids: Iterable[Any], *, deleted: bool = False) -> None:
+        added, removed = db.info.setdefault(_PENDING_KEY, (set(), set()))
+        ids = {str(id) for id in ids}
+        if deleted:
+            added -= ids
+            removed |= ids
+        else:
+            removed -= ids
+            added |= ids
+
+    def apply(self, added: Set[str], removed: Set[str]) -> None:
+        with self._lock:
+            if self._loading is not None:
+                self._loading.append((added, removed))
+            if self._ids is not None:
+                self._ids |= added
+                self._ids -= removed
+        if removed:
+            for callback in self._listeners:
+                try:
+                    callback(removed)
+                except Exception:
+                    logger.exception("Machine removal callback %r failed", callback)
+
+
+machine_registry = MachineRegistry(SessionLocal)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session: Session) -> None:
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        machine_registry.apply(*changes)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,398 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.engine import plan as p
+from app.engine.executor import ExecutionEngine
+from app.engine.history import HistoryBuffer, history_buffer
+from app.engine.simulation import SIMULATOR_TYPE, SimulatorDriver
+from app.engine.state import StateDriver, machine_state
+from app.engine.timers import timing_wheel
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+STOPPED = "stopped"
+
+STARTED_EVENT = "event_execution_started"
+UPDATED_EVENT = "event_execution_updated"
+COMPLETED_EVENT = "event_execution_completed"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+class Execution:
+    """One run of an event's plan, shaped for the client as `EventExecution`"""
+
+    __slots__ = (
+        "id", "event_id", "event_name", "machine_id", "priority", "plan", "engine",
+        "status", "current_step", "steps_done", "queued_at", "started_at", "completed_at",
+        "error", "result", "task", "steps", "_started", "_last_update",
+    )
+
+    def __init__(
+        self,
+        event_id: str,
+        event_name: str,
+        machine_id: Optional[str],
+        plan: p.Plan,
+        priority: int = 0,
+        engine: Optional[ExecutionEngine] = None,
+    ):
+        self.id = str(uuid.uuid4())
+        self.event_id = event_id
+        self.event_name = event_name
+        self.machine_id = machine_id
+        self.priority = priority
+        self.plan = plan
+        self.engine = engine
+        self.status = PENDING
+        self.current_step: Optional[Dict[str, Any]] = None
+        self.steps_done = 0
+        self.queued_at = _now()
+        # Stamped when the run leaves its lane, so time spent queued isn't counted
+        self.started_at: Optional[datetime] = None
+        self.completed_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+        self.result: Any = None
+        self.task: Optional[asyncio.Task] = None
+        # The first steps of the run with their offsets from its start
+        self.steps: List[Dict[str, Any]] = []
+        self._started = 0.0
+        self._last_update = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (COMPLETED, FAILED, STOPPED)
+
+    @property
+    def progress(self) -> int:
+        if self.status == COMPLETED:
+            return 100
+        if not self.plan.step_count:
+            return 0
+        # Loops can dispatch more steps than the plan has; stay below 100
+        # until the run actually completes
+        return min(99, self.steps_done * 100 // self.plan.step_count)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "eventId": self.event_id,
+            "eventName": self.event_name,
+            "machineId": self.machine_id,
+            "status": self.status,
+            "currentStep": self.current_step,
+            "progress": self.progress,
+            "startedAt": _iso(self.started_at or self.queued_at),
+            "completedAt": _iso(self.completed_at),
+            "error": self.error,
+            "result": self.result,
+        }
+
+    def to_record(self) -> Dict[str, Any]:
+        """Values for an `execution_history` row"""
+        duration = None
+        if self.started_at is not None and self.completed_at is not None:
+            duration = self.completed_at - self.started_at
+        return {
+            "id": self.id,
+            "event_id": self.event_id,
+            "event_name": self.event_name,
+            "machine_id": self.machine_id,
+            "status": self.status,
+            # A run stopped while still queued never started
+            "started_at": self.started_at or self.completed_at,
+            "completed_at": self.completed_at,
+            "duration_ms": duration.total_seconds() * 1000 if duration is not None else None,
+            "error": self.error,
+            "steps": self.steps,
+            "result": self.result,
+        }
+
+
+class Broadcaster:
+    """
+    Fans execution updates out to subscribers. Each subscriber gets its own
+    bounded queue; when one is full its oldest message is dropped, so a slow
+    consumer never holds up the runs publishing to it.
+    """
+
+    def __init__(self, max_pending: int = 1000):
+        self.max_pending = max_pending
+        self._queues: Set[asyncio.Queue] = set()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(self.max_pending)
+        self._queues.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._queues.discard(queue)
+
+    def publish(self, name: str, payload: Dict[str, Any]) -> None:
+        self.published += 1
+        for queue in self._queues:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait((name, payload))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._queues),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+class ExecutionRuntime:
+    """
+    Schedules event executions onto the event loop.
+
+    Every machine has its own lane: executions for one machine run one at a
+    time, highest priority first and in submission order within a priority,
+    so a machine's outputs are never written by two runs at once. Lanes are
+    independent, so a machine with slow steps only delays its own queue and
+    holds at most one of the `max_concurrent` slots. Runs that aren't bound
+    to a machine share a lane without that ordering. `max_per_event` caps
+    how many runs of the same event may be in flight across all machines.
+
+    Runs use `engine` unless their machine's type has its own engine in
+    `engines_by_type`, e.g. simulated machines.
+    """
+
+    def __init__(
+        self,
+        engine: ExecutionEngine,
+        *,
+        engines_by_type: Optional[Dict[str, ExecutionEngine]] = None,
+        max_concurrent: int = 64,
+        max_per_event: int = 4,
+        update_interval: float = 0.1,
+        keep_finished: int = 200,
+        max_recorded_steps: int = 100,
+        history: Optional[HistoryBuffer] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.engine = engine
+        self.engines_by_type = engines_by_type or {}
+        self.max_concurrent = max_concurrent
+        self.max_per_event = max_per_event
+        self.update_interval = update_interval
+        self.keep_finished = keep_finished
+        self.max_recorded_steps = max_recorded_steps
+        self.history = history
+        self.clock = clock
+        self.broadcaster = Broadcaster()
+        self._lanes: Dict[Optional[str], List[Tuple[int, int, Execution]]] = {}
+        self._busy: Set[str] = set()
+        self._running: Dict[str, Execution] = {}
+        self._running_per_event: Dict[str, int] = {}
+        self._active: Dict[str, Execution] = {}
+        self._finished: "OrderedDict[str, Execution]" = OrderedDict()
+        self._seq = itertools.count()
+        self.counts = {COMPLETED: 0, FAILED: 0, STOPPED: 0}
+
+    def submit(
+        self,
+        event: Any,
+        *,
+        machine_id: Optional[str] = None,
+        machine_type: Optional[str] = None,
+        priority: int = 0,
+    ) -> Execution:
+        """
+        Queue a run of `event` for a machine (the event's own by default).
+        `machine_type` picks the engine, and so the driver, it runs with.
+
+        The plan comes from the plan cache, so a PlanError surfaces here,
+        before anything is queued. Must be called on the event loop.
+        """
+        engine = self.engines_by_type.get(machine_type, self.engine)
+        if machine_id is None:
+            machine_id = event.machine_id
+        # Compiled for the machine whose lane it runs in, so its outputs are too
+        plan = engine.plan_for(event, machine_id)
+        execution = Execution(str(event.id), event.name, machine_id, plan, priority, engine)
+        self._active[execution.id] = execution
+        heapq.heappush(
+            self._lanes.setdefault(machine_id, []),
+            (-priority, next(self._seq), execution),
+        )
+        self._publish(STARTED_EVENT, execution)
+        self._dispatch()
+        return execution
+
+    async def stop(self, execution_id: str) -> Optional[Execution]:
+        """
+        Stop a pending or running execution and return it, or None if the id
+        is unknown. Stopping a finished execution leaves it as it was.
+        """
+        execution = self.get(execution_id)
+        if execution is None or execution.finished:
+            return execution
+        if execution.status == PENDING:
+            lane = self._lanes[execution.machine_id]
+            lane[:] = [entry for entry in lane if entry[2] is not execution]
+            heapq.heapify(lane)
+            if not lane:
+                del self._lanes[execution.machine_id]
+            self._finish(execution, STOPPED)
+            return execution
+        execution.task.cancel()
+        await asyncio.wait([execution.task])
+        if not execution.finished:
+            # Cancelled before its first step, so _run never got to finish it
+            self._finish(execution, STOPPED)
+        return execution
+
+    def get(self, execution_id: str) -> Optional[Execution]:
+        return self._active.get(execution_id) or self._finished.get(execution_id)
+
+    def list(self) -> List[Execution]:
+        """Pending and running executions, then recently finished ones, newest first"""
+        return list(self._active.values()) + list(reversed(self._finished.values()))
+
+    async def shutdown(self) -> None:
+        """Stop everything, queued runs included, and flush their history"""
+        for execution_id in list(self._active):
+            await self.stop(execution_id)
+        if self.history is not None:
+            await self.history.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._active) - len(self._running),
+            "running": len(self._running),
+            "queued_lanes": len(self._lanes),
+            "max_concurrent": self.max_concurrent,
+            "max_per_event": self.max_per_event,
+            **self.counts,
+            "broadcast": self.broadcaster.stats(),
+        }
+
+    def _dispatch(self) -> None:
+        # Start the best eligible lane head until the slots run out. Only
+        # heads are considered so a lane never runs out of order.
+        running_per_event = self._running_per_event
+        while len(self._running) < self.max_concurrent:
+            best = None
+            for lane, queue in self._lanes.items():
+                if lane in self._busy:
+                    continue
+                head = queue[0]
+                if running_per_event.get(head[2].event_id, 0) >= self.max_per_event:
+                    continue
+                if best is None or head < best[0]:
+                    best = (head, lane)
+            if best is None:
+                return
+            lane = best[1]
+            queue = self._lanes[lane]
+            heapq.heappop(queue)
+            if not queue:
+                del self._lanes[lane]
+            self._start(best[0][2])
+
+    def _start(self, execution: Execution) -> None:
+        execution.status = RUNNING
+        execution.started_at = _now()
+        execution._started = self.clock()
+        if execution.machine_id is not None:
+            self._busy.add(execution.machine_id)
+        self._running[execution.id] = execution
+        self._running_per_event[execution.event_id] = (
+            self._running_per_event.get(execution.event_id, 0) + 1
+        )
+        execution.task = asyncio.get_running_loop().create_task(self._run(execution))
+        self._publish(UPDATED_EVENT, execution)
+
+    async def _run(self, execution: Execution) -> None:
+        steps = execution.steps
+        max_steps = self.max_recorded_steps
+
+        def on_step(step: p.StepInfo) -> None:
+            now = self.clock()
+            execution.steps_done += 1
+            execution.current_step = {
+                "id": step.id, "name": step.name, "type": step.type, "startedAt": _iso(_now()),
+            }
+            if len(steps) < max_steps:
+                steps.append({
+                    "id": step.id, "type": step.type, "name": step.name,
+                    "offsetMs": round((now - execution._started) * 1000, 3),
+                })
+            if now - execution._last_update >= self.update_interval:
+                execution._last_update = now
+                self._publish(UPDATED_EVENT, execution)
+
+        try:
+            dispatched = await execution.engine.run(
+                execution.plan, machine_id=execution.machine_id, on_step=on_step
+            )
+        except asyncio.CancelledError:
+            self._finish(execution, STOPPED)
+        except Exception as exc:
+            logger.warning("Execution %s of event %s failed: %s",
+                           execution.id, execution.event_id, exc)
+            self._finish(execution, FAILED, error=str(exc))
+        else:
+            execution.result = {"steps": dispatched}
+            self._finish(execution, COMPLETED)
+
+    def _finish(self, execution: Execution, status: str, error: Optional[str] = None) -> None:
+        execution.status = status
+        execution.error = error
+        execution.completed_at = _now()
+        self._active.pop(execution.id, None)
+        if self._running.pop(execution.id, None) is not None:
+            self._busy.discard(execution.machine_id)
+            left = self._running_per_event[execution.event_id] - 1
+            if left:
+                self._running_per_event[execution.event_id] = left
+            else:
+                del self._running_per_event[execution.event_id]
+        self._finished[execution.id] = execution
+        while len(self._finished) > self.keep_finished:
+            self._finished.popitem(last=False)
+        self.counts[status] += 1
+        if self.history is not None:
+            self.history.record(execution)
+        self._publish(COMPLETED_EVENT, execution)
+        self._dispatch()
+
+    def _publish(self, name: str, execution: Execution) -> None:
+        self.broadcaster.publish(name, execution.to_dict())
+
+
+execution_runtime = ExecutionRuntime(
+    ExecutionEngine(StateDriver(machine_state), timers=timing_wheel),
+    engines_by_type={
+        SIMULATOR_TYPE: ExecutionEngine(SimulatorDriver(machine_state), timers=timing_wheel),
+    },
+    max_concurrent=settings.EXECUTION_MAX_CONCURRENT,
+    max_per_event=settings.EXECUTION_MAX_PER_EVENT,
+    update_interval=settings.EXECUTION_UPDATE_INTERVAL_MS / 1000,
+    keep_finished=settings.EXECUTION_KEEP_FINISHED,
+    max_recorded_steps=settings.EXECUTION_HISTORY_MAX_STEPS,
+    history=history_buffer,
+)
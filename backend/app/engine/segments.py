@@ -0,0 +1,668 @@
+"""
+Durable telemetry storage: one append-only segment directory per
+(machine, channel), compressed the way Facebook's Gorilla TSDB does it.
+
+A segment file is an 8 byte header followed by independent blocks, each a
+24 byte header (payload bytes, sample count, first and last timestamp in
+ms) and a bit stream of its samples:
+
+- timestamps as delta-of-delta of milliseconds: 1 bit per sample on a
+  steady clock, 9 for jitter of a few ms; a block whose samples are all
+  evenly spaced stores its spacing once instead;
+- values as the XOR with the previous value: an unchanged value costs 1
+  bit, a changed one only its meaningful bits.
+
+Samples are buffered in memory and written as one block per channel every
+`flush_interval` seconds, so a crash loses at most one interval and the
+SD card sees one small append per channel instead of a write per sample.
+Completed rollup buckets of the in-memory series (see `series.py`) are
+appended alongside, uncompressed, so charts of long ranges can be answered
+after a restart without decoding raw blocks.
+The active segment is sealed (renamed to `<first_ms>-<last_ms>.seg`) once
+it reaches `segment_bytes` or spans `segment_seconds`, which also bounds
+how far past retention a segment can outlive its oldest samples. Reads memory-map the segments and only decode
+the blocks overlapping the requested range. A background job deletes
+segments past the retention period and re-encodes sealed ones into large
+blocks, which share the per-block overhead among more samples.
+"""
+import asyncio
+import functools
+import hashlib
+import logging
+import mmap
+import os
+import shutil
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+from urllib.parse import quote
+
+import numpy as np
+
+from app.core.background import BackgroundTask
+from app.core.config import settings
+from app.schemas.ingest import frame_columns
+
+logger = logging.getLogger(__name__)
+
+FILE_HEADER = struct.Struct("<4sB3x")
+MAGIC, VERSION = b"GSEG", 1
+BLOCK_HEADER = struct.Struct("<IIqq")  # payload bytes, count, first_ms, last_ms
+ACTIVE = "active.seg"
+# Samples per block when compaction re-encodes a sealed segment
+COMPACT_BLOCK_SAMPLES = 4096
+# Rollup buckets: float64 (start, min, max, sum, count) rows per bucket width
+ROLLUP_FILE = "rollup-{:g}.bin"
+ROLLUP_ROW = 5 * 8
+
+ChannelKey = Tuple[str, str]
+Column = Tuple[List[float], List[float]]
+Rollups = Dict[float, Tuple[np.ndarray, np.ndarray]]
+
+
+def encode_block(times_ms: Sequence[int], values: Sequence[float]) -> bytes:
+    """Gorilla-encode samples with non-decreasing integer ms timestamps"""
+    words = np.asarray(values, dtype=np.float64).view(np.uint64).tolist()
+    deltas = np.diff(np.asarray(times_ms, dtype=np.int64))
+    # A block sampled on a regular clock stores its one delta up front
+    # instead of a (zero) delta-of-delta per sample
+    regular = len(deltas) == 0 or bool((deltas == deltas[0]).all())
+    if regular:
+        parts = ["1", format(int(deltas[0]) if len(deltas) else 0, "064b")]
+    else:
+        parts = ["0"]
+    parts.append(format(words[0], "064b"))
+    append = parts.append
+    prev_time, prev_delta, prev_word = times_ms[0], 0, words[0]
+    window_lead, window_trail = 65, 0
+    for i in range(1, len(words)):
+        if not regular:
+            timestamp = times_ms[i]
+            delta = timestamp - prev_time
+            dod = delta - prev_delta
+            prev_time, prev_delta = timestamp, delta
+            if dod == 0:
+                append("0")
+            elif -63 <= dod <= 64:
+                append("10" + format(dod & 0x7F, "07b"))
+            elif -255 <= dod <= 256:
+                append("110" + format(dod & 0x1FF, "09b"))
+            elif -2047 <= dod <= 2048:
+                append("1110" + format(dod & 0xFFF, "012b"))
+            else:
+                append("1111" + format(dod & 0xFFFFFFFFFFFFFFFF, "064b"))
+
+        word = words[i]
+        xor = word ^ prev_word
+        prev_word = word
+        if not xor:
+            append("0")
+            continue
+        lead = min(64 - xor.bit_length(), 31)
+        trail = (xor & -xor).bit_length() - 1
+        if lead >= window_lead and trail >= window_trail:
+            width = 64 - window_lead - window_trail
+            append("10" + format(xor >> window_trail, "0%db" % width))
+        else:
+            width = 64 - lead - trail
+            append("11" + format(lead, "05b") + format(width & 63, "06b"))
+            append(format(xor >> trail, "0%db" % width))
+            window_lead, window_trail = lead, trail
+    bits = "".join(parts)
+    padding = -len(bits) % 8
+    return int(bits + "0" * padding, 2).to_bytes((len(bits) + padding) // 8, "big")
+
+
+def decode_block(payload: bytes, count: int, first_ms: int) -> Tuple[List[int], List[int]]:
+    """Timestamps (ms) and raw float64 bit patterns of an encoded block"""
+    bits = format(int.from_bytes(payload, "big"), "0%db" % (len(payload) * 8))
+    regular = bits[0] == "1"
+    pos = 1
+    delta = 0
+    if regular:
+        delta = int(bits[1:65], 2)
+        pos = 65
+    word = int(bits[pos:pos + 64], 2)
+    pos += 64
+    times, words = [first_ms], [word]
+    timestamp = first_ms
+    window_lead, window_trail = 0, 0
+    for _ in range(count - 1):
+        if not regular:
+            if bits[pos] == "0":
+                pos += 1
+            elif bits[pos + 1] == "0":
+                dod = int(bits[pos + 2:pos + 9], 2)
+                delta += dod - 128 if dod > 64 else dod
+                pos += 9
+            elif bits[pos + 2] == "0":
+                dod = int(bits[pos + 3:pos + 12], 2)
+                delta += dod - 512 if dod > 256 else dod
+                pos += 12
+            elif bits[pos + 3] == "0":
+                dod = int(bits[pos + 4:pos + 16], 2)
+                delta += dod - 4096 if dod > 2048 else dod
+                pos += 16
+            else:
+                dod = int(bits[pos + 4:pos + 68], 2)
+                delta += dod - (1 << 64) if dod >= 1 << 63 else dod
+                pos += 68
+        timestamp += delta
+        times.append(timestamp)
+
+        if bits[pos] == "0":
+            pos += 1
+        else:
+            if bits[pos + 1] == "1":
+                window_lead = int(bits[pos + 2:pos + 7], 2)
+                width = int(bits[pos + 7:pos + 13], 2) or 64
+                window_trail = 64 - window_lead - width
+                pos += 13
+            else:
+                width = 64 - window_lead - window_trail
+                pos += 2
+            word ^= int(bits[pos:pos + width], 2) << window_trail
+            pos += width
+        words.append(word)
+    return times, words
+
+
+def _write_blocks(handle: Any, times_ms: List[int], values: List[float], block_samples: int) -> int:
+    written = 0
+    for lo in range(0, len(times_ms), block_samples):
+        times, block_values = times_ms[lo:lo + block_samples], values[lo:lo + block_samples]
+        payload = encode_block(times, block_values)
+        handle.write(BLOCK_HEADER.pack(len(payload), len(times), times[0], times[-1]))
+        handle.write(payload)
+        written += BLOCK_HEADER.size + len(payload)
+    return written
+
+
+def _blocks(buffer: Any) -> Iterator[Tuple[int, int, int, int, int]]:
+    """(offset, size, count, first_ms, last_ms) of each complete block"""
+    offset, end = FILE_HEADER.size, len(buffer)
+    while offset + BLOCK_HEADER.size <= end:
+        size, count, first_ms, last_ms = BLOCK_HEADER.unpack_from(buffer, offset)
+        if offset + BLOCK_HEADER.size + size > end:
+            return
+        yield offset + BLOCK_HEADER.size, size, count, first_ms, last_ms
+        offset += BLOCK_HEADER.size + size
+
+
+def _path_part(name: str) -> str:
+    part = quote(name, safe="")
+    if part.strip(".") == "":
+        part = part.replace(".", "%2E")
+    if len(part) > 200:
+        part = part[:150] + "~" + hashlib.sha1(name.encode()).hexdigest()
+    return part
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def _serialized(method: F) -> F:
+    """Run a store method holding its file lock"""
+    @functools.wraps(method)
+    def locked(self: "SegmentStore", *args: Any, **kwargs: Any) -> Any:
+        with self._io:
+            return method(self, *args, **kwargs)
+    return locked  # type: ignore[return-value]
+
+
+class _Active:
+    """Where the active segment of a channel stands"""
+    __slots__ = ("size", "first_ms", "last_ms")
+
+    def __init__(self, size: int, first_ms: Optional[int], last_ms: int):
+        self.size = size
+        self.first_ms = first_ms
+        self.last_ms = last_ms
+
+
+class SegmentStore(BackgroundTask):
+    """
+    Compressed, append-only telemetry segments under `root`, one directory
+    per machine and channel. An empty `root` disables the store.
+
+    Everything that touches the files holds one lock: the background task
+    writes from worker threads, and a write it started can outlive its
+    cancellation, so `close` must not flush until that write is done.
+    """
+
+    def __init__(
+        self,
+        root: Optional[str],
+        *,
+        segment_bytes: int = 1024 * 1024,
+        segment_seconds: float = 86400.0,
+        flush_interval: float = 60.0,
+        retention: float = 7 * 86400.0,
+        compact_interval: float = 3600.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.root = Path(root) if root else None
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self.compact_interval = compact_interval
+        self.clock = clock
+        self._pending: Dict[ChannelKey, Column] = {}
+        self._writing: Dict[ChannelKey, Column] = {}
+        self._active: Dict[ChannelKey, _Active] = {}
+        # Rollup rows to append, and how many rows each file keeps
+        self._rollups: Dict[Tuple[ChannelKey, float], Tuple[List[np.ndarray], int]] = {}
+        self._writing_rollups: Dict[Tuple[ChannelKey, float], Tuple[List[np.ndarray], int]] = {}
+        self._io = threading.Lock()
+        self.samples = 0
+        self.written_bytes = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.sealed = 0
+        self.compacted = 0
+        self.expired = 0
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.root is not None
+
+    def channel_dir(self, machine_id: str, channel: str) -> Path:
+        return self.root / _path_part(machine_id) / _path_part(channel)
+
+    def ingest(self, frames: Sequence[Any]) -> None:
+        """Ingest pipeline sink: buffer samples until the next flush"""
+        if self.root is None:
+            return
+        pending = self._pending
+        for key, (timestamps, values) in frame_columns(frames).items():
+            column = pending.get(key)
+            if column is None:
+                pending[key] = (timestamps, values)
+            else:
+                column[0].extend(timestamps)
+                column[1].extend(values)
+            self.samples += len(timestamps)
+        self.start()
+
+    def add_rollups(
+        self, key: ChannelKey, width: float, times: np.ndarray, rows: np.ndarray, keep: int
+    ) -> None:
+        """
+        Buffer completed rollup buckets of a channel until the next flush;
+        its file is trimmed to the newest `keep` rows once it doubles that
+        """
+        if self.root is None or not len(times):
+            return
+        chunks, _ = self._rollups.setdefault((key, width), ([], keep))
+        chunks.append(np.column_stack((times, rows)))
+        self.start()
+
+    def read_rollups(self, machine_id: str, channel: str) -> Rollups:
+        """Stored rollup buckets of a channel by bucket width, oldest first"""
+        rollups: Rollups = {}
+        if self.root is None:
+            return rollups
+        directory = self.channel_dir(machine_id, channel)
+        for path in directory.glob("rollup-*.bin"):
+            width = float(path.stem.split("-", 1)[1])
+            data = np.fromfile(path, dtype=np.float64)
+            # Drop a row torn by a crash mid-write
+            data = data[:len(data) // 5 * 5].reshape(-1, 5)
+            rollups[width] = (data[:, 0], data[:, 1:])
+        return rollups
+
+    def flush(self) -> int:
+        """Write everything buffered, one block per channel; returns bytes written"""
+        self._writing, self._pending = self._pending, {}
+        try:
+            written = self._write(self._writing)
+        except Exception:
+            self._restore()
+            raise
+        finally:
+            self._writing = {}
+        return written + self._flush_rollups()
+
+    def buffered(self, machine_id: str, channel: str) -> List[Column]:
+        """Copies of a channel's samples not written yet, for `read` off the loop"""
+        return [
+            (list(column[0]), list(column[1])) for column in (
+                self._writing.get((machine_id, channel)), self._pending.get((machine_id, channel))
+            ) if column
+        ]
+
+    def read(
+        self,
+        machine_id: str,
+        channel: str,
+        start: float,
+        end: float,
+        buffered: Optional[List[Column]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Stored samples with `start <= timestamp < end` (seconds), oldest
+        first. A caller in a worker thread passes `buffered()` taken on the
+        event loop, which the buffers it reads otherwise may change under.
+        """
+        times: List[int] = []
+        words: List[int] = []
+        start_ms, end_ms = int(np.floor(start * 1000)), int(np.ceil(end * 1000))
+        if self.root is not None:
+            for path in self._segments(self.channel_dir(machine_id, channel), start_ms, end_ms):
+                self._read_file(path, start_ms, end_ms, times, words)
+        if buffered is None:
+            buffered = self.buffered(machine_id, channel)
+        times_all = np.concatenate(
+            [np.array(times, dtype=np.int64) / 1000.0]
+            + [np.asarray(column[0], dtype=np.float64) for column in buffered]
+        )
+        values_all = np.concatenate(
+            [np.array(words, dtype=np.uint64).view(np.float64)]
+            + [np.asarray(column[1], dtype=np.float64) for column in buffered]
+        )
+        keep = (times_all >= start) & (times_all < end)
+        return times_all[keep], values_all[keep]
+
+    @_serialized
+    def compact(self, now: Optional[float] = None) -> Tuple[int, int]:
+        """
+        Delete segments whose newest sample is past retention and re-encode
+        sealed segments still made of small per-flush blocks. Returns
+        (segments deleted, segments compacted).
+        """
+        if self.root is None or not self.root.exists():
+            return 0, 0
+        cutoff_ms = int(((self.clock() if now is None else now) - self.retention) * 1000)
+        expired = compacted = 0
+        for directory in self.root.glob("*/*"):
+            for path in sorted(directory.glob("*.seg")):
+                last_ms = self._last_ms(path)
+                if last_ms is not None and last_ms >= cutoff_ms:
+                    if path.name != ACTIVE and self._compact_file(path):
+                        compacted += 1
+                    continue
+                if path.name == ACTIVE:
+                    self._active = {
+                        key: active for key, active in self._active.items()
+                        if self.channel_dir(*key) != directory
+                    }
+                path.unlink()
+                expired += 1
+        self.expired += expired
+        self.compacted += compacted
+        return expired, compacted
+
+    @_serialized
+    def remove_machines(self, machine_ids: Iterable[str]) -> None:
+        """Delete deleted machines' segments and drop what is buffered for them"""
+        if self.root is None:
+            return
+        machine_ids = set(machine_ids)
+        # Snapshots of the keys: a commit on another thread can get here
+        # while the event loop buffers more samples
+        for columns in (self._pending, self._writing, self._active):
+            for key in [key for key in list(columns) if key[0] in machine_ids]:
+                columns.pop(key, None)
+        for rollups in (self._rollups, self._writing_rollups):
+            for item in [item for item in list(rollups) if item[0][0] in machine_ids]:
+                rollups.pop(item, None)
+        for machine_id in machine_ids:
+            shutil.rmtree(self.root / _path_part(machine_id), ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "pending_samples": sum(len(column[0]) for column in self._pending.values()),
+            "samples": self.samples,
+            "written_bytes": self.written_bytes,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "sealed": self.sealed,
+            "compacted": self.compacted,
+            "expired": self.expired,
+            "dropped": self.dropped,
+        }
+
+    @_serialized
+    def _write(self, columns: Dict[ChannelKey, Column]) -> int:
+        written = 0
+        for key, (timestamps, values) in columns.items():
+            active = self._open(key)
+            times_ms = np.rint(np.asarray(timestamps, dtype=np.float64) * 1000).astype(np.int64)
+            # Keep samples no older than anything already stored before them
+            keep = times_ms >= np.maximum.accumulate(
+                np.concatenate(([active.last_ms], times_ms[:-1]))
+            )
+            if not keep.all():
+                self.dropped += int(len(keep) - keep.sum())
+                times_ms = times_ms[keep]
+                values = np.asarray(values, dtype=np.float64)[keep]
+            if not len(times_ms):
+                continue
+            path = self.channel_dir(*key) / ACTIVE
+            with open(path, "ab") as handle:
+                if active.size == 0:
+                    handle.write(FILE_HEADER.pack(MAGIC, VERSION))
+                    active.size = FILE_HEADER.size
+                size = _write_blocks(handle, times_ms.tolist(), values, len(times_ms))
+            written += size
+            active.size += size
+            if active.first_ms is None:
+                active.first_ms = int(times_ms[0])
+            active.last_ms = int(times_ms[-1])
+            if (
+                active.size >= self.segment_bytes
+                or active.last_ms - active.first_ms >= self.segment_seconds * 1000
+            ):
+                self._seal(key, active)
+        self.flushes += 1
+        self.written_bytes += written
+        return written
+
+    def _flush_rollups(self) -> int:
+        rollups = self._writing_rollups = self._rollups
+        self._rollups = {}
+        try:
+            return self._write_rollups(rollups)
+        except Exception:
+            self._restore_rollups(rollups)
+            raise
+        finally:
+            self._writing_rollups = {}
+
+    def _restore_rollups(
+        self, rollups: Dict[Tuple[ChannelKey, float], Tuple[List[np.ndarray], int]]
+    ) -> None:
+        """Put back rollup rows whose write failed, ahead of newer ones"""
+        self.failed_flushes += 1
+        for item, (chunks, keep) in rollups.items():
+            newer = self._rollups.get(item, ([], keep))[0]
+            self._rollups[item] = (chunks + newer, keep)
+
+    @_serialized
+    def _write_rollups(
+        self, rollups: Dict[Tuple[ChannelKey, float], Tuple[List[np.ndarray], int]]
+    ) -> int:
+        written = 0
+        for (key, width), (chunks, keep) in rollups.items():
+            directory = self.channel_dir(*key)
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / ROLLUP_FILE.format(width)
+            data = np.concatenate(chunks).astype(np.float64).tobytes()
+            with open(path, "ab") as handle:
+                size = handle.tell()
+                if size % ROLLUP_ROW:
+                    handle.truncate(size - size % ROLLUP_ROW)
+                    size -= size % ROLLUP_ROW
+                handle.write(data)
+            written += len(data)
+            if size + len(data) > 2 * keep * ROLLUP_ROW:
+                rows = np.fromfile(path, dtype=np.float64)[-keep * 5:]
+                temporary = path.with_suffix(".tmp")
+                rows.tofile(temporary)
+                temporary.replace(path)
+        self.written_bytes += written
+        return written
+
+    def _restore(self) -> None:
+        """Put back samples whose write failed, ahead of newer ones"""
+        self.failed_flushes += 1
+        for key, (timestamps, values) in self._pending.items():
+            column = self._writing.setdefault(key, ([], []))
+            column[0].extend(timestamps)
+            column[1].extend(values)
+        self._pending = self._writing
+
+    def _open(self, key: ChannelKey) -> _Active:
+        """State of a channel's active segment, recovering it after a restart"""
+        active = self._active.get(key)
+        if active is not None:
+            return active
+        directory = self.channel_dir(*key)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / ACTIVE
+        active = _Active(0, None, -(1 << 62))
+        if path.exists() and path.stat().st_size >= FILE_HEADER.size:
+            with open(path, "r+b") as handle:
+                data = handle.read()
+                end = FILE_HEADER.size
+                for offset, size, _, first_ms, last_ms in _blocks(data):
+                    if active.first_ms is None:
+                        active.first_ms = first_ms
+                    active.last_ms = last_ms
+                    end = offset + size
+                if end < len(data):
+                    # A block torn by a crash mid-write
+                    handle.truncate(end)
+                active.size = end
+        else:
+            path.unlink(missing_ok=True)
+        sealed = [p for p in directory.glob("*.seg") if p.name != ACTIVE]
+        if sealed and active.first_ms is None:
+            active.last_ms = max(int(p.stem.split("-")[1]) for p in sealed)
+        self._active[key] = active
+        return active
+
+    def _seal(self, key: ChannelKey, active: _Active) -> None:
+        directory = self.channel_dir(*key)
+        path = directory / ACTIVE
+        with open(path, "rb") as handle:
+            os.fsync(handle.fileno())
+        path.rename(directory / f"{active.first_ms:016d}-{active.last_ms:016d}.seg")
+        self._active[key] = _Active(0, None, active.last_ms)
+        self.sealed += 1
+
+    def _segments(self, directory: Path, start_ms: int, end_ms: int) -> List[Path]:
+        if not directory.exists():
+            return []
+        paths = []
+        for path in sorted(directory.glob("*.seg")):
+            if path.name != ACTIVE:
+                first_ms, last_ms = (int(part) for part in path.stem.split("-"))
+                if last_ms < start_ms or first_ms >= end_ms:
+                    continue
+            paths.append(path)
+        # The active segment holds the newest samples
+        return sorted(paths, key=lambda path: path.name == ACTIVE)
+
+    def _read_file(
+        self, path: Path, start_ms: int, end_ms: int, times: List[int], words: List[int]
+    ) -> None:
+        with open(path, "rb") as handle:
+            if os.fstat(handle.fileno()).st_size <= FILE_HEADER.size:
+                return
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for offset, size, count, first_ms, last_ms in _blocks(mapped):
+                    if last_ms < start_ms or first_ms >= end_ms:
+                        continue
+                    block_times, block_words = decode_block(mapped[offset:offset + size], count, first_ms)
+                    if first_ms >= start_ms and last_ms < end_ms:
+                        times.extend(block_times)
+                        words.extend(block_words)
+                        continue
+                    for timestamp, word in zip(block_times, block_words):
+                        if start_ms <= timestamp < end_ms:
+                            times.append(timestamp)
+                            words.append(word)
+
+    def _last_ms(self, path: Path) -> Optional[int]:
+        if path.name != ACTIVE:
+            return int(path.stem.split("-")[1])
+        with open(path, "rb") as handle:
+            data = handle.read()
+        last = None
+        for _, _, _, _, last_ms in _blocks(data):
+            last = last_ms
+        return last
+
+    def _compact_file(self, path: Path) -> bool:
+        with open(path, "rb") as handle:
+            data = handle.read()
+        blocks = list(_blocks(data))
+        samples = sum(block[2] for block in blocks)
+        if len(blocks) <= 1 or samples / len(blocks) >= COMPACT_BLOCK_SAMPLES / 2:
+            return False
+        times: List[int] = []
+        words: List[int] = []
+        for offset, size, count, first_ms, _ in blocks:
+            block_times, block_words = decode_block(data[offset:offset + size], count, first_ms)
+            times.extend(block_times)
+            words.extend(block_words)
+        values = np.array(words, dtype=np.uint64).view(np.float64)
+        temporary = path.with_suffix(".tmp")
+        with open(temporary, "wb") as handle:
+            handle.write(FILE_HEADER.pack(MAGIC, VERSION))
+            _write_blocks(handle, times, values, COMPACT_BLOCK_SAMPLES)
+            handle.flush()
+            os.fsync(handle.fileno())
+        temporary.replace(path)
+        return True
+
+    def _should_run(self) -> bool:
+        return self.root is not None
+
+    async def _drain(self) -> None:
+        if self._pending or self._rollups:
+            self.flush()
+
+    async def _run(self) -> None:
+        next_compact = self.clock() + self.compact_interval
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._pending:
+                self._writing, self._pending = self._pending, {}
+                try:
+                    await asyncio.to_thread(self._write, self._writing)
+                except Exception:
+                    logger.exception("Writing telemetry segments failed")
+                    self._restore()
+                finally:
+                    self._writing = {}
+            if self._rollups:
+                rollups = self._writing_rollups = self._rollups
+                self._rollups = {}
+                try:
+                    await asyncio.to_thread(self._write_rollups, rollups)
+                except Exception:
+                    logger.exception("Writing telemetry rollups failed")
+                    self._restore_rollups(rollups)
+                finally:
+                    self._writing_rollups = {}
+            if self.clock() >= next_compact:
+                next_compact = self.clock() + self.compact_interval
+                try:
+                    await asyncio.to_thread(self.compact)
+                except Exception:
+                    logger.exception("Compacting telemetry segments failed")
+
+
+segment_store = SegmentStore(
+    settings.SERIES_DATA_DIR,
+    segment_bytes=settings.SERIES_SEGMENT_KB * 1024,
+    flush_interval=settings.SERIES_FLUSH_SECONDS,
+    retention=settings.SERIES_RETENTION_DAYS * 86400,
+)
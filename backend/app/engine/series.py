@@ -0,0 +1,567 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.engine.downsample import as_rows, combine, downsample
+from app.engine.segments import Rollups, SegmentStore, segment_store
+from app.schemas.ingest import frame_columns
+
+ChannelKey = Tuple[str, str]  # (machine_id, input or output id)
+
+# Rollup tiers kept per channel: (bucket width in seconds, buckets kept),
+# i.e. 6 hours of seconds, a week of minutes and a year of hours
+ROLLUP_TIERS = ((1.0, 6 * 3600), (60.0, 7 * 24 * 60), (3600.0, 365 * 24))
+# Seconds of new raw samples between roll-ups; reads roll up first anyway
+ROLLUP_INTERVAL = 10.0
+# Tiers from this one up (1m, 1h) are saved to the archive and reloaded
+# after a restart; the 1s tier would cost more disk than it is worth
+PERSISTED_TIER = 1
+
+
+class RingBuffer:
+    """
+    Fixed-capacity time series of (timestamp, value) float64 samples, or
+    of (timestamp, row) with `columns` values per row.
+
+    Both arrays are stored twice over, back to back: every sample is
+    written at `i` and `i + size`, so the newest `count` samples are always
+    one contiguous run starting at `head` and windows are plain NumPy views
+    whether or not the ring has wrapped. Storage starts small and doubles
+    up to `capacity`; once full the oldest sample is overwritten. Samples
+    older than the newest one already stored are dropped.
+    """
+
+    __slots__ = ("capacity", "size", "head", "count", "dropped", "_row", "_times", "_values")
+
+    def __init__(self, capacity: int, initial_size: int = 256, columns: Optional[int] = None):
+        self.capacity = capacity
+        self.size = max(1, min(initial_size, capacity))
+        self.head = 0
+        self.count = 0
+        self.dropped = 0
+        self._row = () if columns is None else (columns,)
+        self._times = np.empty(2 * self.size, dtype=np.float64)
+        self._values = np.empty((2 * self.size, *self._row), dtype=np.float64)
+
+    @property
+    def nbytes(self) -> int:
+        return self._times.nbytes + self._values.nbytes
+
+    @property
+    def times(self) -> np.ndarray:
+        return self._times[self.head:self.head + self.count]
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values[self.head:self.head + self.count]
+
+    @property
+    def last_time(self) -> float:
+        return self._times[self.head + self.count - 1] if self.count else -np.inf
+
+    def append(self, timestamp: float, value: float) -> bool:
+        if timestamp < self.last_time:
+            self.dropped += 1
+            return False
+        if self.count == self.size and self.size < self.capacity:
+            self._grow(self.size + 1)
+        size = self.size
+        tail = self.head + self.count
+        if tail >= size:
+            tail -= size
+        self._times[tail] = self._times[tail + size] = timestamp
+        self._values[tail] = self._values[tail + size] = value
+        if self.count < size:
+            self.count += 1
+        else:
+            self.head = self.head + 1 if self.head + 1 < size else 0
+        return True
+
+    def extend(self, timestamps: np.ndarray, values: np.ndarray) -> int:
+        """Append samples in time order; returns how many were kept"""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        n = len(timestamps)
+        if not n:
+            return 0
+        if timestamps[0] < self.last_time or (n > 1 and (timestamps[1:] < timestamps[:-1]).any()):
+            # Keep samples no older than anything before them
+            floor = np.maximum.accumulate(np.concatenate(([self.last_time], timestamps[:-1])))
+            keep = timestamps >= floor
+            self.dropped += int(n - keep.sum())
+            timestamps, values = timestamps[keep], values[keep]
+            n = len(timestamps)
+        if self.count + n > self.size and self.size < self.capacity:
+            self._grow(self.count + n)
+        size = self.size
+        if n >= size:
+            self._times[:size] = self._times[size:] = timestamps[-size:]
+            self._values[:size] = self._values[size:] = values[-size:]
+            self.head, self.count = 0, size
+            return n
+        # Write one contiguous run from the tail (which may reach into the
+        # mirror half), then copy each part to its twin in the other half
+        tail = self.head + self.count
+        if tail >= size:
+            tail -= size
+        end = tail + n
+        self._times[tail:end] = timestamps
+        self._values[tail:end] = values
+        split = min(end, size)
+        if tail < split:
+            self._times[tail + size:split + size] = self._times[tail:split]
+            self._values[tail + size:split + size] = self._values[tail:split]
+        if end > size:
+            self._times[:end - size] = self._times[size:end]
+            self._values[:end - size] = self._values[size:end]
+        overflow = self.count + n - size
+        if overflow > 0:
+            self.head = (self.head + overflow) % size
+            self.count = size
+        else:
+            self.count += n
+        return n
+
+    def nbytes_at(self, capacity: int) -> int:
+        """What the buffer would take after `shrink(capacity)`"""
+        return self.nbytes // self.size * min(self.size, max(1, capacity))
+
+    def shrink(self, capacity: int) -> None:
+        """Lower the capacity for good, keeping the newest samples that fit"""
+        capacity = max(1, capacity)
+        if capacity >= self.capacity:
+            return
+        self.capacity = capacity
+        if self.size <= capacity:
+            return
+        keep = min(self.count, capacity)
+        times = np.empty(2 * capacity, dtype=np.float64)
+        values = np.empty((2 * capacity, *self._row), dtype=np.float64)
+        times[:keep] = times[capacity:capacity + keep] = self.times[self.count - keep:]
+        values[:keep] = values[capacity:capacity + keep] = self.values[self.count - keep:]
+        self._times, self._values = times, values
+        self.size, self.head, self.count = capacity, 0, keep
+
+    def window(
+        self, start: Optional[float] = None, end: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Views of the samples with `start <= timestamp <= end`"""
+        times, values = self.times, self.values
+        lo = 0 if start is None else int(np.searchsorted(times, start, "left"))
+        hi = self.count if end is None else int(np.searchsorted(times, end, "right"))
+        return times[lo:hi], values[lo:hi]
+
+    def _grow(self, needed: int) -> None:
+        size = self.size
+        while size < needed and size < self.capacity:
+            size = min(size * 2, self.capacity)
+        times = np.empty(2 * size, dtype=np.float64)
+        values = np.empty((2 * size, *self._row), dtype=np.float64)
+        count = self.count
+        times[:count] = times[size:size + count] = self.times
+        values[:count] = values[size:size + count] = self.values
+        self._times, self._values = times, values
+        self.size, self.head = size, 0
+
+
+class RollupTier:
+    """
+    Fixed-width (min, max, sum, count) buckets rolled up from a finer
+    source. Rows of the source before `watermark` are folded in; the bucket
+    still filling up stays in the source until it's complete.
+    """
+
+    __slots__ = ("width", "buffer", "watermark", "unsaved")
+
+    def __init__(self, width: float, capacity: int, initial_size: int = 16):
+        self.width = width
+        self.buffer = RingBuffer(capacity, initial_size, columns=4)
+        self.watermark = -np.inf
+        # Newest buckets not handed to the archive yet
+        self.unsaved = 0
+
+    def due(self, complete_before: float) -> bool:
+        """Whether a bucket was completed since the last roll"""
+        return np.floor(complete_before / self.width) * self.width > self.watermark
+
+    def roll(self, times: np.ndarray, rows: np.ndarray, complete_before: float) -> None:
+        """Fold the source's rows into every bucket ending by `complete_before`"""
+        sealed_until = np.floor(complete_before / self.width) * self.width
+        lo = int(np.searchsorted(times, self.watermark, "left"))
+        hi = int(np.searchsorted(times, sealed_until, "left"))
+        if hi > lo:
+            ids = np.floor(times[lo:hi] / self.width)
+            starts, merged = combine(ids, rows[lo:hi])
+            self.unsaved += self.buffer.extend(ids[starts] * self.width, merged)
+        self.watermark = max(self.watermark, sealed_until)
+
+    def take_unsaved(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Copies of the buckets completed since the last call"""
+        count = min(self.unsaved, self.buffer.count)
+        self.unsaved = 0
+        return (
+            self.buffer.times[self.buffer.count - count:].copy(),
+            self.buffer.values[self.buffer.count - count:].copy(),
+        )
+
+    def restore(self, times: np.ndarray, rows: np.ndarray) -> None:
+        """Put saved buckets older than any held back in front of them"""
+        buffer = self.buffer
+        if buffer.count:
+            keep = times < buffer.times[0]
+            times, rows = times[keep], rows[keep]
+        if not len(times):
+            return
+        restored = RingBuffer(buffer.capacity, len(times) + buffer.count, columns=4)
+        restored.extend(np.concatenate((times, buffer.times)), np.concatenate((rows, buffer.values)))
+        self.buffer = restored
+        if not np.isfinite(self.watermark):
+            self.watermark = restored.last_time + self.width
+
+
+class Series:
+    """
+    History of one channel: raw samples plus rollup tiers, each rolled up
+    from the next finer one (raw → 1s → 1m → 1h), so long ranges are
+    answered from a coarse tier without scanning raw samples.
+    """
+
+    __slots__ = ("raw", "tiers", "nbytes")
+
+    def __init__(self, capacity: int, initial_size: int = 256):
+        self.raw = RingBuffer(capacity, initial_size)
+        self.tiers = [RollupTier(width, buckets) for width, buckets in ROLLUP_TIERS]
+        self.nbytes = 0
+        self._measure()
+
+    def append(self, timestamp: float, value: float) -> int:
+        """Add a sample; returns how many bytes the series grew by"""
+        size = self.raw.size
+        self.raw.append(timestamp, value)
+        if timestamp >= self.tiers[0].watermark + ROLLUP_INTERVAL:
+            return self.roll()
+        return self._measure() if self.raw.size != size else 0
+
+    def extend(self, timestamps: Sequence[float], values: Sequence[float]) -> int:
+        size = self.raw.size
+        self.raw.extend(timestamps, values)
+        if self.raw.last_time >= self.tiers[0].watermark + ROLLUP_INTERVAL:
+            return self.roll()
+        return self._measure() if self.raw.size != size else 0
+
+    def roll(self) -> int:
+        """Bring every tier up to date with the completed buckets below it"""
+        if self.raw.count:
+            complete_before = self.raw.last_time
+            first = self.tiers[0]
+            if first.due(complete_before):
+                times, values = self.raw.window(first.watermark)
+                first.roll(times, as_rows(values), complete_before)
+            for source, tier in zip(self.tiers, self.tiers[1:]):
+                if not tier.due(source.watermark):
+                    break
+                tier.roll(source.buffer.times, source.buffer.values, source.watermark)
+        return self._measure()
+
+    def shrink_raw(self, floor: int) -> int:
+        """
+        Halve the raw ring's capacity, not below `floor`, after rolling up
+        what it holds so the tiers keep it; returns the change in bytes
+        """
+        if self.raw.capacity <= floor:
+            return 0
+        grown = self.roll()
+        self.raw.shrink(max(floor, self.raw.capacity // 2))
+        return grown + self._measure()
+
+    def restore(self, rollups: Rollups) -> int:
+        """Reload tiers saved to the archive; returns the change in bytes"""
+        for tier in self.tiers[PERSISTED_TIER:]:
+            saved = rollups.get(tier.width)
+            if saved is not None:
+                tier.restore(*saved)
+        return self._measure()
+
+    def resolution(self, level: int) -> float:
+        return self.tiers[level - 1].width if level else 0.0
+
+    def level_for(self, start: float, end: float, points: int) -> int:
+        """
+        Coarsest level (0 raw, then each tier) still finer than one output
+        point, moving coarser while that reaches further back towards
+        `start` than what the chosen level holds.
+        """
+        step = (end - start) / max(points, 1)
+        level = 0
+        for index, tier in enumerate(self.tiers, 1):
+            if tier.width <= step:
+                level = index
+        while level < len(self.tiers) and self.oldest(level) > start:
+            # Only worth it if the coarser level holds more than bucket alignment
+            if self.oldest(level + 1) > self.oldest(level) - self.tiers[level].width:
+                break
+            level += 1
+        return level
+
+    def rows(self, start: float, end: float, level: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Aggregate rows for [start, end] from `level`; the stretch past a
+        tier's watermark (not rolled up yet) comes from the finer levels.
+        """
+        if level == 0:
+            times, values = self.raw.window(start, end)
+            return times, as_rows(values)
+        tier = self.tiers[level - 1]
+        times, rows = tier.buffer.window(start, end)
+        if end < tier.watermark:
+            return times, rows
+        tail_times, tail_rows = self.rows(max(start, tier.watermark), end, level - 1)
+        return np.concatenate((times, tail_times)), np.concatenate((rows, tail_rows))
+
+    def _measure(self) -> int:
+        nbytes = self.raw.nbytes + sum(tier.buffer.nbytes for tier in self.tiers)
+        grown, self.nbytes = nbytes - self.nbytes, nbytes
+        return grown
+
+    def oldest(self, level: int) -> float:
+        """Time of the oldest sample or bucket held at `level`"""
+        buffer = self.tiers[level - 1].buffer if level else self.raw
+        return buffer.times[0] if buffer.count else np.inf
+
+
+class TimeSeriesStore:
+    """
+    Recent history of every numeric machine input and output, one `Series`
+    per (machine_id, channel).
+
+    Inputs and outputs share the channel namespace; booleans are stored as
+    0/1 and string values are skipped. All buffers together stay within
+    `memory_budget` bytes. When a channel is created or grows past it, the
+    raw rings of the channels least recently written or read are halved
+    first, down to `capacity // 16` samples each, which keeps every
+    channel's rollup tiers; channels are only evicted whole once shrinking
+    can't make room. Ranges older than what memory holds (after a restart
+    or an eviction) are read from the on-disk `archive` when there is one,
+    in a worker thread. The archive also keeps the 1 m and 1 h tiers, which
+    a channel reloads when it is next written or read, so long ranges are
+    never answered by decoding raw blocks.
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity: int = 36000,
+        memory_budget: int = 256 * 1024 * 1024,
+        initial_size: int = 256,
+        archive: Optional[SegmentStore] = None,
+    ):
+        self.capacity = capacity
+        self.memory_budget = memory_budget
+        self.initial_size = initial_size
+        self.archive = archive
+        self.channels: "OrderedDict[ChannelKey, Series]" = OrderedDict()
+        # Raw ring capacity memory pressure may shrink a channel to
+        self.min_capacity = max(1, capacity // 16)
+        self.nbytes = 0
+        self.evicted = 0
+        self.shrunk = 0
+        self._tasks: "set[asyncio.Task]" = set()
+
+    def get(self, machine_id: str, channel: str) -> Optional[Series]:
+        series = self.channels.get((machine_id, channel))
+        if series is not None:
+            self.channels.move_to_end((machine_id, channel))
+        return series
+
+    def window(
+        self,
+        machine_id: str,
+        channel: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Raw samples of a channel between `start` and `end`, as views"""
+        series = self.get(machine_id, channel)
+        if series is None:
+            empty = np.empty(0, dtype=np.float64)
+            return empty, empty
+        return series.raw.window(start, end)
+
+    async def downsample(
+        self,
+        machine_id: str,
+        channel: str,
+        start: float,
+        end: float,
+        points: int,
+        method: str = "minmax",
+    ) -> Tuple[float, np.ndarray, np.ndarray]:
+        """
+        At most `points` points of a channel over [start, end], read from
+        the coarsest level that still resolves them. Returns the resolution
+        used (0 for raw samples), the times and the rows (see
+        `downsample.downsample`). The stretch before what that level holds
+        is read from the archive as raw samples.
+        """
+        key = (machine_id, channel)
+        archive = self.archive if self.archive is not None and self.archive.enabled else None
+        series = self.get(machine_id, channel)
+        if series is None and archive is not None:
+            rollups = await asyncio.to_thread(archive.read_rollups, machine_id, channel)
+            if rollups:
+                series = self._series(key, restore=False)
+                self._account(series.restore(rollups), key)
+        resolution = 0.0
+        level = 0
+        oldest = np.inf
+        if series is not None:
+            self._account(series.roll(), key)
+            if series.tiers[PERSISTED_TIER].unsaved:
+                self._save(key, series)
+            level = series.level_for(start, end, points)
+            resolution = series.resolution(level)
+            oldest = series.oldest(level)
+        archived_times = np.empty(0, dtype=np.float64)
+        archived_values = np.empty(0, dtype=np.float64)
+        if archive is not None and start < oldest:
+            archived_times, archived_values = await asyncio.to_thread(
+                archive.read, machine_id, channel, start, min(end, oldest),
+                archive.buffered(machine_id, channel),
+            )
+        # Read after the archive: the buffers may have moved on while it was
+        # read, and the views below must not be held across an await
+        times = np.empty(0, dtype=np.float64)
+        rows = np.empty((0, 4), dtype=np.float64)
+        if series is not None:
+            times, rows = series.rows(start, end, level)
+        if len(archived_times):
+            times = np.concatenate((archived_times, times))
+            rows = np.concatenate((as_rows(archived_values), rows))
+        return (resolution, *downsample(times, rows, start, end, points, method))
+
+    def append(self, machine_id: str, channel: str, timestamp: float, value: float) -> None:
+        series = self._series((machine_id, channel))
+        grown = series.append(timestamp, value)
+        if grown:
+            self._account(grown, (machine_id, channel))
+        if series.tiers[PERSISTED_TIER].unsaved:
+            self._save((machine_id, channel), series)
+
+    def extend(
+        self, machine_id: str, channel: str, timestamps: Sequence[float], values: Sequence[float]
+    ) -> None:
+        series = self._series((machine_id, channel))
+        grown = series.extend(timestamps, values)
+        if grown:
+            self._account(grown, (machine_id, channel))
+        if series.tiers[PERSISTED_TIER].unsaved:
+            self._save((machine_id, channel), series)
+
+    def ingest(self, frames: Sequence[Any]) -> None:
+        """Ingest pipeline sink: append a batch of frames, one extend per channel"""
+        for (machine_id, channel), (timestamps, values) in frame_columns(frames).items():
+            if len(timestamps) == 1:
+                self.append(machine_id, channel, timestamps[0], values[0])
+            else:
+                self.extend(machine_id, channel, timestamps, values)
+
+    def forget(self, machine_id: str) -> None:
+        for key in [key for key in self.channels if key[0] == machine_id]:
+            self.nbytes -= self.channels.pop(key).nbytes
+
+    def clear(self) -> None:
+        self.channels.clear()
+        self.nbytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "channels": len(self.channels),
+            "samples": sum(series.raw.count for series in self.channels.values()),
+            "bytes": self.nbytes,
+            "memory_budget": self.memory_budget,
+            "evicted": self.evicted,
+            "shrunk": self.shrunk,
+            "dropped": sum(series.raw.dropped for series in self.channels.values()),
+        }
+
+    def _series(self, key: ChannelKey, restore: bool = True) -> Series:
+        series = self.channels.get(key)
+        if series is None:
+            series = self.channels[key] = Series(self.capacity, self.initial_size)
+            self._account(series.nbytes, key)
+            if restore and self.archive is not None and self.archive.enabled:
+                self._spawn(self._restore(key))
+        else:
+            self.channels.move_to_end(key)
+        return series
+
+    def _save(self, key: ChannelKey, series: Series) -> None:
+        """Hand a channel's newly completed 1 m and 1 h buckets to the archive"""
+        for tier in series.tiers[PERSISTED_TIER:]:
+            if tier.unsaved:
+                times, rows = tier.take_unsaved()
+                if self.archive is not None:
+                    self.archive.add_rollups(key, tier.width, times, rows, tier.buffer.capacity)
+
+    async def _restore(self, key: ChannelKey) -> None:
+        rollups = await asyncio.to_thread(self.archive.read_rollups, *key)
+        series = self.channels.get(key)
+        if rollups and series is not None:
+            self._account(series.restore(rollups), key)
+
+    def _spawn(self, coroutine: Any) -> None:
+        try:
+            task = asyncio.get_running_loop().create_task(coroutine)
+        except RuntimeError:
+            # No running loop; the channel is restored when it is next read
+            coroutine.close()
+            return
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _account(self, added: int, key: ChannelKey) -> None:
+        self.nbytes += added
+        if added <= 0:
+            return
+        # Coldest channels sit at the front; never touch the one being written
+        while self.nbytes > self.memory_budget and len(self.channels) > 1:
+            floor = self.min_capacity
+            spare = sum(
+                series.raw.nbytes - series.raw.nbytes_at(floor)
+                for other, series in self.channels.items()
+                if other != key
+            )
+            if self.nbytes - spare <= self.memory_budget:
+                self._shrink(key)
+                return
+            coldest = next(iter(self.channels))
+            if coldest == key:
+                self.channels.move_to_end(key)
+                continue
+            self.nbytes -= self.channels.pop(coldest).nbytes
+            self.evicted += 1
+
+    def _shrink(self, key: ChannelKey) -> None:
+        # Halving passes, coldest first, so warm channels keep the most raw history
+        shrinking = True
+        while shrinking:
+            shrinking = False
+            for other, series in list(self.channels.items()):
+                if other != key:
+                    grown = series.shrink_raw(self.min_capacity)
+                    if grown:
+                        self.nbytes += grown
+                        self.shrunk += 1
+                        shrinking = True
+                if self.nbytes <= self.memory_budget:
+                    return
+
+
+series_store = TimeSeriesStore(
+    capacity=settings.SERIES_CAPACITY,
+    memory_budget=settings.SERIES_MEMORY_MB * 1024 * 1024,
+    archive=segment_store,
+)
@@ -0,0 +1,183 @@
+"""
+Simulation mode: run event plans against simulated machines on a virtual
+clock.
+
+`VirtualClockLoop` is an asyncio event loop whose `time()` only moves when
+the loop would otherwise sit idle waiting for a timer, and then jumps
+straight to that timer's deadline. Every `asyncio.sleep`, `wait_for` and
+`call_later` (and so every `wait` step) completes as soon as nothing else
+is runnable, so an hour of waits takes milliseconds, and the order things
+happen in depends only on the plan and its inputs.
+
+`SimulatorDriver` is the driver for machines of type "simulator": it keeps
+outputs in a `MachineState`, replays scripted input changes by clock time
+and records every side effect in a trace instead of touching hardware or
+the network.
+"""
+import asyncio
+import selectors
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Iterable, List, NamedTuple, Optional, Sequence, Tuple, TypeVar, Union
+
+from app.engine.conditions import Inputs
+from app.engine.executor import ExecutionEngine
+from app.engine.plan import OutputHandle, compile_actions
+from app.engine.state import MachineState, StateDriver
+
+T = TypeVar("T")
+
+SIMULATOR_TYPE = "simulator"
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """
+    Real selector for the loop's own file descriptors whose timed waits
+    advance the loop's virtual clock instead of blocking.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.loop: Optional["VirtualClockLoop"] = None
+
+    def select(self, timeout: Optional[float] = None):
+        if timeout is None:
+            # Nothing scheduled: only another thread can wake the loop
+            return super().select(None)
+        events = super().select(0)
+        if not events and timeout > 0:
+            self.loop.advance(timeout)
+        return events
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """Event loop on a virtual clock that jumps to the next timer when idle"""
+
+    def __init__(self, start: float = 0.0) -> None:
+        selector = _VirtualSelector()
+        super().__init__(selector)
+        selector.loop = self
+        self._virtual_now = start
+
+    def time(self) -> float:
+        return self._virtual_now
+
+    def advance(self, seconds: float) -> None:
+        self._virtual_now += seconds
+
+
+def run_simulated(main: Awaitable[T], start: float = 0.0) -> T:
+    """Run a coroutine to completion on a fresh `VirtualClockLoop`"""
+    # Not asyncio.Runner, which needs Python 3.11
+    loop = VirtualClockLoop(start)
+    try:
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            # Like asyncio.run: cancel what the run left behind
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
+
+
+def loop_clock() -> float:
+    """Clock time of the running loop; virtual on a `VirtualClockLoop`"""
+    return asyncio.get_running_loop().time()
+
+
+class TraceEntry(NamedTuple):
+    """One side effect of a simulated run"""
+    time: float
+    kind: str  # "output", "input", "mqtt" or "http"
+    machine_id: Optional[str]
+    target: str
+    value: Any
+
+
+Stimulus = Tuple[float, Tuple[Optional[str], str], Any]
+
+
+class SimulatorDriver(StateDriver):
+    """
+    Driver for simulated machines.
+
+    `stimuli` are (time, (machine_id, input_id), value) input changes that
+    take effect once the clock reaches their time. HTTP requests answer
+    with `http_status` without leaving the process. The trace keeps the
+    last `max_trace` entries.
+    """
+
+    def __init__(
+        self,
+        state: Optional[MachineState] = None,
+        *,
+        stimuli: Iterable[Stimulus] = (),
+        http_status: int = 200,
+        clock: Callable[[], float] = loop_clock,
+        max_trace: Optional[int] = 10000,
+    ):
+        super().__init__(state if state is not None else MachineState())
+        self._stimuli: Deque[Stimulus] = deque(sorted(stimuli, key=lambda s: s[0]))
+        self.http_status = http_status
+        self.clock = clock
+        self.trace: Deque[TraceEntry] = deque(maxlen=max_trace)
+
+    def set_output(self, handle: OutputHandle, value: Union[bool, int, float]) -> None:
+        super().set_output(handle, value)
+        self.trace.append(TraceEntry(self.clock(), "output", handle.machine_id, handle.output_id, value))
+
+    def read_inputs(self) -> Inputs:
+        stimuli = self._stimuli
+        if stimuli:
+            now = self.clock()
+            while stimuli and stimuli[0][0] <= now:
+                _, (machine_id, input_id), value = stimuli.popleft()
+                self.state.set_inputs(machine_id, {input_id: value})
+                self.trace.append(TraceEntry(now, "input", machine_id, input_id, value))
+        return self.state.inputs
+
+    async def mqtt_publish(self, topic: str, payload: bytes, qos: int, retain: bool) -> None:
+        self.trace.append(TraceEntry(self.clock(), "mqtt", None, topic, payload))
+
+    async def http_request(
+        self, method: str, url: str, headers: Any, body: Optional[bytes]
+    ) -> int:
+        self.trace.append(TraceEntry(self.clock(), "http", None, f"{method} {url}", body))
+        return self.http_status
+
+
+@dataclass
+class SimulationResult:
+    trace: List[TraceEntry]
+    elapsed: float  # virtual seconds
+    steps: int
+
+
+def simulate(
+    actions: Sequence[Any],
+    *,
+    machine_id: Optional[str] = "simulator",
+    stimuli: Iterable[Stimulus] = (),
+    http_status: int = 200,
+) -> SimulationResult:
+    """
+    Compile an action list and run it once against a simulated machine on
+    a virtual clock starting at 0. Raises PlanError or StepFailed like a
+    real run would.
+    """
+    plan = compile_actions(actions, machine_id)
+    driver = SimulatorDriver(stimuli=stimuli, http_status=http_status, max_trace=None)
+    engine = ExecutionEngine(driver)
+
+    async def main() -> SimulationResult:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        steps = await engine.run(plan, machine_id=machine_id)
+        return SimulationResult(list(driver.trace), loop.time() - started, steps)
+
+    return run_simulated(main())
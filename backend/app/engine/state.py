@@ -0,0 +1,60 @@
+import time
+from typing import Any, Dict, Mapping, Optional, Tuple, Union
+
+from app.engine.conditions import Inputs
+from app.engine.executor import ActionDriver
+from app.engine.plan import OutputHandle
+
+Key = Tuple[Optional[str], str]
+
+
+class MachineState:
+    """
+    Latest known input and output values per machine, keyed by
+    (machine_id, channel id).
+
+    Reads are plain dict lookups so conditions can evaluate against the
+    live mapping without copying it.
+    """
+
+    def __init__(self) -> None:
+        self.inputs: Dict[Key, Any] = {}
+        self.outputs: Dict[Key, Any] = {}
+        self.updated_at: Dict[Optional[str], float] = {}
+
+    def set_inputs(self, machine_id: Optional[str], values: Mapping[str, Any]) -> None:
+        inputs = self.inputs
+        for input_id, value in values.items():
+            inputs[(machine_id, input_id)] = value
+        self.updated_at[machine_id] = time.time()
+
+    def set_output(self, machine_id: Optional[str], output_id: str, value: Any) -> None:
+        self.outputs[(machine_id, output_id)] = value
+        self.updated_at[machine_id] = time.time()
+
+    def forget(self, machine_id: Optional[str]) -> None:
+        for values in (self.inputs, self.outputs):
+            for key in [key for key in values if key[0] == machine_id]:
+                del values[key]
+        self.updated_at.pop(machine_id, None)
+
+    def clear(self) -> None:
+        self.inputs.clear()
+        self.outputs.clear()
+        self.updated_at.clear()
+
+
+class StateDriver(ActionDriver):
+    """Driver that records outputs in a MachineState and reads inputs from it"""
+
+    def __init__(self, state: MachineState):
+        self.state = state
+
+    def set_output(self, handle: OutputHandle, value: Union[bool, int, float]) -> None:
+        self.state.set_output(handle.machine_id, handle.output_id, value)
+
+    def read_inputs(self) -> Inputs:
+        return self.state.inputs
+
+
+machine_state = MachineState()
@@ -0,0 +1,291 @@
+"""
+Hierarchical timing wheel for `wait` steps and time-of-day triggers.
+
+Thousands of pending waits cost one small `Timer` each and a single driver
+task, instead of one `asyncio.sleep` timer handle per wait. Insert and
+cancel are O(1): a timer goes into a bucket chosen by how far away it is,
+and far buckets cascade into nearer ones as the wheel turns.
+"""
+import asyncio
+import bisect
+import logging
+import math
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+from app.core.background import BackgroundTask
+from app.core.config import settings
+from app.engine.conditions import next_fire_time
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the drift histogram buckets; the last bucket is open
+DRIFT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 1000)
+
+
+class Timer:
+    __slots__ = ("deadline", "tick", "callback", "args", "cancelled", "_wheel", "_level", "_bucket")
+
+    def __init__(
+        self,
+        wheel: "TimingWheel",
+        deadline: float,
+        tick: int,
+        callback: Callable[..., Any],
+        args: tuple,
+    ):
+        self.deadline = deadline
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self._wheel = wheel
+        self._level = 0
+        self._bucket: Optional[Dict["Timer", None]] = None
+
+    def cancel(self) -> None:
+        self._wheel.cancel(self)
+
+
+class TimingWheel(BackgroundTask):
+    """
+    `levels` wheels of `slots` buckets each; a level-n bucket spans
+    slots**n ticks. Deadlines are rounded up to the next tick, so timers
+    never fire early and fire at most one tick plus scheduling delay late.
+    Stretches with nothing due are skipped rather than ticked through.
+
+    Not thread-safe: use it from the event loop that drives it.
+    """
+
+    def __init__(
+        self,
+        tick: float = 0.01,
+        slots: int = 256,
+        levels: int = 4,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.clock = clock
+        self._bits = slots.bit_length() - 1
+        self._mask = slots - 1
+        self._wheels: List[List[Dict[Timer, None]]] = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        self._level_counts = [0] * levels
+        self._origin = clock()
+        self._current = 0
+        self._pending = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._sleeping_until: Optional[int] = None
+        self.fired = 0
+        self.cancelled = 0
+        self.drift_counts = [0] * (len(DRIFT_BUCKETS_MS) + 1)
+        self.drift_max = 0.0
+        self.drift_total = 0.0
+
+    def call_at(self, deadline: float, callback: Callable[..., Any], *args: Any) -> Timer:
+        """Run `callback(*args)` once the clock reaches `deadline`"""
+        if not self._pending:
+            # Nothing pending: move the wheel to now so the new timer's
+            # distance, and so its bucket, is measured from the present
+            self._current = max(self._current, self._tick_at(self.clock()))
+        tick = max(math.ceil((deadline - self._origin) / self.tick), self._current + 1)
+        timer = Timer(self, deadline, tick, callback, args)
+        self._insert(timer)
+        self._pending += 1
+        if self._wakeup is not None and (
+            self._sleeping_until is None or tick < self._sleeping_until
+        ):
+            self._wakeup.set()
+        return timer
+
+    def call_later(self, delay: float, callback: Callable[..., Any], *args: Any) -> Timer:
+        return self.call_at(self.clock() + delay, callback, *args)
+
+    def cancel(self, timer: Timer) -> None:
+        if timer.cancelled:
+            return
+        timer.cancelled = True
+        if timer._bucket is not None:
+            del timer._bucket[timer]
+            timer._bucket = None
+            self._level_counts[timer._level] -= 1
+            self._pending -= 1
+            self.cancelled += 1
+
+    async def sleep(self, delay: float) -> None:
+        """Drop-in for `asyncio.sleep` backed by the wheel"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        timer = self.call_later(delay, _resolve, future)
+        try:
+            await future
+        finally:
+            self.cancel(timer)
+
+    def advance(self, now: Optional[float] = None) -> int:
+        """Fire every timer due at `now`; returns how many fired"""
+        target = self._tick_at(self.clock() if now is None else now)
+        fired = self.fired
+        while self._pending:
+            tick = self._next_tick()
+            if tick > target:
+                break
+            self._current = tick
+            self._cascade()
+            bucket = self._wheels[0][tick & self._mask]
+            if bucket:
+                timers = list(bucket)
+                bucket.clear()
+                self._level_counts[0] -= len(timers)
+                self._pending -= len(timers)
+                for timer in timers:
+                    timer._bucket = None
+                    self._fire(timer)
+        self._current = max(self._current, target)
+        return self.fired - fired
+
+    def next_deadline(self) -> Optional[float]:
+        """Clock time worth waking up at next, or None when nothing is pending"""
+        if not self._pending:
+            return None
+        return self._origin + self._next_tick() * self.tick
+
+    def stats(self) -> Dict[str, Any]:
+        labels = [f"<={bound}ms" for bound in DRIFT_BUCKETS_MS] + [f">{DRIFT_BUCKETS_MS[-1]}ms"]
+        return {
+            "pending": self._pending,
+            "fired": self.fired,
+            "cancelled": self.cancelled,
+            "tick_ms": self.tick * 1000,
+            "drift_ms_avg": self.drift_total * 1000 / self.fired if self.fired else 0.0,
+            "drift_ms_max": self.drift_max * 1000,
+            "drift_histogram": dict(zip(labels, self.drift_counts)),
+        }
+
+    def _prepare(self) -> None:
+        self._wakeup = asyncio.Event()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            if self._pending:
+                self._sleeping_until = self._next_tick()
+                timeout = max(self._origin + self._sleeping_until * self.tick - self.clock(), 0)
+            else:
+                self._sleeping_until, timeout = None, None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self.advance()
+
+    def _tick_at(self, now: float) -> int:
+        return math.floor((now - self._origin) / self.tick)
+
+    def _next_tick(self) -> int:
+        """Next tick where a timer fires or a bucket cascades"""
+        level = 0
+        while not self._level_counts[level]:
+            level += 1
+        shift = self._bits * (level + 1 if level == 0 else level)
+        boundary = ((self._current >> shift) + 1) << shift
+        if level == 0:
+            for tick in range(self._current + 1, boundary):
+                if self._wheels[0][tick & self._mask]:
+                    return tick
+        return boundary
+
+    def _insert(self, timer: Timer) -> None:
+        delta = timer.tick - self._current
+        level = 0
+        while level < self.levels - 1 and delta >= 1 << (self._bits * (level + 1)):
+            level += 1
+        bucket = self._wheels[level][(timer.tick >> (self._bits * level)) & self._mask]
+        bucket[timer] = None
+        timer._level = level
+        timer._bucket = bucket
+        self._level_counts[level] += 1
+
+    def _cascade(self) -> None:
+        # Highest level first, so its timers can land in a lower bucket that
+        # cascades on this same tick
+        for level in range(self.levels - 1, 0, -1):
+            shift = self._bits * level
+            if self._current & ((1 << shift) - 1):
+                continue
+            bucket = self._wheels[level][(self._current >> shift) & self._mask]
+            if bucket:
+                timers = list(bucket)
+                bucket.clear()
+                self._level_counts[level] -= len(timers)
+                for timer in timers:
+                    self._insert(timer)
+
+    def _fire(self, timer: Timer) -> None:
+        drift = max(self.clock() - timer.deadline, 0.0)
+        self.fired += 1
+        self.drift_total += drift
+        self.drift_max = max(self.drift_max, drift)
+        self.drift_counts[bisect.bisect_left(DRIFT_BUCKETS_MS, drift * 1000)] += 1
+        try:
+            timer.callback(*timer.args)
+        except Exception:
+            logger.exception("Timer callback failed")
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class TimeTrigger:
+    """
+    Keeps one timer armed for a time condition's next fire time, re-arming
+    after each firing, so a time-of-day trigger costs nothing between
+    firings. Arming starts the wheel's driver on the running loop.
+    """
+
+    def __init__(
+        self,
+        wheel: TimingWheel,
+        condition: Mapping[str, Any],
+        callback: Callable[[datetime], Any],
+        now: Callable[[], datetime] = lambda: datetime.now(timezone.utc),
+    ):
+        self.wheel = wheel
+        self.condition = condition
+        self.callback = callback
+        self.now = now
+        self.fire_at: Optional[datetime] = None
+        self._timer: Optional[Timer] = None
+
+    def arm(self) -> datetime:
+        self.cancel()
+        now = self.now()
+        self.fire_at = next_fire_time(self.condition, now)
+        delay = (self.fire_at - now).total_seconds()
+        self._timer = self.wheel.call_later(delay, self._fire)
+        self.wheel.start()
+        return self.fire_at
+
+    def cancel(self) -> None:
+        if self._timer is not None:
+            self.wheel.cancel(self._timer)
+            self._timer = None
+
+    def _fire(self) -> None:
+        fire_at = self.fire_at
+        self._timer = None
+        try:
+            self.callback(fire_at)
+        finally:
+            self.arm()
+
+
+timing_wheel = TimingWheel(tick=settings.TIMER_TICK_MS / 1000)
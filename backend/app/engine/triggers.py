@@ -0,0 +1,204 @@
+import threading
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.engine.conditions import CompiledCondition, ConditionError, compile_condition, referenced_inputs
+
+InputKey = Tuple[Optional[str], str]
+
+# Session.info key set when a transaction wrote events
+_PENDING_KEY = "trigger_index_stale"
+
+
+class TriggerIndex:
+    """
+    In-memory inverted index from inputs and trigger types to the enabled
+    events whose `trigger` depends on them.
+
+    An input change looks up (machine_id, input_id) and (None, input_id),
+    the latter holding triggers on "any machine with this input", instead of
+    scanning every enabled event. The index is built once from the events
+    table and then kept current by replaying the change log: CRUD writes to
+    events mark it stale when they commit, and the next `sync` applies only
+    the revisions since the last one it saw.
+
+    Events triggered by inputs also keep their compiled trigger condition
+    and machine, so whoever sees the inputs change can evaluate just those.
+    Every indexed event keeps its raw trigger too, for schedulers such as
+    time triggers; `subscribe` tells them when the index goes stale.
+    """
+
+    def __init__(self) -> None:
+        self._by_input: Dict[InputKey, Set[str]] = {}
+        self._by_type: Dict[str, Set[str]] = {}
+        self._entries: Dict[str, Tuple[Optional[str], FrozenSet[InputKey]]] = {}
+        self._conditions: Dict[str, Tuple[CompiledCondition, Optional[str]]] = {}
+        self._triggers: Dict[str, Tuple[Dict[str, Any], Optional[str]]] = {}
+        self._listeners: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self.revision: Optional[int] = None
+        self.stale = True
+
+    def events_for_input(self, machine_id: Optional[str], input_id: str) -> Set[str]:
+        with self._lock:
+            return self._by_input.get((machine_id, input_id), set()) | self._by_input.get(
+                (None, input_id), set()
+            )
+
+    def events_for_inputs(self, keys: Iterable[InputKey]) -> Set[str]:
+        """Events affected by any of several input changes, e.g. one ingest frame"""
+        affected: Set[str] = set()
+        with self._lock:
+            for machine_id, input_id in keys:
+                affected |= self._by_input.get((machine_id, input_id), set())
+                affected |= self._by_input.get((None, input_id), set())
+        return affected
+
+    def events_for_type(self, trigger_type: str) -> Set[str]:
+        with self._lock:
+            return set(self._by_type.get(trigger_type, ()))
+
+    def condition(self, event_id: str) -> Optional[Tuple[CompiledCondition, Optional[str]]]:
+        """An input-triggered event's compiled trigger and its machine, if any"""
+        return self._conditions.get(event_id)
+
+    def trigger(self, event_id: str) -> Optional[Tuple[Dict[str, Any], Optional[str]]]:
+        """An indexed event's trigger and its machine, if any"""
+        return self._triggers.get(event_id)
+
+    def index_event(
+        self, event_id: str, trigger: Any, machine_id: Optional[str], enabled: bool = True
+    ) -> None:
+        """Add or replace one event's entries; disabled events are dropped"""
+        with self._lock:
+            self._discard(event_id)
+            if not enabled or not isinstance(trigger, dict):
+                return
+            trigger_type = trigger.get("type")
+            keys = frozenset(referenced_inputs(trigger, machine_id))
+            self._entries[event_id] = (trigger_type, keys)
+            self._triggers[event_id] = (trigger, machine_id)
+            if keys:
+                try:
+                    self._conditions[event_id] = (compile_condition(trigger, machine_id), machine_id)
+                except ConditionError:
+                    pass
+            if trigger_type is not None:
+                self._by_type.setdefault(trigger_type, set()).add(event_id)
+            for key in keys:
+                self._by_input.setdefault(key, set()).add(event_id)
+
+    def discard(self, event_id: str) -> None:
+        with self._lock:
+            self._discard(event_id)
+
+    def subscribe(self, callback: Callable[[], None]) -> None:
+        """Call `callback` whenever the index is marked stale, from any thread"""
+        self._listeners.append(callback)
+
+    def mark_stale(self) -> None:
+        self.stale = True
+        for callback in self._listeners:
+            callback()
+
+    def mark_stale_on_commit(self, db: Session) -> None:
+        db.info[_PENDING_KEY] = True
+
+    def sync(self, db: Session, page_size: int = 500) -> None:
+        """Bring the index up to date; a no-op unless a write marked it stale"""
+        # Imported here: crud imports this module to mark the index stale
+        from app import crud
+
+        if not self.stale:
+            return
+        # Cleared first so a write committing mid-sync marks it stale again
+        self.stale = False
+        try:
+            # A log pruned past what we last saw can't be replayed
+            if self.revision is None or self.revision < crud.change_log.get_floor(db):
+                self.load(db)
+            else:
+                self._replay(db, crud.change_log.get_head(db), page_size)
+        except Exception:
+            self.stale = True
+            raise
+
+    def _replay(self, db: Session, head: int, page_size: int) -> None:
+        from app import crud
+
+        since = self.revision
+        while since < head:
+            changes, since = crud.change_log.get_since(
+                db, since=since, until=head, limit=page_size
+            )
+            if since is None:
+                break
+            for change in changes:
+                if change["table"] != "events":
+                    continue
+                data = change["data"]
+                if change["op"] == "delete" or data is None:
+                    self.discard(change["id"])
+                else:
+                    self.index_event(
+                        change["id"], data["trigger"], data["machine_id"], data["enabled"]
+                    )
+        self.revision = head
+
+    def load(self, db: Session) -> None:
+        """Rebuild from the enabled events in the database"""
+        from app import crud
+
+        # Read the head first: changes racing the load are replayed next sync
+        head = crud.change_log.get_head(db)
+        rows = crud.event.get_enabled_triggers(db)
+        with self._lock:
+            self._by_input.clear()
+            self._by_type.clear()
+            self._entries.clear()
+            self._conditions.clear()
+            self._triggers.clear()
+        for event_id, trigger, machine_id in rows:
+            self.index_event(event_id, trigger, machine_id)
+        self.revision = head
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "events": len(self._entries),
+                "inputs": len(self._by_input),
+                "types": {name: len(ids) for name, ids in self._by_type.items()},
+                "revision": self.revision,
+                "stale": self.stale,
+            }
+
+    def _discard(self, event_id: str) -> None:
+        self._conditions.pop(event_id, None)
+        self._triggers.pop(event_id, None)
+        entry = self._entries.pop(event_id, None)
+        if entry is None:
+            return
+        trigger_type, keys = entry
+        for index, names in ((self._by_type, [trigger_type]), (self._by_input, keys)):
+            for name in names:
+                ids = index.get(name)
+                if ids is not None:
+                    ids.discard(event_id)
+                    if not ids:
+                        del index[name]
+
+
+trigger_index = TriggerIndex()
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed(session: Session) -> None:
+    if session.info.pop(_PENDING_KEY, False):
+        trigger_index.mark_stale()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from typing import Any
+
+from fastapi import FastAPI
+
+from app import crud
+from app.db.base import Base, create_missing_indexes
+from app.db.session import engine
+from app.engine.connections import connection_manager
+from app.engine.dispatch import trigger_dispatcher
+from app.engine.registry import machine_registry
+from app.engine.runtime import execution_runtime
+from app.engine.segments import segment_store
+from app.engine.timers import timing_wheel
+
+logger = logging.getLogger(__name__)
+
+
+class Lifecycle:
+    """
+    Starts and stops the background services behind the API.
+
+    Both entry points install it, the app in `app.main` and the production
+    server in `main.py`, so every service comes up and is flushed the same
+    way wherever the API runs. Startup first creates any tables and indexes
+    the database at `bind` lacks.
+    """
+
+    def __init__(self, bind: Any):
+        self.bind = bind
+
+    def install(self, application: FastAPI) -> None:
+        application.router.add_event_handler("startup", self.startup)
+        application.router.add_event_handler("shutdown", self.shutdown)
+
+    async def startup(self) -> None:
+        try:
+            await asyncio.to_thread(self.create_schema)
+        except Exception:
+            logger.exception("Error creating database tables")
+        try:
+            # Ingest checks pushed frames against these; loaded here, off the loop
+            await asyncio.to_thread(machine_registry.load)
+        except Exception:
+            logger.exception("Loading machine ids failed")
+        # Keep machine statuses current
+        connection_manager.start()
+        # Keep the change log behind GET /changes bounded
+        crud.change_log_retention.start()
+        # Load the trigger index so ingested input changes and time triggers can fire events
+        trigger_dispatcher.start()
+
+    def create_schema(self) -> None:
+        Base.metadata.create_all(bind=self.bind)
+        # create_all skips indexes added to tables that already exist
+        create_missing_indexes(self.bind)
+        logger.info("Database tables created")
+
+    async def shutdown(self) -> None:
+        await connection_manager.stop()
+        # Before the runtime, so nothing fires into it while it stops
+        await trigger_dispatcher.close()
+        # Stops queued and running executions and writes out their history
+        await execution_runtime.shutdown()
+        # Drives waits and time triggers; nothing is left to use it
+        await timing_wheel.stop()
+        await crud.machine.status_buffer.close()
+        await crud.change_log_retention.close()
+        # Write out buffered telemetry and rollups so a restart doesn't lose them
+        await segment_store.close()
+
+
+lifecycle = Lifecycle(engine)
@@ -3,6 +3,9 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.api.api import api_router
+from app.api.realtime import with_socketio
+from app.engine.runtime import execution_runtime
+from app.lifecycle import lifecycle
 
 # Create FastAPI app
 app = FastAPI(
@@ -18,12 +21,20 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["ETag", "X-Change-Revision", "X-Next-Cursor"],
     )
 
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+# Database tables and background services, as in production
+lifecycle.install(app)
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
+
+# Socket.io sits in front of the API for execution updates; servers run this
+# and tests drive `app`, whose startup and shutdown it shares
+asgi_app = with_socketio(app, execution_runtime)
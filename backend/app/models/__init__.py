@@ -1,5 +1,8 @@
+from .change_log import ChangeLogEntry
 from .event import Event
+from .execution_history import ExecutionRecord
 from .machine import Machine
+from .revision import TableRevision
 from .user import User
 
-__all__ = ["Event", "Machine", "User"]
+__all__ = ["ChangeLogEntry", "Event", "ExecutionRecord", "Machine", "TableRevision", "User"]
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, DateTime, Index, Integer, String, func
+
+from app.db.base import Base
+
+class ChangeLogEntry(Base):
+    """
+    One row per row written by a CRUD mutation, appended in the same
+    transaction. `revision` is a global, never-reused sequence; deletes are
+    recorded as tombstones with op "delete".
+    """
+    __tablename__ = "change_log"
+    __table_args__ = (
+        # CRUDChangeLog.prune looks for a later entry for the same row once
+        # per entry; this keeps each of those lookups a seek
+        Index("ix_change_log_table_name_row_id_revision", "table_name", "row_id", "revision"),
+        {'sqlite_autoincrement': True, 'extend_existing': True},
+    )
+
+    revision = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String(64), nullable=False)
+    row_id = Column(String(36), nullable=False)
+    op = Column(String(10), nullable=False)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ChangeLogEntry {self.revision} {self.op} {self.table_name}/{self.row_id}>"
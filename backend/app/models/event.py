@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, JSON, ForeignKey, Text
+from sqlalchemy import Column, String, Boolean, JSON, ForeignKey, Text, Index, text
 from sqlalchemy.orm import relationship
 import uuid
 
@@ -6,7 +6,19 @@ from app.db.base import Base
 
 class Event(Base):
     __tablename__ = "events"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index("ix_events_name", "name"),
+        # Keyset pages per machine, and the ON DELETE CASCADE from machines
+        Index("ix_events_machine_id_id", "machine_id", "id"),
+        # Partial index: only enabled events, matching get_enabled_events
+        Index(
+            "ix_events_enabled_id",
+            "id",
+            sqlite_where=text("enabled = 1"),
+            postgresql_where=text("enabled"),
+        ),
+        {'extend_existing': True},
+    )
 
     id = Column(String(36), primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
     name = Column(String(100), nullable=False)
@@ -0,0 +1,50 @@
+from sqlalchemy import JSON, Column, DateTime, Float, Index, String, Text
+
+from app.db.base import Base
+
+class ExecutionRecord(Base):
+    """
+    One row per finished event execution, appended in batches by the
+    execution history buffer and pruned by age. Not tied to the events or
+    machines tables by foreign keys so history outlives what it ran.
+    """
+    __tablename__ = "execution_history"
+    __table_args__ = (
+        # Recent runs of one event or on one machine, newest first
+        Index("ix_execution_history_event_id_started_at", "event_id", "started_at"),
+        Index("ix_execution_history_machine_id_started_at", "machine_id", "started_at"),
+        # Retention pruning
+        Index("ix_execution_history_started_at", "started_at"),
+        {'extend_existing': True},
+    )
+
+    id = Column(String(36), primary_key=True)
+    event_id = Column(String(36), nullable=False)
+    event_name = Column(String(100), nullable=False)
+    machine_id = Column(String(36), nullable=True)
+    status = Column(String(16), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    duration_ms = Column(Float, nullable=True)
+    error = Column(Text, nullable=True)
+    # [{"id", "type", "name", "offsetMs"}] for the first steps of the run
+    steps = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+
+    def __repr__(self):
+        return f"<ExecutionRecord {self.id} {self.status} event={self.event_id}>"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "event_id": self.event_id,
+            "event_name": self.event_name,
+            "machine_id": self.machine_id,
+            "status": self.status,
+            "started_at": self.started_at,
+            "completed_at": self.completed_at,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+            "steps": self.steps,
+            "result": self.result,
+        }
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, JSON, ForeignKey, Text, event
+from sqlalchemy import Column, String, Integer, Boolean, JSON, ForeignKey, Text, Index, event
 from sqlalchemy.orm import relationship, object_session
 import uuid
 
@@ -6,7 +6,12 @@ from app.db.base import Base
 
 class Machine(Base):
     __tablename__ = "machines"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # CRUDMachine.get_by_ip_port and the duplicate check on create
+        Index("ix_machines_ip_address_port", "ip_address", "port"),
+        Index("ix_machines_name", "name"),
+        {'extend_existing': True},
+    )
 
     id = Column(String(36), primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
     name = Column(String(100), nullable=False)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String
+
+from app.db.base import Base
+
+class TableRevision(Base):
+    """Monotonic per-table revision, bumped in the same transaction as each write"""
+    __tablename__ = "table_revisions"
+    __table_args__ = {'extend_existing': True}
+
+    table_name = Column(String(64), primary_key=True)
+    revision = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<TableRevision {self.table_name}={self.revision}>"
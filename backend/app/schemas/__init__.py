@@ -1,11 +1,21 @@
+from .bulk import BulkItemResult, EventBulkUpdate, MachineBulkUpdate
 from .event import Event, EventCreate, EventUpdate, EventInDB
+from .execution import Execution, ExecutionCreate, ExecutionRecord, ExecutionStep, LastRun
+from .ingest import Frame, FrameBatch
 from .machine import Machine, MachineCreate, MachineUpdate, MachineInDB
+from .series import ChannelSeries
 from .token import Token, TokenPayload
+from .transfer import EventImport, ImportLineError, ImportSummary, MachineImport
 from .user import User, UserCreate, UserInDB, UserUpdate
 
 __all__ = [
+    "BulkItemResult", "EventBulkUpdate", "MachineBulkUpdate",
     "Event", "EventCreate", "EventUpdate", "EventInDB",
+    "Execution", "ExecutionCreate", "ExecutionRecord", "ExecutionStep", "LastRun",
+    "Frame", "FrameBatch",
     "Machine", "MachineCreate", "MachineUpdate", "MachineInDB",
+    "ChannelSeries",
     "Token", "TokenPayload",
+    "EventImport", "ImportLineError", "ImportSummary", "MachineImport",
     "User", "UserCreate", "UserInDB", "UserUpdate"
 ]
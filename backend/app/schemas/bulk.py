@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import Any, Optional
+
+from .event import EventUpdate
+from .machine import MachineUpdate
+
+# Outcome of one item in a bulk request, in request order
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[str] = None
+    status: str  # created, updated, deleted or error
+    detail: Optional[Any] = None
+
+# Items accepted by the bulk update endpoints
+class MachineBulkUpdate(MachineUpdate):
+    id: str
+
+class EventBulkUpdate(EventUpdate):
+    id: str
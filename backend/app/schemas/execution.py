@@ -0,0 +1,63 @@
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from pydantic.alias_generators import to_camel
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
+
+# The client speaks camelCase here, matching its EventExecution type
+class ExecutionCreate(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    event_id: str = Field(..., alias="eventId")
+    machine_id: Optional[str] = Field(None, alias="machineId")
+    priority: int = 0
+
+class ExecutionStep(BaseModel):
+    id: str
+    name: Optional[str] = None
+    type: str
+    startedAt: str
+
+class Execution(BaseModel):
+    id: str
+    eventId: str
+    eventName: str
+    machineId: Optional[str] = None
+    status: str
+    currentStep: Optional[ExecutionStep] = None
+    progress: int = 0
+    startedAt: str
+    completedAt: Optional[str] = None
+    error: Optional[str] = None
+    result: Any = None
+
+# History of finished runs, camelCased like the live executions above
+class _CamelModel(BaseModel):
+    model_config = ConfigDict(
+        from_attributes=True, alias_generator=to_camel, populate_by_name=True
+    )
+
+    @field_validator("*", mode="after")
+    @classmethod
+    def _utc(cls, value: Any) -> Any:
+        # SQLite hands timestamps back without their (UTC) offset
+        if isinstance(value, datetime) and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
+class ExecutionRecord(_CamelModel):
+    id: str
+    event_id: str
+    event_name: str
+    machine_id: Optional[str] = None
+    status: str
+    started_at: datetime
+    completed_at: Optional[datetime] = None
+    duration_ms: Optional[float] = None
+    error: Optional[str] = None
+    steps: Optional[List[Dict[str, Any]]] = None
+    result: Any = None
+
+class LastRun(_CamelModel):
+    event_id: str
+    last_run: datetime
+    last_status: str
@@ -0,0 +1,35 @@
+from pydantic import Field, StrictBool, StrictFloat, StrictInt, StrictStr, TypeAdapter
+from typing import Annotated, Dict, List, NamedTuple, Sequence, Tuple, Union
+
+# Telemetry frames as machines push them: compact positional arrays,
+# [machine_id, timestamp, {input_id: value}, {output_id: value}]
+Value = Union[StrictBool, StrictInt, StrictFloat, StrictStr]
+
+class Frame(NamedTuple):
+    machine_id: Annotated[str, Field(min_length=1, max_length=36)]
+    timestamp: float  # unix seconds
+    inputs: Dict[str, Value] = {}
+    outputs: Dict[str, Value] = {}
+
+# Built once at import so each batch is validated straight from JSON bytes
+FrameBatch = TypeAdapter(List[Frame])
+
+
+def frame_columns(frames: Sequence[Frame]) -> Dict[Tuple[str, str], Tuple[List[float], List[float]]]:
+    """
+    Regroup frames into (timestamps, values) columns per (machine_id,
+    channel), skipping non-numeric values. Inputs and outputs share the
+    channel namespace.
+    """
+    columns: Dict[Tuple[str, str], Tuple[List[float], List[float]]] = {}
+    for machine_id, timestamp, inputs, outputs in frames:
+        for values in (inputs, outputs):
+            for channel, value in values.items():
+                if value.__class__ is str:
+                    continue
+                column = columns.get((machine_id, channel))
+                if column is None:
+                    column = columns[(machine_id, channel)] = ([], [])
+                column[0].append(timestamp)
+                column[1].append(value)
+    return columns
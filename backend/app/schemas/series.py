@@ -0,0 +1,22 @@
+from typing import List, Literal
+
+from pydantic import BaseModel, ConfigDict, Field
+from pydantic.alias_generators import to_camel
+
+
+class ChannelSeries(BaseModel):
+    """
+    Downsampled history of one machine channel. Times are unix seconds;
+    `points` rows are [time, min, max, avg] for the "minmax" method (time
+    is the bucket start) and [time, value] for "lttb". `resolution` is the
+    bucket width in seconds of the data read, 0 for raw samples.
+    """
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    machine_id: str
+    channel: str
+    from_: float = Field(alias="from")
+    to: float
+    method: Literal["minmax", "lttb"]
+    resolution: float
+    points: List[List[float]]
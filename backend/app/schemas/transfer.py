@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+from .event import EventCreate
+from .machine import MachineCreate
+
+# Records in an NDJSON import; ids are kept so a backup restores as it was
+class EventImport(EventCreate):
+    id: Optional[str] = None
+
+class MachineImport(MachineCreate):
+    id: Optional[str] = None
+    events: List[EventImport] = []
+
+class ImportLineError(BaseModel):
+    line: int
+    detail: Any
+
+# Outcome of a whole import; counts are keyed by table
+class ImportSummary(BaseModel):
+    created: Dict[str, int]
+    updated: Dict[str, int]
+    error_count: int = 0
+    errors: List[ImportLineError] = []
@@ -0,0 +1,62 @@
+"""
+Measure plan dispatch throughput and the cost of a cached plan lookup.
+
+    python -m benchmarks.bench_engine [iterations]
+
+Runs a loop of set_output and conditional steps against a no-op driver, so
+the numbers are the engine's own overhead per step.
+"""
+import asyncio
+import sys
+import time
+
+from app.engine import ActionDriver, ExecutionEngine, PlanCache
+
+
+class NullDriver(ActionDriver):
+    def set_output(self, handle, value):
+        pass
+
+    def read_inputs(self):
+        return {(None, "button1"): True}
+
+
+def main(iterations: int = 100_000) -> None:
+    actions = [
+        {
+            "id": "loop",
+            "type": "loop",
+            "count": iterations,
+            "steps": [
+                {"id": "on", "type": "set_output", "outputId": "led1", "value": True},
+                {
+                    "id": "check",
+                    "type": "conditional",
+                    "condition": {"type": "input", "inputId": "button1", "operator": "eq", "value": True},
+                    "trueSteps": [{"id": "off", "type": "set_output", "outputId": "led1", "value": False}],
+                },
+            ],
+        }
+    ]
+    cache = PlanCache(max_size=16)
+    engine = ExecutionEngine(NullDriver(), cache)
+
+    started = time.perf_counter()
+    plan = cache.get("bench", actions)
+    compile_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(10_000):
+        cache.get("bench", actions)
+    lookup_us = (time.perf_counter() - started) / 10_000 * 1e6
+
+    started = time.perf_counter()
+    dispatched = asyncio.run(engine.run(plan))
+    run_s = time.perf_counter() - started
+
+    print(f"instructions={len(plan.code)} compile={compile_s * 1000:.2f} ms cached lookup={lookup_us:.2f} us")
+    print(f"dispatched={dispatched} in {run_s * 1000:.1f} ms ({dispatched / run_s:,.0f} steps/s)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
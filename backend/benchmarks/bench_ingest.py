@@ -0,0 +1,63 @@
+"""
+Push telemetry through ingest validation, the in-memory pipeline and the
+time series store.
+
+    python -m benchmarks.bench_ingest [machines] [seconds]
+
+Every machine samples 8 inputs and 4 outputs at 10 Hz and pushes one
+batch of 10 frames a second, as a WebSocket client would. Reports frames
+per second, the share of one core needed to keep up in real time and the
+memory the ring buffers hold.
+"""
+import json
+import random
+import sys
+import time
+
+from app import crud
+from app.engine.ingest import IngestPipeline
+from app.engine.series import TimeSeriesStore
+from app.engine.state import MachineState
+from app.schemas.ingest import FrameBatch
+
+RATE = 10  # Hz
+
+
+def payloads(machines: int, seconds: int):
+    rng = random.Random(0)
+    for second in range(seconds):
+        for machine in range(machines):
+            frames = [
+                [
+                    f"machine-{machine}",
+                    second + tick / RATE,
+                    {f"in{i}": round(rng.uniform(0, 100), 2) for i in range(8)},
+                    {f"out{i}": rng.random() < 0.5 for i in range(4)},
+                ]
+                for tick in range(RATE)
+            ]
+            yield json.dumps(frames).encode()
+
+
+def run(machines: int, seconds: int) -> None:
+    crud.machine.status_buffer.session_factory = None
+    store = TimeSeriesStore()
+    pipeline = IngestPipeline(MachineState(), sinks=[store.ingest])
+    bodies = list(payloads(machines, seconds))
+    started = time.perf_counter()
+    for body in bodies:
+        pipeline.submit(FrameBatch.validate_json(body))
+    wall = time.perf_counter() - started
+    frames = pipeline.stats()["frames"]
+    print(
+        f"machines={machines} frames={frames} wall={wall * 1000:.0f}ms "
+        f"rate={frames / wall:,.0f} frames/s core={wall / seconds:.1%} "
+        f"channels={len(store.channels)} series={store.nbytes / 2**20:.1f}MB"
+    )
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 60,
+    )
@@ -0,0 +1,86 @@
+"""
+Write telemetry to compressed segments and report the disk it takes.
+
+    python -m benchmarks.bench_segments [hours] [channels]
+
+Simulates one machine sampling `channels` channels at 10 Hz on a regular
+clock: half digital I/O toggling about once a minute, a third setpoints
+and counters that rarely change, the rest analog readings at 0.1
+resolution drifting every few seconds. Samples are flushed a minute at a
+time like the background writer does, sealed hourly (instead of daily) so
+a short run has segments to compact, then compacted. Reports bits per
+sample, the size extrapolated to a week, and write and read throughput.
+Timestamps jittering by a few ms would add about 8 bits per sample.
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.engine.segments import SegmentStore
+
+RATE = 10  # Hz
+
+
+def channel_values(rng: np.random.Generator, kind: str, count: int) -> np.ndarray:
+    if kind == "digital":
+        return (np.cumsum(rng.random(count) < 1 / (60 * RATE)) % 2).astype(np.float64)
+    if kind == "setpoint":
+        return np.round(np.cumsum(rng.random(count) < 1 / (3600 * RATE)) * 5.0 + 20.0, 1)
+    steps = np.where(rng.random(count) < 1 / (5 * RATE), rng.choice([-0.1, 0.1], count), 0.0)
+    return np.round(21.0 + np.cumsum(steps), 1)
+
+
+def dir_size(root: Path) -> int:
+    return sum(path.stat().st_size for path in root.rglob("*.seg"))
+
+
+def run(hours: float, channels: int) -> None:
+    rng = np.random.default_rng(0)
+    count = int(hours * 3600 * RATE)
+    start = float(int(time.time() - hours * 3600))
+    times = start + np.arange(count) / RATE
+    kinds = ["digital"] * (channels // 2) + ["setpoint"] * (channels // 3)
+    kinds += ["analog"] * (channels - len(kinds))
+    values = {f"ch{i}": channel_values(rng, kind, count) for i, kind in enumerate(kinds)}
+
+    with tempfile.TemporaryDirectory() as root:
+        store = SegmentStore(root, segment_seconds=3600.0, retention=365 * 86400.0)
+        minute = 60 * RATE
+        started = time.perf_counter()
+        for lo in range(0, count, minute):
+            chunk = times[lo:lo + minute].tolist()
+            for channel, series in values.items():
+                store._pending[("m1", channel)] = (chunk, series[lo:lo + minute].tolist())
+            store.flush()
+        write = time.perf_counter() - started
+        flushed = dir_size(Path(root))
+        started = time.perf_counter()
+        store.compact()
+        compact = time.perf_counter() - started
+        size = dir_size(Path(root))
+
+        started = time.perf_counter()
+        read_times, read_values = store.read("m1", "ch0", start, start + 3600)
+        read = time.perf_counter() - started
+        assert np.array_equal(read_values, values["ch0"][:len(read_values)])
+
+    samples = count * channels
+    week = size * 7 * 24 / hours
+    print(
+        f"samples={samples:,} flushed={flushed / 2**20:.2f}MB compacted={size / 2**20:.2f}MB "
+        f"bits/sample={size * 8 / samples:.2f} week={week / 2**20:.0f}MB"
+    )
+    print(
+        f"write={samples / write:,.0f} samples/s compact={compact:.1f}s "
+        f"read 1h of one channel={read * 1000:.0f}ms ({len(read_times):,} samples)"
+    )
+
+
+if __name__ == "__main__":
+    run(
+        float(sys.argv[1]) if len(sys.argv) > 1 else 2,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50,
+    )
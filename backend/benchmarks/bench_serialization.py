@@ -0,0 +1,84 @@
+"""
+Compare the two list serialization paths at 10k rows.
+
+    python -m benchmarks.bench_serialization [rows]
+
+The standard path loads ORM objects, validates them through the response
+model and re-encodes with jsonable_encoder, as FastAPI does for
+`response_model=List[schemas.Event]`. The fast path selects row tuples and
+encodes them directly (orjson when installed).
+"""
+import json
+import sys
+import time
+from typing import Callable, List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, schemas
+from app.api import responses
+from app.db.base import Base
+from app.db.session import create_db_engine
+from app.models import Event
+
+
+def _seed(db, count: int) -> None:
+    rows = [
+        {
+            "id": f"{i:08d}-0000-4000-8000-000000000000",
+            "name": f"event-{i}",
+            "description": "benchmark event",
+            "enabled": i % 2 == 0,
+            "trigger": {"type": "input", "inputId": "button1", "operator": "eq", "value": True},
+            "actions": [
+                {"id": "s1", "type": "set_output", "outputId": "led1", "value": True},
+                {"id": "s2", "type": "wait", "duration": 500},
+            ],
+        }
+        for i in range(count)
+    ]
+    db.execute(insert(Event), rows)
+    db.commit()
+
+
+def _best_of(fn: Callable[[], bytes], repeat: int = 5) -> float:
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(count: int = 10_000) -> None:
+    engine = create_db_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    _seed(db, count)
+    adapter = TypeAdapter(List[schemas.Event])
+    fields = responses.schema_fields(schemas.Event)
+
+    def standard() -> bytes:
+        db.expunge_all()
+        events, _ = crud.event.get_page(db, limit=count)
+        validated = adapter.validate_python(events, from_attributes=True)
+        return json.dumps(jsonable_encoder(validated)).encode()
+
+    def fast() -> bytes:
+        rows, _ = crud.event.get_rows(db, fields=fields, limit=count)
+        return responses.dumps(responses.rows_to_payload(fields, rows))
+
+    assert json.loads(standard()) == json.loads(fast())
+    standard_s = _best_of(standard)
+    fast_s = _best_of(fast)
+    encoder = "orjson" if responses.orjson is not None else "json"
+    print(f"rows={count} encoder={encoder}")
+    print(f"standard: {standard_s * 1000:8.1f} ms")
+    print(f"fast:     {fast_s * 1000:8.1f} ms  ({standard_s / fast_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,56 @@
+"""
+Run long wait-heavy event sequences on the virtual clock.
+
+    python -m benchmarks.bench_simulation [hours]
+
+The sequence blinks an output every 5 s inside a loop and polls an input
+every minute, the shape of an overnight soak test. Reports virtual time
+covered per wall-clock second and checks that two runs trace identically.
+"""
+import sys
+import time
+
+from app.engine.simulation import simulate
+
+
+def sequence(hours: float):
+    blinks = int(hours * 3600 / 10)
+    return [
+        {"id": "poll", "type": "parallel", "steps": [
+            {"id": "blink", "type": "loop", "count": blinks, "steps": [
+                {"id": "on", "type": "set_output", "outputId": "led", "value": True},
+                {"id": "w1", "type": "wait", "duration": 5000},
+                {"id": "off", "type": "set_output", "outputId": "led", "value": False},
+                {"id": "w2", "type": "wait", "duration": 5000},
+            ]},
+            {"id": "watch", "type": "loop", "count": int(hours * 60), "steps": [
+                {"id": "w3", "type": "wait", "duration": 60000},
+                {
+                    "id": "check",
+                    "type": "conditional",
+                    "condition": {"type": "input", "inputId": "temp", "operator": "gt", "value": 80},
+                    "trueSteps": [{"id": "fan", "type": "set_output", "outputId": "fan", "value": True}],
+                    "falseSteps": [],
+                },
+            ]},
+        ]},
+    ]
+
+
+def run(hours: float) -> None:
+    actions = sequence(hours)
+    stimuli = [(minute * 60.0, ("simulator", "temp"), 70 + minute % 20) for minute in range(int(hours * 60))]
+    started = time.perf_counter()
+    result = simulate(actions, stimuli=stimuli)
+    wall = time.perf_counter() - started
+    print(
+        f"virtual={result.elapsed / 3600:.1f}h wall={wall * 1000:.0f}ms "
+        f"steps={result.steps} trace={len(result.trace)} "
+        f"speedup={result.elapsed / wall:,.0f}x"
+    )
+    again = simulate(actions, stimuli=stimuli)
+    print(f"deterministic={again.trace == result.trace}")
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 24)
@@ -0,0 +1,45 @@
+"""
+Run many concurrent waits through the timing wheel and report drift.
+
+    python -m benchmarks.bench_timers [waits]
+
+Each wait is a coroutine sleeping a random 0-2 s, the way `wait` steps in
+concurrent executions would. Compare against plain asyncio.sleep with
+`--asyncio`.
+"""
+import asyncio
+import random
+import sys
+import time
+
+from app.engine.timers import TimingWheel
+
+
+async def run(count: int, use_wheel: bool) -> None:
+    wheel = TimingWheel(tick=0.01)
+    sleep = wheel.sleep if use_wheel else asyncio.sleep
+    rng = random.Random(0)
+    drifts = []
+
+    async def waiter(delay: float) -> None:
+        started = time.monotonic()
+        await sleep(delay)
+        drifts.append(time.monotonic() - started - delay)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(waiter(rng.uniform(0, 2)) for _ in range(count)))
+    total = time.perf_counter() - started
+    await wheel.stop()
+    drifts.sort()
+    print(f"waits={count} sleep={'wheel' if use_wheel else 'asyncio'} total={total:.2f}s")
+    print(
+        f"drift ms: p50={drifts[len(drifts) // 2] * 1000:.1f} "
+        f"p99={drifts[int(len(drifts) * 0.99)] * 1000:.1f} max={drifts[-1] * 1000:.1f}"
+    )
+    if use_wheel:
+        print(f"histogram: {wheel.stats()['drift_histogram']}")
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    asyncio.run(run(int(args[0]) if args else 100_000, "--asyncio" not in sys.argv))
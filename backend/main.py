@@ -9,8 +9,10 @@ from fastapi.responses import JSONResponse
 import uvicorn
 
 from app.api import api_router
+from app.api.realtime import with_socketio
 from app.core.config import settings
-from app.db.session import engine, Base
+from app.engine.runtime import execution_runtime
+from app.lifecycle import lifecycle
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,6 +35,7 @@ def create_application() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["ETag", "X-Change-Revision", "X-Next-Cursor"],
     )
 
     # Include API router
@@ -51,14 +54,8 @@ def create_application() -> FastAPI:
 
 app = create_application()
 
-@app.on_event("startup")
-async def startup_event():
-    # Create database tables
-    try:
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database tables created")
-    except Exception as e:
-        logger.error(f"Error creating database tables: {e}")
+# Database tables and background services, shared with app.main
+lifecycle.install(app)
 
 # Custom exception handlers
 @app.exception_handler(RequestValidationError)
@@ -73,5 +70,12 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+# Socket.io sits in front of the API for execution updates
+app = with_socketio(app, execution_runtime)
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    # Refuse oversized ingest WebSocket messages before they are buffered
+    uvicorn.run(
+        "main:app", host="0.0.0.0", port=8000, reload=True,
+        ws_max_size=settings.INGEST_MAX_MESSAGE_MB * 1024 * 1024,
+    )
@@ -1,13 +1,21 @@
+import httpx
 import os
 import pytest
 import uuid
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import sessionmaker, Session
 from typing import Dict, Generator
 
 from app.db.base import Base
-from app.api.deps import get_db
+from app.db.session import create_async_db_engine, create_db_engine
+from app.api.deps import get_async_db, get_db
+from app.engine.connections import connection_manager
+from app.engine.dispatch import trigger_dispatcher
+from app.engine.history import history_buffer
+from app.engine.registry import machine_registry
+from app.lifecycle import lifecycle
 from app.main import app
 from app.core.security import create_access_token, get_password_hash
 from app.core.config import settings
@@ -17,17 +25,18 @@ from app import crud, models, schemas
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 
 # Remove existing test db if it exists
-if os.path.exists("test.db"):
-    os.remove("test.db")
+for path in ("test.db", "test.db-wal", "test.db-shm"):
+    if os.path.exists(path):
+        os.remove(path)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    json_serializer=lambda obj: str(obj) if isinstance(obj, uuid.UUID) else None
-)
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
+async_engine = create_async_db_engine(SQLALCHEMY_DATABASE_URL)
 
 # Create session factory
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+TestingAsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
 
 # Create test database tables
 Base.metadata.create_all(bind=engine)
@@ -39,8 +48,27 @@ def override_get_db():
     finally:
         db.close()
 
-# Override the database dependency
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+def _unreachable(request):
+    raise httpx.ConnectError("test machines are not reachable", request=request)
+
+# Override the database dependencies
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+# Background jobs started with the app write to the test database too
+lifecycle.bind = engine
+crud.change_log_retention.session_factory = TestingAsyncSessionLocal
+crud.machine.status_buffer.session_factory = TestingAsyncSessionLocal
+history_buffer.session_factory = TestingAsyncSessionLocal
+connection_manager.session_factory = TestingAsyncSessionLocal
+machine_registry.session_factory = TestingSessionLocal
+# Test machines have no endpoints; probes find them offline without the network
+connection_manager.transport = httpx.MockTransport(_unreachable)
+trigger_dispatcher.session_factory = TestingSessionLocal
+trigger_dispatcher.async_session_factory = TestingAsyncSessionLocal
 
 @pytest.fixture(scope="function")
 def test_user(db_session):
@@ -79,6 +107,8 @@ def client(test_user, db_session):
     # Store original overrides
     original_overrides = app.dependency_overrides.copy()
     app.dependency_overrides[get_db] = _get_db_override
+    # Async routes use their own connection, so test data must be committed
+    app.dependency_overrides[get_async_db] = override_get_async_db
     
     with TestClient(app=app) as c:
         yield c
@@ -88,9 +118,10 @@ def client(test_user, db_session):
 
 @pytest.fixture(scope="function")
 def db_session():
-    connection = engine.connect()
-    transaction = connection.begin()
-    session = TestingSessionLocal(bind=connection)
+    # The async API routes read through a separate connection, so tests work
+    # on committed data and every table is emptied afterwards instead of
+    # rolling back an outer transaction.
+    session = TestingSessionLocal()
     
     # Enable foreign keys for SQLite using text()
     session.execute(text("PRAGMA foreign_keys=ON"))
@@ -99,9 +130,16 @@ def db_session():
     yield session
 
     # Clean up
+    session.rollback()
+    for table in reversed(Base.metadata.sorted_tables):
+        session.execute(table.delete())
+    session.commit()
     session.close()
-    transaction.rollback()
-    connection.close()
+
+@pytest.fixture(scope="function")
+def async_session_factory(db_session):
+    # Depends on db_session so tables are emptied after the test
+    return TestingAsyncSessionLocal
 
 @pytest.fixture(scope="function")
 def test_machine_data():
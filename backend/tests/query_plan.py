@@ -0,0 +1,62 @@
+"""
+Query-plan regression helpers.
+
+`capture_queries` records every statement a block of code sends to the
+database; `full_scans` replays each one under SQLite's EXPLAIN QUERY PLAN and
+reports the ones that scan a table instead of seeking an index.
+"""
+import re
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+SCAN = re.compile(r"^SCAN (?P<table>\w+)(?: USING (?:COVERING )?INDEX (?P<index>\w+))?$")
+
+
+@contextmanager
+def capture_queries(bind: Engine) -> Iterator[List[Tuple[str, Any]]]:
+    statements: List[Tuple[str, Any]] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and not statement.lstrip().upper().startswith("PRAGMA"):
+            statements.append((statement, parameters))
+
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+
+
+def _partial_indexes(conn: Any) -> set:
+    rows = conn.exec_driver_sql(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+    )
+    return {name for name, sql in rows if " WHERE " in sql.upper()}
+
+
+def full_scans(bind: Engine, statements: List[Tuple[str, Any]]) -> List[str]:
+    """
+    Statements whose plan walks a whole table.
+
+    A plain `SCAN table` always counts. An index scan counts too when the
+    statement filters rows, because then the index should have been searched,
+    unless the index is partial (its WHERE clause already did the filtering).
+    Unfiltered index walks are ordered listings bounded by LIMIT and pass.
+    """
+    problems = []
+    with bind.connect() as conn:
+        partial = _partial_indexes(conn)
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            filtered = " WHERE " in statement.upper()
+            for row in plan:
+                match = SCAN.match(row[3])
+                if not match:
+                    continue
+                index = match.group("index")
+                if index is None or (filtered and index not in partial):
+                    problems.append(f"{row[3]}: {' '.join(statement.split())}")
+    return problems
@@ -0,0 +1,30 @@
+import asyncio
+
+from app import crud, schemas
+
+
+def test_async_crud_round_trip(async_session_factory):
+    async def scenario():
+        async with async_session_factory() as db:
+            machine = await crud.async_machine.create(
+                db,
+                obj_in=schemas.MachineCreate(
+                    name="Async Machine", type="simulator", ip_address="10.0.0.1", port=502
+                ),
+            )
+            fetched = await crud.async_machine.get(db, id=machine.id)
+            assert fetched.name == "Async Machine"
+
+            updated = await crud.async_machine.update(
+                db, db_obj=fetched, obj_in={"status": "online"}
+            )
+            assert updated.status == "online"
+
+            machines = await crud.async_machine.get_multi(db)
+            assert [m.id for m in machines] == [machine.id]
+
+            removed = await crud.async_machine.remove(db, id=machine.id)
+            assert removed.id == machine.id
+            assert await crud.async_machine.get(db, id=machine.id) is None
+
+    asyncio.run(scenario())
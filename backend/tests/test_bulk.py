@@ -0,0 +1,128 @@
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Event, Machine
+
+
+def _machine(i: int) -> dict:
+    return {
+        "name": f"Bulk Machine {i}",
+        "type": "simulator",
+        "ip_address": f"10.1.0.{i}",
+        "port": 9000,
+    }
+
+
+def test_bulk_create_machines_reports_per_item(
+    client: TestClient, db_session: Session, user_token_headers: dict
+):
+    db_session.add(Machine(**_machine(1)))
+    db_session.commit()
+
+    payload = [_machine(1), _machine(2), _machine(2), {"name": "missing fields"}, _machine(3)]
+    response = client.post(
+        f"{settings.API_V1_STR}/machines/bulk", json=payload, headers=user_token_headers
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    statuses = [item["status"] for item in response.json()]
+    assert statuses == ["error", "created", "error", "error", "created"]
+    assert db_session.query(Machine).count() == 3
+
+
+def test_bulk_update_and_delete_machines(
+    client: TestClient, db_session: Session, user_token_headers: dict
+):
+    machines = [Machine(**_machine(i)) for i in range(1, 4)]
+    db_session.add_all(machines)
+    db_session.commit()
+    ids = [m.id for m in machines]
+
+    response = client.put(
+        f"{settings.API_V1_STR}/machines/bulk",
+        json=[{"id": ids[0], "status": "online"}, {"id": "nope", "status": "online"}],
+        headers=user_token_headers,
+    )
+    assert [item["status"] for item in response.json()] == ["updated", "error"]
+    db_session.expire_all()
+    assert db_session.get(Machine, ids[0]).status == "online"
+
+    response = client.post(
+        f"{settings.API_V1_STR}/machines/bulk/delete",
+        json=ids[:2] + ["nope"],
+        headers=user_token_headers,
+    )
+    assert [item["status"] for item in response.json()] == ["deleted", "deleted", "error"]
+    assert db_session.query(Machine).count() == 1
+
+
+def test_bulk_create_events_checks_names_and_machines(
+    client: TestClient, db_session: Session, user_token_headers: dict
+):
+    machine = Machine(**_machine(1))
+    db_session.add(machine)
+    db_session.commit()
+
+    event = {"trigger": {"type": "manual"}, "actions": [], "machine_id": machine.id}
+    payload = [
+        {"name": "first", **event},
+        {"name": "first", **event},
+        {"name": "orphan", **event, "machine_id": "missing"},
+    ]
+    response = client.post(
+        f"{settings.API_V1_STR}/events/bulk", json=payload, headers=user_token_headers
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert [item["status"] for item in response.json()] == ["created", "error", "error"]
+    assert db_session.query(Event).filter(Event.name == "first").one().enabled is True
+
+
+def test_bulk_rejects_oversized_batches(
+    client: TestClient, user_token_headers: dict, monkeypatch
+):
+    monkeypatch.setattr(settings, "BULK_MAX_ITEMS", 1)
+    response = client.post(
+        f"{settings.API_V1_STR}/machines/bulk/delete",
+        json=["a", "b"],
+        headers=user_token_headers,
+    )
+    assert response.status_code == 413
+
+
+def test_bulk_updates_check_uniqueness_like_creates(
+    client: TestClient, db_session: Session, user_token_headers: dict
+):
+    machines = [Machine(**_machine(i)) for i in range(1, 4)]
+    db_session.add_all(machines)
+    db_session.commit()
+    ids = [m.id for m in machines]
+
+    response = client.put(
+        f"{settings.API_V1_STR}/machines/bulk",
+        json=[
+            {"id": ids[0], "ip_address": "10.1.0.2"},  # held by machine 2
+            {"id": ids[1], "port": 9000, "name": "same address"},  # its own address
+            {"id": ids[2], "ip_address": "10.1.0.9"},
+            {"id": ids[0], "ip_address": "10.1.0.9"},  # just taken by the item before
+        ],
+        headers=user_token_headers,
+    )
+    assert [item["status"] for item in response.json()] == ["error", "updated", "updated", "error"]
+    db_session.expire_all()
+    assert db_session.get(Machine, ids[0]).ip_address == "10.1.0.1"
+
+    events = [Event(name=name, trigger={"type": "manual"}, actions=[]) for name in ("a", "b")]
+    db_session.add_all(events)
+    db_session.commit()
+    response = client.put(
+        f"{settings.API_V1_STR}/events/bulk",
+        json=[
+            {"id": events[0].id, "name": "b"},
+            {"id": events[1].id, "name": "b", "enabled": False},
+            {"id": events[0].id, "name": "c"},
+        ],
+        headers=user_token_headers,
+    )
+    assert [item["status"] for item in response.json()] == ["error", "updated", "updated"]
+    assert sorted(name for (name,) in db_session.query(Event.name)) == ["b", "c"]
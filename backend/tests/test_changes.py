@@ -0,0 +1,136 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.core.config import settings
+from app.models import ChangeLogEntry
+
+
+def _changes(client: TestClient, headers: dict, since: int):
+    response = client.get(
+        f"{settings.API_V1_STR}/changes/", params={"since": since}, headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    return lines, int(response.headers["X-Change-Revision"])
+
+
+def test_mutations_append_to_the_change_log(db_session: Session, test_machine_data):
+    machine_id = crud.machine.create(
+        db_session, obj_in=schemas.MachineCreate(**test_machine_data)
+    ).id
+    crud.machine.update_status_by_id(db_session, id=machine_id, status="online")
+    event_id = crud.event.create_multi(
+        db_session,
+        objs_in=[schemas.EventCreate(
+            name="logged", trigger={"type": "manual"}, actions=[], machine_id=machine_id
+        )],
+    )[0]
+    crud.machine.remove_by_id(db_session, id=machine_id)
+
+    log = [
+        (e.table_name, e.row_id, e.op)
+        for e in db_session.query(ChangeLogEntry).order_by(ChangeLogEntry.revision)
+    ]
+    assert log == [
+        ("machines", machine_id, "upsert"),
+        ("machines", machine_id, "upsert"),
+        ("events", event_id, "upsert"),
+        ("machines", machine_id, "delete"),
+        # The event went with its machine through ON DELETE CASCADE
+        ("events", event_id, "delete"),
+    ]
+
+
+def test_changes_since_returns_only_net_deltas(
+    client: TestClient, db_session: Session, user_token_headers: dict, test_machine_data
+):
+    _, start = _changes(client, user_token_headers, 0)
+
+    kept = crud.machine.create(db_session, obj_in=schemas.MachineCreate(**test_machine_data)).id
+    gone = crud.machine.create(
+        db_session,
+        obj_in=schemas.MachineCreate(**{**test_machine_data, "ip_address": "192.168.1.101"}),
+    ).id
+    crud.machine.update_by_id(db_session, id=kept, obj_in={"name": "Renamed"})
+    crud.machine.remove_by_id(db_session, id=gone)
+
+    lines, head = _changes(client, user_token_headers, start)
+    assert [(c["id"], c["op"]) for c in lines] == [(kept, "upsert"), (gone, "delete")]
+    assert lines[-1]["revision"] == head
+    assert lines[0]["data"]["name"] == "Renamed"
+    assert lines[1]["data"] is None
+
+    # Caught up: nothing more to send
+    assert _changes(client, user_token_headers, head) == ([], head)
+
+
+def test_changes_stream_across_pages(
+    client: TestClient, db_session: Session, user_token_headers: dict, monkeypatch
+):
+    monkeypatch.setattr(settings, "CHANGES_PAGE_SIZE", 2)
+    _, start = _changes(client, user_token_headers, 0)
+    ids = crud.machine.create_multi(
+        db_session,
+        objs_in=[
+            schemas.MachineCreate(name=f"m{i}", type="simulator", ip_address=f"10.4.0.{i}", port=80)
+            for i in range(5)
+        ],
+    )
+
+    lines, head = _changes(client, user_token_headers, start)
+    assert [c["id"] for c in lines] == ids
+    revisions = [c["revision"] for c in lines]
+    assert revisions == sorted(set(revisions))
+    assert revisions[0] > start and revisions[-1] == head
+
+
+def test_prune_compacts_and_raises_the_floor(
+    client: TestClient, db_session: Session, user_token_headers: dict, test_machine_data
+):
+    machine_id = crud.machine.create(
+        db_session, obj_in=schemas.MachineCreate(**test_machine_data)
+    ).id
+    for status_value in ("online", "offline", "online"):
+        crud.machine.update_status_by_id(db_session, id=machine_id, status=status_value)
+    _, head = _changes(client, user_token_headers, 0)
+
+    # Only the latest entry per row survives; nothing is old enough to expire
+    now = datetime.now(timezone.utc)
+    assert crud.change_log.prune(db_session, before=now - timedelta(days=1)) == 3
+    assert db_session.query(ChangeLogEntry).count() == 1
+    lines, _ = _changes(client, user_token_headers, 0)
+    assert [(c["id"], c["revision"]) for c in lines] == [(machine_id, head)]
+
+    crud.change_log.prune(db_session, before=now + timedelta(minutes=1))
+    assert db_session.query(ChangeLogEntry).count() == 0
+    assert crud.change_log.get_floor(db_session) == head
+    response = client.get(
+        f"{settings.API_V1_STR}/changes/", params={"since": 0}, headers=user_token_headers
+    )
+    assert response.status_code == status.HTTP_410_GONE
+    assert response.headers["X-Change-Revision"] == str(head)
+    assert _changes(client, user_token_headers, head) == ([], head)
+
+
+def test_user_changes_stay_out_of_the_feed(
+    client: TestClient, db_session: Session, user_token_headers: dict, test_user
+):
+    _, start = _changes(client, user_token_headers, 0)
+    crud.user.update(db_session, db_obj=test_user, obj_in={"full_name": "Renamed"})
+    other_id = crud.user.create(
+        db_session, obj_in=schemas.UserCreate(email="other@example.com", password="secret-pw")
+    ).id
+    crud.user.remove_by_id(db_session, id=other_id)
+    # Rows logged for users by an older version aren't served either
+    db_session.add(ChangeLogEntry(table_name="users", row_id=other_id, op="delete"))
+    db_session.commit()
+
+    assert db_session.query(ChangeLogEntry).filter(ChangeLogEntry.table_name == "users").count() == 1
+    lines, _ = _changes(client, user_token_headers, start)
+    assert [line for line in lines if line.get("table") == "users"] == []
@@ -0,0 +1,111 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app.engine.conditions import ConditionError, compile_condition, compile_vectorized
+
+
+def _input(input_id, op, value, **extra):
+    return {"type": "input", "inputId": input_id, "operator": op, "value": value, **extra}
+
+
+def _value(value):
+    return {"type": "value", "value": value}
+
+
+def test_scalar_conditions_short_circuit_and_resolve_inputs():
+    condition = compile_condition(
+        {
+            "type": "and",
+            "conditions": [
+                _input("button1", "eq", True),
+                {"type": "not", "condition": _input("temp", "between", 10, value2=20)},
+                {
+                    "type": "compare",
+                    "left": {"type": "input", "inputId": "level", "machineId": "tank"},
+                    "operator": "gte",
+                    "right": {"type": "input", "inputId": "limit"},
+                },
+            ],
+        }
+    )
+    inputs = {("m1", "button1"): True, ("m1", "temp"): 25, ("tank", "level"): 7, ("m1", "limit"): 5}
+    assert condition(inputs, "m1", None) is True
+    assert condition({**inputs, ("m1", "temp"): 15}, "m1", None) is False
+    # Missing readings never satisfy a comparison
+    assert condition({("m1", "button1"): True}, "m1", None) is False
+    # machine_id given at compile time binds unpinned inputs
+    bound = compile_condition(_input("button1", "eq", True), machine_id="m2")
+    assert bound({("m2", "button1"): True}, None, None) is True
+
+
+def test_constant_subtrees_fold_away():
+    always = compile_condition(
+        {
+            "type": "or",
+            "conditions": [
+                {"type": "compare", "left": _value("abc"), "operator": "startsWith", "right": _value("ab")},
+                _input("button1", "eq", True),
+            ],
+        }
+    )
+    # Folded to True: inputs are never read
+    assert always(None, None, None) is True
+    never = compile_condition({"type": "and", "conditions": [{"type": "not", "condition": {"type": "and", "conditions": []}}]})
+    assert never(None, None, None) is False
+
+
+def test_time_conditions():
+    noon_monday = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+    between = compile_condition(
+        {"type": "time", "operator": "between", "time": "22:00", "time2": "13:00", "timezone": "UTC"}
+    )
+    assert between({}, None, noon_monday) is True
+    weekday = compile_condition(
+        {"type": "time", "operator": "weekday", "weekdays": [1, 2], "timezone": "UTC"}
+    )
+    assert weekday({}, None, noon_monday) is True
+    sunday = compile_condition({"type": "time", "operator": "weekday", "weekdays": [0], "timezone": "UTC"})
+    assert sunday({}, None, noon_monday) is False
+    with pytest.raises(ConditionError):
+        compile_condition({"type": "time", "operator": "after", "time": "25:00"})
+
+
+def test_vectorized_matches_scalar_across_machines():
+    tree = {
+        "type": "or",
+        "conditions": [
+            _input("button1", "eq", True),
+            {"type": "compare", "left": _value(50), "operator": "lt", "right": {"type": "input", "inputId": "temp"}},
+        ],
+    }
+    columns = ["button1", "temp"]
+    values = np.array([[1.0, 20.0], [0.0, 60.0], [0.0, np.nan], [np.nan, 10.0]])
+    vectorized = compile_vectorized(tree, columns)
+    assert vectorized(values).tolist() == [True, True, False, False]
+
+    scalar = compile_condition(tree)
+    for row, machine in enumerate("abcd"):
+        inputs = {
+            (machine, name): (None if np.isnan(v) else (bool(v) if name == "button1" else v))
+            for name, v in zip(columns, values[row])
+        }
+        assert scalar(inputs, machine, None) == vectorized(values)[row]
+
+    assert compile_vectorized({"type": "and", "conditions": []}, columns)(values).tolist() == [True] * 4
+    with pytest.raises(ConditionError):
+        compile_vectorized(_input("button1", "eq", True, machineId="m1"), columns)
+
+
+def test_vectorized_rejects_non_numeric_values():
+    columns = ["temp"]
+    bad = [
+        (_input("temp", "gt", "warm"), "condition.value"),
+        (_input("temp", "between", 10), "condition.value2"),
+        ({"type": "compare", "left": _value(None), "operator": "lt", "right": {"type": "input", "inputId": "temp"}}, "condition.left.value"),
+    ]
+    for tree, path in bad:
+        with pytest.raises(ConditionError) as info:
+            compile_vectorized(tree, columns)
+        assert info.value.path == path
@@ -0,0 +1,122 @@
+import asyncio
+import random
+
+import httpx
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.engine import ConnectionManager, MachineConnection
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def _transport(responses, calls):
+    def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        calls.append(host)
+        status = responses[host]
+        if status is None:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(status)
+
+    return httpx.MockTransport(handler)
+
+
+def _machine(db: Session, name, ip, type="raspberry_pi", status="offline"):
+    return crud.machine.create(db, obj_in=schemas.MachineCreate(
+        name=name, type=type, ip_address=ip, port=8000, status=status,
+    ))
+
+
+def test_backoff_is_jittered_and_capped():
+    connection = MachineConnection(("10.0.0.1", 80), backoff_base=1, backoff_max=8, rng=random.Random(1))
+    delays = []
+    for failures in range(1, 8):
+        connection.failures = failures
+        delays.append(connection.backoff())
+    assert all(0 <= delay <= min(8, 2 ** (n - 1)) for n, delay in enumerate(delays, 1))
+    assert len(set(delays)) == len(delays)
+
+
+def test_probes_update_statuses_in_one_batch(db_session: Session, async_session_factory, monkeypatch):
+    monkeypatch.setattr(crud.machine.status_buffer, "session_factory", None)
+    ok = _machine(db_session, "ok", "10.0.0.1")
+    broken = _machine(db_session, "broken", "10.0.0.2", status="online")
+    down = _machine(db_session, "down", "10.0.0.3", status="online")
+    simulated = _machine(db_session, "sim", "10.0.0.4", type="simulator")
+    responses = {"10.0.0.1": 200, "10.0.0.2": 500, "10.0.0.3": None}
+    calls = []
+    clock = FakeClock()
+    manager = ConnectionManager(
+        async_session_factory, transport=_transport(responses, calls), clock=clock,
+        backoff_base=10, backoff_max=10,
+    )
+
+    async def scenario():
+        await manager.run_once()
+        first_round = sorted(calls)
+        # The dead endpoint is backing off; only the other two are probed
+        calls.clear()
+        await manager.probe_all()
+        second_round = sorted(calls)
+        # Once the backoff has passed it reconnects and comes back
+        clock.now += 11
+        responses["10.0.0.3"] = 200
+        calls.clear()
+        await manager.run_once()
+        third_round = sorted(calls)
+        # The healthy endpoint kept one connection; the dead one reconnected
+        assert manager.connections[("10.0.0.1", 8000)].connects == 1
+        assert manager.connections[("10.0.0.3", 8000)].connects == 2
+        stats = manager.stats()
+        await manager.stop()
+        return first_round, second_round, third_round, stats
+
+    first_round, second_round, third_round, stats = asyncio.run(scenario())
+    assert first_round == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+    assert second_round == ["10.0.0.1", "10.0.0.2"]
+    assert third_round == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+    assert stats["endpoints"] == 3 and stats["by_status"] == {"online": 2, "error": 1}
+
+    # Round one changed four statuses, round three the recovery; they all
+    # coalesce into one batched write
+    assert manager.status_changes == 5
+    assert crud.machine.status_buffer.flush(db_session) == 4
+    db_session.expire_all()
+    statuses = {m.id: m.status for m in crud.machine.get_multi(db_session)}
+    assert statuses == {ok.id: "online", broken.id: "error", down.id: "online", simulated.id: "online"}
+
+
+def test_machines_pushing_telemetry_stay_online(db_session: Session, async_session_factory, monkeypatch):
+    monkeypatch.setattr(crud.machine.status_buffer, "session_factory", None)
+    pusher = _machine(db_session, "pusher", "10.0.1.1")
+    clock = FakeClock()
+    manager = ConnectionManager(
+        async_session_factory, transport=_transport({"10.0.1.1": None}, []), clock=clock,
+        probe_interval=10,
+    )
+
+    async def scenario():
+        await manager.run_once()
+        assert manager.statuses[pusher.id] == "offline"
+        # Its first frame after being marked offline marks it online again
+        manager.heard_from([pusher.id])
+        assert crud.machine.status_buffer.get(pusher.id) == "online"
+        clock.now += 15
+        await manager.run_once()
+        pushing = manager.statuses[pusher.id]
+        # Once it has been quiet for two intervals the probes decide again
+        clock.now += 10
+        await manager.run_once()
+        await manager.stop()
+        return pushing
+
+    assert asyncio.run(scenario()) == "online"
+    assert manager.statuses[pusher.id] == "offline"
+    crud.machine.status_buffer.discard([pusher.id])
@@ -0,0 +1,57 @@
+from sqlalchemy import text
+
+from app.core.config import Settings
+from app.db.session import create_db_engine, pool_status
+from app.lifecycle import Lifecycle
+
+
+def test_sqlite_pragmas_applied(tmp_path):
+    config = Settings(SQLITE_BUSY_TIMEOUT_MS=1234, SQLITE_SYNCHRONOUS="NORMAL")
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'pragmas.db'}", config=config)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+    engine.dispose()
+
+
+def test_pool_statistics(tmp_path):
+    config = Settings(DB_POOL_SIZE=2, DB_MAX_OVERFLOW=1)
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'pool.db'}", config=config)
+    first = engine.connect()
+    second = engine.connect()
+    stats = pool_status(engine)
+    assert stats["size"] == 2
+    assert stats["max_overflow"] == 1
+    assert stats["checked_out"] == 2
+    first.close()
+    second.close()
+    stats = pool_status(engine)
+    assert stats["checked_out"] == 0
+    assert stats["peak_checked_out"] == 2
+    assert stats["checkouts"] == 2
+    engine.dispose()
+
+
+def test_in_memory_engine_skips_file_pragmas():
+    engine = create_db_engine("sqlite://")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+    assert "status" in pool_status(engine)
+
+
+def test_startup_adds_indexes_an_existing_database_lacks(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path}/old.db")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE change_log (revision INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "table_name VARCHAR(64) NOT NULL, row_id VARCHAR(36) NOT NULL, "
+            "op VARCHAR(10) NOT NULL, changed_at DATETIME)"
+        ))
+    Lifecycle(engine).create_schema()
+    with engine.connect() as conn:
+        indexes = {row[1] for row in conn.execute(text("PRAGMA index_list(change_log)"))}
+        tables = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+    assert "ix_change_log_table_name_row_id_revision" in indexes
+    assert {"machines", "events", "users"} <= tables
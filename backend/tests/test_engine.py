@@ -0,0 +1,164 @@
+import asyncio
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.engine import ActionDriver, ExecutionEngine, PlanCache, PlanError, StepFailed, compile_actions
+from app.engine import plan as p
+from app.engine.cache import plan_cache
+from app.models import Event
+
+
+class RecordingDriver(ActionDriver):
+    def __init__(self, inputs=None, status=200):
+        self.calls = []
+        self.inputs = inputs or {}
+        self.status = status
+
+    def set_output(self, handle, value):
+        self.calls.append(("set", handle.machine_id, handle.output_id, value))
+
+    def read_inputs(self):
+        return self.inputs
+
+    async def mqtt_publish(self, topic, payload, qos, retain):
+        self.calls.append(("mqtt", topic, payload, qos, retain))
+
+    async def http_request(self, method, url, headers, body):
+        self.calls.append(("http", method, url, dict(headers), body))
+        return self.status
+
+
+def _set(output, value, **extra):
+    return {"id": f"set-{output}-{value}", "type": "set_output", "outputId": output, "value": value, **extra}
+
+
+def test_compile_resolves_handles_and_flattens():
+    plan = compile_actions(
+        [
+            _set("led1", True),
+            {"id": "w", "type": "wait", "duration": 250},
+            {"id": "l", "type": "loop", "count": 2, "steps": [_set("led1", False)]},
+            {"id": "m", "type": "mqtt_publish", "topic": "MOSTwo/status", "payload": {"on": True}},
+        ],
+        machine_id="m1",
+    )
+    ops = [type(ins).__name__ for ins in plan.code]
+    # The short loop is unrolled in place
+    assert ops == ["SetOutput", "Wait", "SetOutput", "SetOutput", "MQTTPublish"]
+    assert plan.code[0].handle == p.OutputHandle("m1", "led1")
+    # One handle object per (machine, output)
+    assert plan.code[2].handle is plan.code[0].handle
+    assert plan.code[1].seconds == 0.25
+    assert plan.code[4].payload == b'{"on":true}'
+    assert plan.step_count == 5
+
+
+def test_long_and_endless_loops_use_counters():
+    body = [_set("led1", True)]
+    plan = compile_actions([{"id": "l", "type": "loop", "count": 1000, "steps": body}])
+    assert [type(ins).__name__ for ins in plan.code] == ["Loop", "SetOutput", "LoopNext"]
+    assert plan.loop_slots == 1
+
+    driver = RecordingDriver()
+    dispatched = asyncio.run(ExecutionEngine(driver, PlanCache(8)).run(plan))
+    assert len(driver.calls) == 1000
+    assert dispatched == 1 + 2 * 1000
+
+
+def test_compile_rejects_bad_steps():
+    with pytest.raises(PlanError) as exc:
+        compile_actions([{"id": "a", "type": "loop", "count": 1, "steps": [{"type": "explode"}]}])
+    assert exc.value.path == "actions[0].steps[0]"
+    with pytest.raises(PlanError):
+        compile_actions([{"type": "wait", "duration": -1}])
+
+
+def test_engine_runs_branches_parallel_and_network_steps():
+    plan = compile_actions(
+        [
+            {
+                "id": "c",
+                "type": "conditional",
+                "condition": {"type": "input", "inputId": "button1", "operator": "eq", "value": True},
+                "trueSteps": [_set("led1", True)],
+                "falseSteps": [_set("led1", False)],
+            },
+            {"id": "p", "type": "parallel", "steps": [_set("a", 1), _set("b", 2)]},
+            {"id": "h", "type": "http_request", "method": "post", "url": "http://x/hook", "body": {"k": 1}},
+        ]
+    )
+    driver = RecordingDriver(inputs={("m1", "button1"): False})
+    steps = []
+    asyncio.run(
+        ExecutionEngine(driver, PlanCache(8)).run(
+            plan, machine_id="m1", on_step=lambda s: steps.append(s.id)
+        )
+    )
+    assert driver.calls == [
+        ("set", None, "led1", False),
+        ("set", None, "a", 1),
+        ("set", None, "b", 2),
+        ("http", "POST", "http://x/hook", {"Content-Type": "application/json"}, b'{"k":1}'),
+    ]
+    assert steps == ["c", "set-led1-False", "p", "set-a-1", "set-b-2", "h"]
+
+    failing = RecordingDriver(inputs={("m1", "button1"): True}, status=500)
+    with pytest.raises(StepFailed):
+        asyncio.run(ExecutionEngine(failing, PlanCache(8)).run(plan, machine_id="m1"))
+    assert failing.calls[0] == ("set", None, "led1", True)
+
+
+def test_cache_shares_plans_by_content_hash():
+    cache = PlanCache(8)
+    actions = [_set("led1", True)]
+    first = cache.get("e1", actions)
+    assert cache.get("e1", actions) is first
+    # Same actions under another event id reuse the compiled plan
+    assert cache.get("e2", [_set("led1", True)]) is first
+    assert cache.stats()["compiles"] == 1
+    cache.invalidate(["e1"])
+    assert cache.get("e1", [_set("led1", False)]) is not first
+
+
+def test_cache_keeps_plans_of_stale_reads_out():
+    cache = PlanCache(8)
+    old, new = [_set("led1", True)], [_set("led2", True)]
+    # A run reads the event, then an update to it commits
+    read_at = cache.revision
+    cache.invalidate(["e1"])
+    stale = cache.get("e1", old, revision=read_at)
+    assert stale.code[0].handle.output_id == "led1"
+    # The stale plan wasn't cached under the event, so the new one is used
+    assert cache.get("e1", new, revision=cache.revision).code[0].handle.output_id == "led2"
+    assert cache.get("e1", new) is cache.get("e1", old)
+    assert cache.stats()["events"] == 1
+
+
+def test_event_writes_invalidate_plans_on_commit(db_session: Session):
+    event = crud.event.create(
+        db_session,
+        obj_in=schemas.EventCreate(name="cached", trigger={"type": "manual"}, actions=[_set("led1", True)]),
+    )
+    engine = ExecutionEngine(RecordingDriver())
+    plan = engine.plan_for(event)
+    assert engine.plan_for(event) is plan
+
+    event = crud.event.update(db_session, db_obj=event, obj_in={"actions": [_set("led2", True)]})
+    updated = engine.plan_for(event)
+    assert updated.code[0].handle.output_id == "led2"
+
+    misses = plan_cache.stats()["misses"]
+    crud.event.toggle_event(db_session, db_obj=event, enabled=False)
+    # Dropped by event id; the unchanged actions still hit the hash map
+    assert engine.plan_for(event) is updated
+    assert plan_cache.stats()["misses"] == misses + 1
+
+    # A copy loaded before another write commits is planned but not cached
+    with Session(db_session.get_bind()) as other:
+        stale = other.get(Event, event.id)
+        crud.event.update(db_session, db_obj=event, obj_in={"actions": [_set("led3", True)]})
+        assert engine.plan_for(stale).code[0].handle.output_id == "led2"
+    assert engine.plan_for(event).code[0].handle.output_id == "led3"
+    plan_cache.invalidate([event.id])
@@ -0,0 +1,94 @@
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.api import etag
+from app.core.config import settings
+from app.models import Event, Machine
+
+
+def test_matches_if_none_match_forms():
+    tag = etag.etag_for("machines", 3)
+    assert tag == '"machines-3"'
+    assert etag.matches(tag, tag)
+    assert etag.matches(f'"other-1", W/{tag}', tag)
+    assert etag.matches("*", tag)
+    assert not etag.matches('"machines-2"', tag)
+    assert not etag.matches(None, tag)
+
+
+def test_revision_bumps_on_every_write(db_session: Session, test_machine_data):
+    start = crud.machine.get_revision(db_session)
+    machine = crud.machine.create(db_session, obj_in=schemas.MachineCreate(**test_machine_data))
+    assert crud.machine.get_revision(db_session) == start + 1
+    crud.machine.update_by_id(db_session, id=machine.id, obj_in={"name": "Renamed"})
+    assert crud.machine.get_revision(db_session) == start + 2
+
+    db_session.add(Event(name="cascaded", trigger={"type": "manual"}, actions=[], machine_id=machine.id))
+    db_session.commit()
+    events_before = crud.event.get_revision(db_session)
+    crud.machine.remove_by_id(db_session, id=machine.id)
+    assert crud.machine.get_revision(db_session) == start + 3
+    # Deleting a machine cascades to its events
+    assert crud.event.get_revision(db_session) == events_before + 1
+
+
+def test_conditional_get_returns_304_until_a_write(
+    client: TestClient, db_session: Session, user_token_headers: dict
+):
+    url = f"{settings.API_V1_STR}/machines/"
+    first = client.get(url, headers=user_token_headers)
+    assert first.status_code == status.HTTP_200_OK
+    tag = first.headers["ETag"]
+
+    cached = client.get(url, headers={**user_token_headers, "If-None-Match": tag})
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+    assert cached.headers["ETag"] == tag
+    assert cached.content == b""
+
+    fast = client.get(url, params={"fast": True}, headers=user_token_headers)
+    assert fast.headers["ETag"] == tag
+
+    machine = Machine(name="ETag", type="simulator", ip_address="10.3.0.1", port=80)
+    db_session.add(machine)
+    db_session.commit()
+    crud.machine.update_status_by_id(db_session, id=machine.id, status="online")
+
+    changed = client.get(url, headers={**user_token_headers, "If-None-Match": tag})
+    assert changed.status_code == status.HTTP_200_OK
+    assert changed.headers["ETag"] != tag
+    assert [m["status"] for m in changed.json()] == ["online"]
+
+
+def test_buffered_statuses_change_the_etag_before_they_flush(
+    client: TestClient, db_session: Session, user_token_headers: dict
+):
+    machine = Machine(name="Buffered", type="simulator", ip_address="10.3.0.2", port=80)
+    db_session.add(machine)
+    db_session.commit()
+    url = f"{settings.API_V1_STR}/machines/{machine.id}"
+    tag = client.get(url, headers=user_token_headers).headers["ETag"]
+
+    crud.machine.set_status(id=machine.id, status="online")
+    changed = client.get(url, headers={**user_token_headers, "If-None-Match": tag})
+    assert changed.status_code == status.HTTP_200_OK
+    assert changed.json()["status"] == "online"
+    assert changed.headers["ETag"] != tag
+    crud.machine.status_buffer.discard([machine.id])
+
+
+def test_item_get_honours_if_none_match(
+    client: TestClient, db_session: Session, user_token_headers: dict
+):
+    ev = Event(name="etag event", trigger={"type": "manual"}, actions=[])
+    db_session.add(ev)
+    db_session.commit()
+    url = f"{settings.API_V1_STR}/events/{ev.id}"
+
+    first = client.get(url, headers=user_token_headers)
+    assert first.status_code == status.HTTP_200_OK
+    cached = client.get(
+        url, headers={**user_token_headers, "If-None-Match": first.headers["ETag"]}
+    )
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
@@ -0,0 +1,226 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.api import deps
+from app.engine import ExecutionEngine, ExecutionRuntime, HistoryBuffer, MachineState, PlanCache, StateDriver
+from app.main import app
+
+
+def _event(id, actions, machine_id=None, name=None):
+    return SimpleNamespace(id=id, name=name or id, actions=actions, machine_id=machine_id)
+
+
+def _wait(seconds):
+    return {"id": "w", "type": "wait", "duration": seconds * 1000}
+
+
+def _set(output, value):
+    return {"id": f"set-{output}", "type": "set_output", "outputId": output, "value": value}
+
+
+def _runtime(state=None, **kwargs):
+    engine = ExecutionEngine(StateDriver(state or MachineState()), cache=PlanCache(max_size=64))
+    return ExecutionRuntime(engine, **kwargs)
+
+
+def _completed(runtime):
+    queue = runtime.broadcaster.subscribe()
+    order = []
+
+    def drain():
+        while not queue.empty():
+            name, payload = queue.get_nowait()
+            if name == "event_execution_completed":
+                order.append(payload["eventId"])
+        return order
+
+    return drain
+
+
+def test_runs_on_one_machine_are_serialized_by_priority():
+    async def scenario():
+        runtime = _runtime()
+        completed = _completed(runtime)
+        first = runtime.submit(_event("first", [_wait(0.02)], machine_id="m1"))
+        runtime.submit(_event("low", [_set("led", 1)], machine_id="m1"))
+        high = runtime.submit(_event("high", [_set("led", 2)], machine_id="m1"), priority=5)
+        assert first.status == "running"
+        assert runtime.stats()["pending"] == 2
+        assert high.started_at is None
+        await first.task
+        while runtime.stats()["pending"] or runtime.stats()["running"]:
+            await asyncio.sleep(0.001)
+        # Time spent queued behind "first" isn't part of the run
+        assert high.started_at >= first.completed_at
+        assert high.to_record()["duration_ms"] < 20
+        return completed()
+
+    assert asyncio.run(scenario()) == ["first", "high", "low"]
+
+
+def test_slow_machine_does_not_hold_up_others():
+    async def scenario():
+        state = MachineState()
+        runtime = _runtime(state)
+        slow = runtime.submit(_event("slow", [_wait(10)], machine_id="m1"))
+        fast = runtime.submit(_event("fast", [_set("led", True)], machine_id="m2"))
+        await fast.task
+        assert fast.status == "completed" and fast.progress == 100
+        assert state.outputs == {("m2", "led"): True}
+        assert slow.status == "running"
+        await runtime.shutdown()
+        return slow
+
+    slow = asyncio.run(scenario())
+    assert slow.status == "stopped"
+    assert slow.completed_at is not None
+
+
+def test_runs_write_the_outputs_of_the_machine_they_run_on():
+    async def scenario():
+        state = MachineState()
+        runtime = _runtime(state)
+        unbound = _event("unbound", [_set("o1", True)])
+        bound = _event("bound", [_set("o2", True)], machine_id="A")
+        for execution in (
+            runtime.submit(unbound, machine_id="B"),
+            runtime.submit(unbound),
+            runtime.submit(bound, machine_id="B"),
+            runtime.submit(bound),
+        ):
+            await execution.task
+        return state.outputs
+
+    assert asyncio.run(scenario()) == {
+        ("B", "o1"): True, (None, "o1"): True, ("B", "o2"): True, ("A", "o2"): True,
+    }
+
+
+def test_global_and_per_event_caps():
+    async def scenario():
+        runtime = _runtime(max_concurrent=2, max_per_event=1)
+        a1 = runtime.submit(_event("a", [_wait(10)], machine_id="m1"))
+        a2 = runtime.submit(_event("a", [_wait(10)], machine_id="m2"))
+        b = runtime.submit(_event("b", [_wait(10)], machine_id="m3"))
+        c = runtime.submit(_event("c", [_wait(10)], machine_id="m4"))
+        statuses = [ex.status for ex in (a1, a2, b, c)]
+        await runtime.stop(a1.id)
+        # a2 may now run: the slot and event "a" are both free again
+        after = [ex.status for ex in (a2, c)]
+        await runtime.shutdown()
+        return statuses, after
+
+    statuses, after = asyncio.run(scenario())
+    assert statuses == ["running", "pending", "running", "pending"]
+    assert after == ["running", "pending"]
+
+
+def test_stop_pending_and_failed_runs():
+    async def scenario():
+        runtime = _runtime()
+        running = runtime.submit(_event("run", [_wait(10)], machine_id="m1"))
+        queued = runtime.submit(_event("queued", [_set("led", 1)], machine_id="m1"))
+        assert (await runtime.stop(queued.id)).status == "stopped"
+        assert queued.to_record()["duration_ms"] is None
+        assert await runtime.stop("missing") is None
+        await runtime.stop(running.id)
+        # Stopping again leaves a finished run as it was
+        assert (await runtime.stop(running.id)).status == "stopped"
+
+        failing = runtime.submit(_event("fail", [
+            {"id": "h", "type": "http_request", "method": "GET", "url": "http://127.0.0.1:9/"},
+        ]))
+        await failing.task
+        return runtime, failing
+
+    runtime, failing = asyncio.run(scenario())
+    assert failing.status == "failed" and failing.error
+    assert runtime.stats()["stopped"] == 2
+    assert [ex.event_id for ex in runtime.list()][:1] == ["fail"]
+
+
+def test_history_is_written_in_batches_and_pruned(db_session: Session, async_session_factory):
+    history = HistoryBuffer(async_session_factory, batch_size=2, flush_interval=60)
+
+    async def scenario():
+        runtime = _runtime(history=history)
+        for name in ("a", "b", "c"):
+            await runtime.submit(_event(name, [_set("led", 1), _set("led", 0)], machine_id="m1")).task
+            # Two rows fill a batch and wake the writer; the third waits
+            await asyncio.sleep(0.05)
+        written_early = history.written
+        await runtime.shutdown()
+        return written_early
+
+    assert asyncio.run(scenario()) == 2
+    assert history.stats()["pending"] == 0 and history.written == 3
+
+    records = crud.execution_history.get_recent(db_session, machine_id="m1")
+    assert [record.event_id for record in records] == ["c", "b", "a"]
+    assert records[0].status == "completed"
+    assert [step["id"] for step in records[0].steps] == ["set-led", "set-led"]
+    assert records[0].steps[0]["offsetMs"] >= 0
+    assert crud.execution_history.get_latest(db_session, event_ids=["a", "x"]).keys() == {"a"}
+
+    old = dict(records[0].to_dict(), id="old", started_at=datetime.now(timezone.utc) - timedelta(days=90))
+    crud.execution_history.insert_many(db_session, rows=[old])
+    assert asyncio.run(history.prune()) == 1
+    assert len(crud.execution_history.get_recent(db_session)) == 3
+
+
+def test_execution_api(
+    client: TestClient, db_session: Session, user_token_headers: dict, test_machine_data, async_session_factory
+):
+    history = HistoryBuffer(async_session_factory, flush_interval=60)
+    runtime = _runtime(history=history)
+    app.dependency_overrides[deps.get_execution_runtime] = lambda: runtime
+    app.dependency_overrides[deps.get_execution_history] = lambda: history
+    machine = crud.machine.create(db_session, obj_in=schemas.MachineCreate(**test_machine_data))
+    event = crud.event.create(db_session, obj_in=schemas.EventCreate(
+        name="blink", trigger={"type": "manual"}, actions=[_set("led", 1), _wait(10)],
+        machine_id=machine.id,
+    ))
+
+    response = client.post(
+        "/api/v1/executions/", headers=user_token_headers,
+        json={"eventId": event.id, "machineId": machine.id},
+    )
+    assert response.status_code == 202
+    execution = response.json()
+    assert execution["eventName"] == "blink"
+    assert execution["status"] == "running"
+    assert execution["machineId"] == machine.id
+
+    response = client.get(f"/api/v1/executions/{execution['id']}", headers=user_token_headers)
+    assert response.json()["currentStep"]["type"] == "wait"
+
+    response = client.post(f"/api/v1/executions/{execution['id']}/stop", headers=user_token_headers)
+    assert response.status_code == 200
+    assert response.json()["status"] == "stopped"
+    assert response.json()["completedAt"]
+
+    missing = client.post("/api/v1/executions/", headers=user_token_headers, json={"eventId": "nope"})
+    assert missing.status_code == 404
+    assert client.post("/api/v1/executions/nope/stop", headers=user_token_headers).status_code == 404
+    assert len(client.get("/api/v1/executions/", headers=user_token_headers).json()) == 1
+
+    # The stopped run is still in the write buffer; reads see it anyway,
+    # without flushing it
+    response = client.get(
+        "/api/v1/executions/last-runs", headers=user_token_headers,
+        params={"event_id": [event.id, "never-ran"]},
+    )
+    [last_run] = response.json()
+    assert last_run["eventId"] == event.id and last_run["lastStatus"] == "stopped"
+    assert datetime.fromisoformat(last_run["lastRun"]) == datetime.fromisoformat(execution["startedAt"])
+    response = client.get(
+        "/api/v1/executions/history", headers=user_token_headers, params={"event_id": event.id}
+    )
+    assert [record["status"] for record in response.json()] == ["stopped"]
+    assert response.json()[0]["steps"][0]["type"] == "set_output"
+    assert history.stats()["pending"] == 1
@@ -0,0 +1,36 @@
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Event, Machine
+
+
+def test_fast_path_matches_schema_path(
+    client: TestClient, db_session: Session, user_token_headers: dict
+):
+    machine = Machine(name="Fast", type="simulator", ip_address="10.4.0.1", port=80)
+    db_session.add(machine)
+    db_session.commit()
+    for i in range(3):
+        db_session.add(
+            Event(
+                name=f"fast-{i}",
+                trigger={"type": "input", "inputId": "in1", "operator": "eq", "value": i},
+                actions=[{"id": "a", "type": "wait", "duration": 100}],
+                machine_id=machine.id,
+            )
+        )
+    db_session.commit()
+
+    for path, params in (
+        ("machines/", {}),
+        ("events/", {"limit": 2}),
+        ("events/", {"machine_id": machine.id}),
+    ):
+        url = f"{settings.API_V1_STR}/{path}"
+        standard = client.get(url, params=params, headers=user_token_headers)
+        fast = client.get(url, params={**params, "fast": True}, headers=user_token_headers)
+        assert standard.status_code == fast.status_code == status.HTTP_200_OK
+        assert fast.json() == standard.json()
+        assert fast.headers.get("X-Next-Cursor") == standard.headers.get("X-Next-Cursor")
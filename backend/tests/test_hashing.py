@@ -0,0 +1,102 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.hashing import HashingPool, HashingPoolBusy, hashing_pool
+
+
+def test_pool_rejects_beyond_queue_depth():
+    pool = HashingPool(max_workers=1, max_pending=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow() -> str:
+        started.set()
+        release.wait(5)
+        return "done"
+
+    results = []
+    worker = threading.Thread(target=lambda: results.append(pool.run(slow)))
+    worker.start()
+    started.wait(5)
+    with pytest.raises(HashingPoolBusy):
+        pool.run(lambda: "rejected")
+    release.set()
+    worker.join(5)
+    pool.shutdown()
+    assert results == ["done"]
+    assert pool.stats()["rejected"] == 1
+
+
+def test_run_async_awaits_the_pool_without_blocking_the_loop():
+    pool = HashingPool(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def main():
+        slow = asyncio.ensure_future(pool.run_async(lambda: release.wait(5) and "done"))
+        await asyncio.sleep(0.01)
+        # The loop is free while the hash runs, and admission still applies
+        with pytest.raises(HashingPoolBusy):
+            await pool.run_async(lambda: "rejected")
+        release.set()
+        return await slow
+
+    assert asyncio.run(main()) == "done"
+    pool.shutdown()
+    assert pool.stats()["pending"] == 0
+
+
+def test_cancelled_caller_keeps_the_slot_until_the_job_ends():
+    pool = HashingPool(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def main():
+        slow = asyncio.ensure_future(pool.run_async(release.wait, 5))
+        await asyncio.sleep(0.01)
+        slow.cancel()
+        await asyncio.sleep(0)
+        # The bcrypt job is still running, so nothing else is admitted
+        with pytest.raises(HashingPoolBusy):
+            await pool.run_async(lambda: "rejected")
+        assert pool.stats()["pending"] == 1
+        release.set()
+        await asyncio.sleep(0.05)
+        return await pool.run_async(lambda: "admitted")
+
+    assert asyncio.run(main()) == "admitted"
+    pool.shutdown()
+    assert pool.stats()["pending"] == 0
+
+
+def test_login_rehashes_outdated_cost(db_session: Session, test_user):
+    weak = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4)
+    crud.user.update(
+        db_session, db_obj=test_user, obj_in={"hashed_password": weak.hash("rehashme")}
+    )
+    assert test_user.hashed_password.startswith("$2b$04$")
+
+    user = crud.user.authenticate(db_session, email=test_user.email, password="rehashme")
+    assert user is not None
+    assert user.hashed_password.startswith(f"$2b${settings.BCRYPT_ROUNDS:02d}$")
+
+
+def test_login_returns_503_when_pool_saturated(
+    client: TestClient, test_user, monkeypatch
+):
+    async def busy(*args, **kwargs):
+        raise HashingPoolBusy(retry_after=3)
+
+    monkeypatch.setattr(hashing_pool, "verify_and_update_async", busy)
+    response = client.post(
+        f"{settings.API_V1_STR}/auth/login/access-token",
+        data={"username": test_user.email, "password": "testpassword"},
+    )
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "3"
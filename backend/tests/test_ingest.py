@@ -0,0 +1,164 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from starlette.websockets import WebSocketDisconnect
+
+from app import crud, schemas
+from app.api import deps
+from app.core.config import settings
+from app.engine import IngestPipeline, MachineState
+from app.engine.registry import MachineRegistry, machine_registry
+from app.main import app
+from app.schemas import FrameBatch
+
+TOKEN = "ingest-secret"
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_TOKEN", TOKEN)
+    monkeypatch.setattr(crud.machine.status_buffer, "session_factory", None)
+    pipeline = IngestPipeline(MachineState())
+    original_overrides = app.dependency_overrides.copy()
+    app.dependency_overrides[deps.get_ingest_pipeline] = lambda: pipeline
+    yield pipeline
+    app.dependency_overrides = original_overrides
+    crud.machine.status_buffer.discard(["m1", "m2"])
+
+
+def test_frames_validate_from_compact_json():
+    frames = FrameBatch.validate_json(b'[["m1", 1.5, {"temp": 21.5}, {"led": true}], ["m2", 2]]')
+    assert frames[0].inputs == {"temp": 21.5}
+    assert frames[0].outputs == {"led": True}
+    assert frames[1].inputs == {} and frames[1].outputs == {}
+    with pytest.raises(ValueError):
+        FrameBatch.validate_json(b'[["m1", "soon", {}, {}]]')
+    with pytest.raises(ValueError):
+        FrameBatch.validate_json(b'[["m1", 1, {"temp": [1]}, {}]]')
+
+
+def test_pipeline_updates_state_and_sinks():
+    pipeline = IngestPipeline(MachineState())
+    seen = []
+    pipeline.add_sink(seen.extend)
+    pipeline.add_sink(lambda frames: 1 / 0)
+    frames = FrameBatch.validate_python([
+        ("m1", 1.0, {"temp": 20.0}, {}),
+        ("m1", 2.0, {"temp": 21.0}, {"led": True}),
+    ])
+    crud.machine.status_buffer.discard(["m1"])
+
+    assert pipeline.submit(frames) == 2
+    assert pipeline.state.inputs[("m1", "temp")] == 21.0
+    assert pipeline.state.outputs[("m1", "led")] is True
+    assert crud.machine.status_buffer.get("m1") == "online"
+    assert len(seen) == 2
+    assert pipeline.stats() == {
+        "machines": 1, "batches": 1, "frames": 2, "samples": 3,
+        "rejected": 0, "unknown": 0, "sink_errors": 1,
+    }
+    crud.machine.status_buffer.discard(["m1"])
+
+
+def test_pipeline_drops_frames_from_unknown_machines(db_session: Session, test_machine_data):
+    machine_id = crud.machine.create(db_session, obj_in=schemas.MachineCreate(**test_machine_data)).id
+    registry = MachineRegistry(lambda: Session(db_session.get_bind()))
+    pipeline = IngestPipeline(MachineState(), machines=registry)
+    seen = []
+    pipeline.add_sink(seen.extend)
+    # Commits apply to the module-level registry; this one follows by hand
+    registry.load()
+
+    frames = FrameBatch.validate_python([
+        (machine_id, 1.0, {"temp": 20.0}, {}),
+        ("ghost", 1.0, {"temp": 99.0}, {}),
+    ])
+    assert pipeline.submit(frames) == 1
+    assert [frame[0] for frame in seen] == [machine_id]
+    assert ("ghost", "temp") not in pipeline.state.inputs
+    assert crud.machine.status_buffer.get("ghost") is None
+    assert set(pipeline.last_seen) == {machine_id}
+    assert pipeline.stats()["unknown"] == 1
+
+    # A deleted machine is forgotten and its frames dropped from then on
+    registry.apply(set(), {machine_id})
+    assert pipeline.last_seen == {}
+    assert pipeline.submit(frames[:1]) == 0
+    crud.machine.status_buffer.discard([machine_id])
+
+
+def test_machine_registry_follows_crud_writes(db_session: Session, test_machine_data):
+    machine_registry.load()
+    machine_id = crud.machine.create(db_session, obj_in=schemas.MachineCreate(**test_machine_data)).id
+    assert machine_id in machine_registry.known()
+    crud.machine.remove_by_id(db_session, id=machine_id)
+    assert machine_id not in machine_registry.known()
+
+
+def test_http_ingest(client: TestClient, pipeline):
+    body = json.dumps([["m1", 1.0, {"temp": 20.5}, {"led": False}], ["m2", 1.0, {}, {}]])
+
+    assert client.post("/api/v1/ingest/", content=body).status_code == 401
+    assert client.post("/api/v1/ingest/?token=wrong", content=body).status_code == 401
+
+    response = client.post("/api/v1/ingest/", content=body, headers={"X-Ingest-Token": TOKEN})
+    assert response.status_code == 202
+    assert response.json() == {"accepted": 2}
+    assert pipeline.state.inputs[("m1", "temp")] == 20.5
+    assert crud.machine.status_buffer.get("m2") == "online"
+
+    response = client.post(f"/api/v1/ingest/?token={TOKEN}", content=b'[["m1"]]')
+    assert response.status_code == 400
+    assert response.json()["detail"][0]["type"] == "missing"
+    assert pipeline.stats()["rejected"] == 1
+
+
+def test_http_ingest_refuses_oversized_bodies(client: TestClient, pipeline, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_MAX_BODY_MB", 1)
+    body = json.dumps([["m1", 1.0, {"temp": 20.5}, {}]] * 40000).encode()
+    headers = {"X-Ingest-Token": TOKEN}
+
+    assert client.post("/api/v1/ingest/", content=body, headers=headers).status_code == 413
+    # Without a Content-Length the limit applies while streaming
+    chunked = client.post("/api/v1/ingest/", content=iter([body]), headers=headers)
+    assert chunked.status_code == 413
+    assert pipeline.stats()["rejected"] == 2 and pipeline.stats()["frames"] == 0
+
+
+def test_http_ingest_disabled_without_token(client: TestClient, pipeline, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_TOKEN", "")
+    response = client.post("/api/v1/ingest/?token=", content=b"[]", headers={"X-Ingest-Token": ""})
+    assert response.status_code == 401
+
+
+def test_websocket_ingest(client: TestClient, pipeline):
+    with client.websocket_connect(f"/api/v1/ingest/ws?token={TOKEN}") as websocket:
+        websocket.send_text(json.dumps([["m1", 1.0, {"temp": 19.0}, {}]]))
+        websocket.send_bytes(b'[["m1", 1.1, {"temp": "hot"}, {}], ["m1", "x"]]')
+        error = websocket.receive_json()["error"]
+        assert error[0]["loc"] == [1, 1]
+        websocket.send_bytes(json.dumps([["m1", 1.2, {"temp": 19.5}, {}]]).encode())
+        websocket.send_text("[]")
+
+    assert pipeline.state.inputs[("m1", "temp")] == 19.5
+    assert pipeline.stats()["frames"] == 2
+    assert pipeline.stats()["rejected"] == 1
+
+
+def test_websocket_closes_on_oversized_messages(client: TestClient, pipeline, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_MAX_MESSAGE_MB", 1)
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect(f"/api/v1/ingest/ws?token={TOKEN}") as websocket:
+            websocket.send_bytes(json.dumps([["m1", 1.0, {"temp": 20.5}, {}]] * 40000).encode())
+            websocket.receive_json()
+    assert exc.value.code == 1009
+    assert pipeline.stats()["rejected"] == 1 and pipeline.stats()["frames"] == 0
+
+
+def test_websocket_rejects_bad_token(client: TestClient, pipeline):
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/api/v1/ingest/ws?token=wrong") as websocket:
+            websocket.receive_json()
+    assert exc.value.code == 1008
@@ -0,0 +1,104 @@
+import base64
+
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.crud.pagination import InvalidCursor, decode_cursor, encode_cursor
+from app.models import Event, Machine
+
+
+def _add_machines(db_session: Session, count: int) -> None:
+    for i in range(count):
+        db_session.add(
+            Machine(
+                name=f"Machine {i}",
+                type="simulator",
+                ip_address=f"10.0.0.{i + 1}",
+                port=8000,
+            )
+        )
+    db_session.commit()
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor("abc")) == "abc"
+
+
+def test_decode_rejects_garbage():
+    try:
+        decode_cursor("not-a-cursor!")
+    except InvalidCursor:
+        pass
+    else:
+        raise AssertionError("expected InvalidCursor")
+
+
+def test_walk_machines_with_cursor(
+    client: TestClient, db_session: Session, user_token_headers: dict
+):
+    _add_machines(db_session, 5)
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(
+            f"{settings.API_V1_STR}/machines/", params=params, headers=user_token_headers
+        )
+        assert response.status_code == status.HTTP_200_OK, response.text
+        seen.extend(m["id"] for m in response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert pages == 3
+    assert seen == sorted(seen)
+    assert len(set(seen)) == 5
+
+
+def test_invalid_cursor_is_rejected(client: TestClient, user_token_headers: dict):
+    response = client.get(
+        f"{settings.API_V1_STR}/machines/",
+        params={"cursor": "%%%"},
+        headers=user_token_headers,
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    crafted = base64.urlsafe_b64encode(b'{"k":{"a":1}}').decode()
+    for url in ("machines", "events"):
+        response = client.get(
+            f"{settings.API_V1_STR}/{url}/",
+            params={"cursor": crafted},
+            headers=user_token_headers,
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = client.get(
+            f"{settings.API_V1_STR}/{url}/",
+            params={"limit": 100000},
+            headers=user_token_headers,
+        )
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_events_page_by_machine(db_session: Session):
+    _add_machines(db_session, 2)
+    first, second = db_session.query(Machine).order_by(Machine.id).all()
+    for i in range(3):
+        db_session.add(
+            Event(name=f"ev-{i}", trigger={"type": "manual"}, actions=[], machine_id=first.id)
+        )
+    db_session.add(Event(name="other", trigger={"type": "manual"}, actions=[], machine_id=second.id))
+    db_session.commit()
+
+    page, cursor = crud.event.get_page_by_machine(db_session, machine_id=first.id, limit=2)
+    assert len(page) == 2 and cursor
+    rest, cursor = crud.event.get_page_by_machine(
+        db_session, machine_id=first.id, cursor=cursor, limit=2
+    )
+    assert len(rest) == 1 and cursor is None
+    assert {e.machine_id for e in page + rest} == {first.id}
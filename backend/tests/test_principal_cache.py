@@ -0,0 +1,114 @@
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.principal_cache import PrincipalCache, principal_cache
+
+
+def test_cache_hit_and_miss_counters():
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    assert cache.get("token") is None
+    cache.set("token", {"id": "user-1", "email": "a@example.com"})
+    assert cache.get("token")["email"] == "a@example.com"
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    cache = PrincipalCache(max_size=2, ttl_seconds=60)
+    cache.set("a", {"id": "1"})
+    cache.set("b", {"id": "2"})
+    cache.get("a")
+    cache.set("c", {"id": "3"})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_cache_respects_token_expiry():
+    import time
+
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    cache.set("expired", {"id": "1"}, expires_at=time.time() - 1)
+    assert cache.get("expired") is None
+
+
+def test_invalidate_user_drops_all_tokens():
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    cache.set("t1", {"id": "1"})
+    cache.set("t2", {"id": "1"})
+    cache.set("t3", {"id": "2"})
+    cache.invalidate_user("1")
+    assert cache.get("t1") is None
+    assert cache.get("t2") is None
+    assert cache.get("t3") is not None
+
+
+def test_lookup_started_before_an_invalidation_is_not_cached():
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    generation = cache.generation("1")
+    # The user is deactivated while the stale row is still being loaded
+    cache.invalidate_user("1")
+    cache.set("t1", {"id": "1", "is_active": True}, generation=generation)
+    assert cache.get("t1") is None
+    cache.set("t1", {"id": "1", "is_active": False}, generation=cache.generation("1"))
+    assert cache.get("t1") == {"id": "1", "is_active": False}
+
+
+def test_authenticated_requests_hit_cache(
+    client: TestClient, db_session: Session, test_user, user_token_headers: dict
+):
+    principal_cache.clear()
+    for _ in range(3):
+        response = client.get(
+            f"{settings.API_V1_STR}/machines/", headers=user_token_headers
+        )
+        assert response.status_code == status.HTTP_200_OK, response.text
+    stats = principal_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 2
+
+    # Revoking the user must take effect on the very next request
+    crud.user.update(db_session, db_obj=test_user, obj_in={"is_active": False})
+    assert principal_cache.stats()["size"] == 0
+    response = client.get(f"{settings.API_V1_STR}/machines/", headers=user_token_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_deleting_a_user_drops_their_principal(
+    client: TestClient, db_session: Session, test_user, user_token_headers: dict
+):
+    principal_cache.clear()
+    response = client.get(f"{settings.API_V1_STR}/machines/", headers=user_token_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert principal_cache.stats()["size"] == 1
+
+    crud.user.remove(db_session, id=test_user.id)
+    assert principal_cache.stats()["size"] == 0
+    response = client.get(f"{settings.API_V1_STR}/machines/", headers=user_token_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_user_updates_by_id_hash_passwords_and_drop_principals(
+    client: TestClient, db_session: Session, test_user, user_token_headers: dict
+):
+    principal_cache.clear()
+    client.get(f"{settings.API_V1_STR}/machines/", headers=user_token_headers)
+    assert principal_cache.stats()["size"] == 1
+
+    user = crud.user.update_by_id(db_session, id=test_user.id, obj_in={"password": "changed-pw"})
+    assert user.hashed_password != "changed-pw"
+    assert crud.user.authenticate(db_session, email=test_user.email, password="changed-pw")
+    assert principal_cache.stats()["size"] == 0
+
+    client.get(f"{settings.API_V1_STR}/machines/", headers=user_token_headers)
+    assert crud.user.update_multi(db_session, objs_in=[{"id": test_user.id, "is_active": False}]) == {
+        test_user.id
+    }
+    db_session.expire_all()
+    assert crud.user.get(db_session, id=test_user.id).is_active is False
+    response = client.get(f"{settings.API_V1_STR}/machines/", headers=user_token_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
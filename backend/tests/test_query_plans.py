@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.crud.pagination import encode_cursor
+from app.models import Event, Machine
+from tests.query_plan import capture_queries, full_scans
+
+
+def test_crud_queries_use_indexes(db_session: Session, test_user):
+    machine = Machine(name="Plan", type="simulator", ip_address="10.3.0.1", port=80)
+    db_session.add(machine)
+    db_session.commit()
+    ev = Event(name="plan", trigger={"type": "manual"}, actions=[], machine_id=machine.id)
+    db_session.add(ev)
+    db_session.commit()
+    machine_id, event_id = machine.id, ev.id
+    bind = db_session.get_bind()
+
+    with capture_queries(bind) as statements:
+        crud.user.get(db_session, id=test_user.id)
+        crud.user.get_by_email(db_session, email=test_user.email)
+
+        crud.machine.get(db_session, id=machine_id)
+        crud.machine.get_multi(db_session, skip=10, limit=10)
+        crud.machine.get_page(db_session, cursor=encode_cursor(machine_id), limit=10)
+        crud.machine.get_by_name(db_session, name="Plan")
+        crud.machine.get_by_ip_port(db_session, ip_address="10.3.0.1", port=80)
+        crud.machine.get_existing_ids(db_session, ids=[machine_id])
+        crud.machine.get_existing_ip_ports(db_session, ip_ports=[("10.3.0.1", 80)])
+        crud.machine.update_status_by_id(db_session, id=machine_id, status="online")
+
+        crud.event.get(db_session, id=event_id)
+        crud.event.get_page(db_session, limit=10)
+        crud.event.get_multi_by_machine(db_session, machine_id=machine_id)
+        crud.event.get_page_by_machine(
+            db_session, machine_id=machine_id, cursor=encode_cursor(event_id)
+        )
+        crud.event.get_by_name(db_session, name="plan")
+        crud.event.get_existing_names(db_session, names=["plan"])
+        crud.event.get_enabled_events(db_session)
+        crud.event.toggle_by_id(db_session, id=event_id, enabled=False)
+        crud.event.remove_by_id(db_session, id=event_id)
+        crud.machine.remove_by_id(db_session, id=machine_id)
+
+    assert len(statements) >= 20
+    assert full_scans(bind, statements) == []
+
+
+def test_detects_full_scan(db_session: Session):
+    bind = db_session.get_bind()
+    with capture_queries(bind) as statements:
+        db_session.query(Machine).filter(Machine.type == "simulator").all()
+    assert len(full_scans(bind, statements)) == 1
+
+
+def test_change_log_prune_seeks_later_entries(db_session: Session):
+    bind = db_session.get_bind()
+    with capture_queries(bind) as statements:
+        crud.change_log.prune(db_session, before=datetime.now(timezone.utc))
+    [(statement, parameters)] = [s for s in statements if "EXISTS" in s[0].upper()]
+    with bind.connect() as conn:
+        plan = [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+    # The per-entry lookup for a later change to the same row is a seek
+    assert any(
+        step.startswith("SEARCH") and "ix_change_log_table_name_row_id_revision" in step
+        for step in plan
+    ), plan
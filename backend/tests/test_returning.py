@@ -0,0 +1,84 @@
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.models import Event, Machine
+
+
+def _machine(db_session: Session) -> Machine:
+    machine = Machine(name="Returning", type="simulator", ip_address="10.2.0.1", port=80)
+    db_session.add(machine)
+    db_session.commit()
+    return machine
+
+
+def test_update_by_id_is_a_single_statement(db_session: Session):
+    machine = _machine(db_session)
+    machine_id = machine.id
+    # Start from an empty identity map, like a fresh request session would
+    db_session.expunge_all()
+    statements = []
+    bind = db_session.get_bind()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        updated = crud.machine.update_status_by_id(db_session, id=machine_id, status="online")
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+
+    # The table revision and change log ride along in the same transaction
+    statements = [
+        s for s in statements if "table_revisions" not in s and "change_log" not in s
+    ]
+    assert updated.status == "online"
+    assert len(statements) == 1
+    assert statements[0].startswith("UPDATE machines SET status")
+    assert "RETURNING" in statements[0]
+
+
+def test_update_by_id_missing_row(db_session: Session):
+    assert crud.machine.update_by_id(db_session, id="missing", obj_in={"name": "x"}) is None
+    assert crud.machine.remove_by_id(db_session, id="missing") is None
+
+
+def test_toggle_and_delete_endpoints(
+    client: TestClient, db_session: Session, user_token_headers: dict
+):
+    machine = _machine(db_session)
+    ev = Event(name="toggle me", trigger={"type": "manual"}, actions=[], machine_id=machine.id)
+    db_session.add(ev)
+    db_session.commit()
+
+    response = client.post(
+        f"{settings.API_V1_STR}/events/{ev.id}/toggle",
+        params={"enabled": False},
+        headers=user_token_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json()["enabled"] is False
+
+    response = client.delete(
+        f"{settings.API_V1_STR}/machines/{machine.id}", headers=user_token_headers
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json()["name"] == "Returning"
+    # Events go with their machine through ON DELETE CASCADE
+    db_session.expire_all()
+    assert db_session.query(Event).count() == 0
+
+
+def test_remove_multi_without_returning(db_session: Session, monkeypatch):
+    machine = _machine(db_session)
+    machine_id = machine.id
+    monkeypatch.setattr(db_session.get_bind().dialect, "delete_returning", False)
+
+    removed = crud.machine.remove_multi(db_session, ids=[machine_id, "missing"])
+    assert removed == {machine_id}
+    db_session.expire_all()
+    assert db_session.query(Machine).count() == 0
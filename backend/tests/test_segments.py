@@ -0,0 +1,171 @@
+import asyncio
+import time
+
+import numpy as np
+
+from app import crud, schemas
+from app.engine import SegmentStore, TimeSeriesStore, decode_block, encode_block, segments
+from app.engine.registry import machine_registry
+from app.engine.segments import ACTIVE
+from app.schemas import FrameBatch
+
+T0 = 1_700_000_000.0
+
+
+def _frames(machine_id, start, count, value=lambda i: float(i % 7)):
+    return FrameBatch.validate_python([
+        (machine_id, start + i / 10, {"temp": value(i)}, {"led": bool(i // 50 % 2)})
+        for i in range(count)
+    ])
+
+
+def test_gorilla_round_trip():
+    rng = np.random.default_rng(0)
+    times = (T0 * 1000 + np.cumsum(rng.integers(0, 5000, 500))).astype(np.int64).tolist()
+    values = np.concatenate((rng.normal(0, 1e6, 250), [0.0, -0.0, np.inf, np.nan], np.full(246, 21.5)))
+    payload = encode_block(times, values)
+    decoded_times, words = decode_block(payload, len(times), times[0])
+    assert decoded_times == times
+    assert words == values.view(np.uint64).tolist()
+
+    # Evenly spaced samples of an unchanged value cost 1 bit each, after
+    # the mode bit, the spacing and the first value
+    regular = encode_block(list(range(0, 100000, 100)), np.full(1000, 1.0))
+    assert len(regular) == (1 + 64 + 64 + 999 + 7) // 8
+    assert decode_block(regular, 1000, 0)[0] == list(range(0, 100000, 100))
+
+
+def test_flush_read_and_restart(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    store.ingest(_frames("m1", T0, 300))
+    times, values = store.read("m1", "temp", T0, T0 + 60)
+    assert len(times) == 300  # still buffered, but readable
+    assert store.flush() > 0
+    store.ingest(_frames("m1", T0 + 30, 100))
+
+    times, values = store.read("m1", "temp", T0 + 10, T0 + 35)
+    assert np.allclose(times, T0 + np.arange(100, 350) / 10)
+    assert values.tolist() == [float(i % 7) for i in range(100, 300)] + [float(i % 7) for i in range(50)]
+    assert store.read("m1", "led", T0, T0 + 100)[1][:51].tolist() == [0.0] * 50 + [1.0]
+    store.flush()
+
+    # A torn block at the end of the active segment is dropped on reopen
+    active = store.channel_dir("m1", "temp") / ACTIVE
+    with open(active, "ab") as handle:
+        handle.write(b"\x10\x00\x00\x00partial")
+    reopened = SegmentStore(str(tmp_path))
+    times, _ = reopened.read("m1", "temp", T0, T0 + 100)
+    assert len(times) == 400
+    reopened.ingest(_frames("m1", T0 + 40, 10) + _frames("m1", T0 + 20, 10))
+    reopened.flush()
+    assert reopened.stats()["dropped"] == 20  # both channels
+    assert len(reopened.read("m1", "temp", T0, T0 + 100)[0]) == 410
+
+
+def test_segments_seal_compact_and_expire(tmp_path):
+    store = SegmentStore(str(tmp_path), segment_seconds=600, retention=3600)
+    for minute in range(30):
+        store.ingest(_frames("m1", T0 + minute * 60, 600, value=lambda i: float(i // 100)))
+        store.flush()
+    directory = store.channel_dir("m1", "temp")
+    sealed = sorted(path for path in directory.glob("*.seg") if path.name != ACTIVE)
+    assert len(sealed) > 1
+    assert store.stats()["sealed"] == 2 * len(sealed)  # temp and led
+    before = sum(path.stat().st_size for path in sealed)
+    expected = store.read("m1", "temp", T0, T0 + 1800)
+
+    assert store.compact(now=T0 + 1800) == (0, len(sealed) * 2)
+    after = sum(path.stat().st_size for path in sealed)
+    assert after < before
+    compacted = store.read("m1", "temp", T0, T0 + 1800)
+    assert np.array_equal(compacted[0], expected[0])
+    assert np.array_equal(compacted[1], expected[1])
+    assert store.compact(now=T0 + 1800) == (0, 0)
+
+    expired, _ = store.compact(now=T0 + 3600 + 1000)
+    assert expired > 0
+    assert store.read("m1", "temp", T0, T0 + 650)[0].size == 0
+    assert store.read("m1", "temp", T0 + 1500, T0 + 1800)[0].size == 3000
+
+
+def test_series_store_reads_older_ranges_from_the_archive(tmp_path):
+    archive = SegmentStore(str(tmp_path))
+    archive.ingest(_frames("m1", T0, 6000))
+    archive.flush()
+    store = TimeSeriesStore(capacity=1000, archive=archive)
+    store.ingest(_frames("m1", T0 + 600, 1000))
+
+    _, times, rows = asyncio.run(store.downsample("m1", "temp", T0, T0 + 700, 70))
+    assert len(times) == 70
+    assert times[0] == T0
+    assert rows[:, 1].max() == 6.0
+
+    disabled = TimeSeriesStore(archive=SegmentStore(""))
+    assert len(asyncio.run(disabled.downsample("m1", "temp", T0, T0 + 700, 70))[1]) == 0
+
+
+def test_rollups_outlive_a_restart(tmp_path, monkeypatch):
+    archive = SegmentStore(str(tmp_path))
+    store = TimeSeriesStore(archive=archive)
+    for minute in range(30):
+        frames = _frames("m1", T0 + minute * 60, 600)
+        archive.ingest(frames)
+        store.ingest(frames)
+    asyncio.run(store.downsample("m1", "temp", T0, T0 + 1800, 20))
+    archive.flush()
+    assert 60.0 in archive.read_rollups("m1", "temp")
+
+    def decode(*args):
+        raise AssertionError("read raw samples")
+
+    # A fresh store answers long ranges from the saved 1 m buckets alone
+    monkeypatch.setattr(archive, "read", decode)
+    restarted = TimeSeriesStore(archive=archive)
+    resolution, times, rows = asyncio.run(restarted.downsample("m1", "temp", T0, T0 + 1740, 20))
+    assert resolution == 60.0
+    assert times[0] == T0
+    assert rows[:, 0].min() == 0.0 and rows[:, 1].max() == 6.0
+
+
+def test_close_waits_for_the_write_in_flight(tmp_path, monkeypatch):
+    original = segments._write_blocks
+    calls = []
+
+    def slow_write_blocks(*args):
+        # Only the background write is slow, so an unserialized final
+        # flush would land before it
+        calls.append(args)
+        if len(calls) == 1:
+            time.sleep(0.2)
+        return original(*args)
+
+    monkeypatch.setattr(segments, "_write_blocks", slow_write_blocks)
+    store = SegmentStore(str(tmp_path), flush_interval=0.01)
+
+    async def main():
+        store.ingest(_frames("m1", T0, 10))
+        # The task has handed the first batch to a worker thread
+        await asyncio.sleep(0.05)
+        assert store._writing
+        store.ingest(_frames("m1", T0 + 1, 10))
+        await store.close()
+
+    asyncio.run(main())
+    times, _ = SegmentStore(str(tmp_path)).read("m1", "temp", T0, T0 + 10)
+    assert len(times) == 20 and (np.diff(times) > 0).all()
+
+
+def test_deleted_machines_lose_their_segments(tmp_path, db_session, test_machine_data, monkeypatch):
+    store = SegmentStore(str(tmp_path))
+    machine_id = crud.machine.create(db_session, obj_in=schemas.MachineCreate(**test_machine_data)).id
+    store.ingest(_frames(machine_id, T0, 10) + _frames("m2", T0, 10))
+    store.flush()
+    store.ingest(_frames(machine_id, T0 + 1, 10))
+    monkeypatch.setattr(machine_registry, "_listeners", [store.remove_machines])
+
+    crud.machine.remove_by_id(db_session, id=machine_id)
+    assert not (tmp_path / machine_id).exists()
+    assert store.stats()["pending_samples"] == 0
+    assert len(store.read("m2", "temp", T0, T0 + 10)[0]) == 10
+    store.flush()
+    assert not (tmp_path / machine_id).exists()
@@ -0,0 +1,188 @@
+import asyncio
+
+import numpy as np
+
+from app.api import deps
+from app.engine import IngestPipeline, MachineState, RingBuffer, Series, TimeSeriesStore
+from app.engine.downsample import lttb
+from app.main import app
+from app.schemas import FrameBatch
+
+
+def test_ring_buffer_wraps_and_windows_are_views():
+    buffer = RingBuffer(capacity=8, initial_size=2)
+    for i in range(11):
+        assert buffer.append(float(i), i * 10.0)
+
+    assert buffer.size == 8 and buffer.count == 8
+    assert buffer.times.tolist() == [3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0]
+    times, values = buffer.window(5, 8.5)
+    assert times.tolist() == [5.0, 6.0, 7.0, 8.0]
+    assert values.tolist() == [50.0, 60.0, 70.0, 80.0]
+    # The ring has wrapped and the window is still a view, not a copy
+    assert buffer.head != 0
+    assert np.shares_memory(times, buffer._times)
+
+
+def test_ring_buffer_extend_drops_out_of_order_samples():
+    buffer = RingBuffer(capacity=5, initial_size=2)
+    buffer.append(1.0, 1.0)
+    assert buffer.append(0.5, 0.0) is False
+    assert buffer.extend(np.array([2.0, 1.5, 3.0, 4.0]), np.array([2.0, 0.0, 3.0, 4.0])) == 3
+    assert buffer.dropped == 2
+    assert buffer.times.tolist() == [1.0, 2.0, 3.0, 4.0]
+
+    buffer.extend(np.arange(5.0, 9.0), np.arange(5.0, 9.0))
+    assert buffer.times.tolist() == [4.0, 5.0, 6.0, 7.0, 8.0]
+    buffer.extend(np.arange(10.0, 20.0), np.arange(10.0, 20.0))
+    assert buffer.values.tolist() == [15.0, 16.0, 17.0, 18.0, 19.0]
+
+
+def test_store_ingests_frames_by_channel():
+    store = TimeSeriesStore(capacity=100)
+    pipeline = IngestPipeline(MachineState(), sinks=[store.ingest])
+    pipeline.submit(FrameBatch.validate_python([
+        ("m1", 1.0, {"temp": 20.0, "mode": "auto"}, {"led": True}),
+        ("m1", 1.1, {"temp": 20.5}, {"led": False}),
+        ("m2", 1.0, {"temp": 30}, {}),
+    ]))
+
+    times, values = store.window("m1", "temp")
+    assert times.tolist() == [1.0, 1.1]
+    assert values.tolist() == [20.0, 20.5]
+    assert store.window("m1", "led")[1].tolist() == [1.0, 0.0]
+    assert store.get("m1", "mode") is None
+    assert len(store.window("m3", "temp")[0]) == 0
+    assert store.stats()["channels"] == 3
+
+    store.forget("m1")
+    assert store.stats()["channels"] == 1
+    assert store.nbytes == store.get("m2", "temp").nbytes
+
+
+def test_store_evicts_coldest_channels_over_budget():
+    one_channel = Series(16, 16).nbytes
+    store = TimeSeriesStore(capacity=16, initial_size=16, memory_budget=3 * one_channel)
+    for machine_id in ("a", "b", "c"):
+        store.append(machine_id, "x", 1.0, 1.0)
+    store.window("a", "x")  # reading keeps a warm
+    store.append("d", "x", 1.0, 1.0)
+
+    assert store.get("b", "x") is None
+    assert [key[0] for key in store.channels] == ["c", "a", "d"]
+    assert store.nbytes == 3 * one_channel
+    assert store.stats()["evicted"] == 1 and store.stats()["shrunk"] == 0
+
+
+def test_store_shrinks_cold_raw_history_before_evicting():
+    store = TimeSeriesStore(capacity=3200, initial_size=16)
+    times = np.arange(0, 320, 0.1)
+    for machine_id in ("a", "b", "c"):
+        store.extend(machine_id, "x", times, np.sin(times))
+    full = store.get("c", "x").nbytes
+    # Room for the third channel only if the other two give up raw samples
+    store.memory_budget = store.nbytes - full // 4
+    store.extend("c", "x", times + 320, np.sin(times))
+
+    assert [key[0] for key in store.channels] == ["a", "b", "c"]
+    assert store.stats()["evicted"] == 0 and store.stats()["shrunk"] >= 1
+    assert store.nbytes <= store.memory_budget
+    a = store.get("a", "x")
+    assert a.raw.count < len(times) and a.raw.times[-1] == times[-1]
+    # Its rollups still cover the samples the raw ring let go of
+    assert a.tiers[0].buffer.times[0] == 0.0
+
+
+def _filled_store(hours):
+    store = TimeSeriesStore(capacity=3600 * 10)
+    times = 1_699_999_200.0 + np.arange(0, hours * 3600, 0.1)  # on the hour
+    values = np.sin(times / 60)
+    for i in range(0, len(times), 50):
+        store.extend("m1", "temp", times[i:i + 50], values[i:i + 50])
+    return store, times, values
+
+
+def test_rollup_tiers_match_raw_aggregates():
+    store, times, values = _filled_store(2)
+    series = store.get("m1", "temp")
+    series.roll()
+    seconds, minutes, hours = series.tiers
+    assert seconds.watermark == np.floor(times[-1])
+    assert minutes.buffer.count == 2 * 60 - 1
+    assert hours.buffer.count == 1
+
+    # One minute bucket against the raw samples it covers
+    start = minutes.buffer.times[5]
+    inside = (times >= start) & (times < start + 60)
+    row = minutes.buffer.values[5]
+    assert row[0] == values[inside].min() and row[1] == values[inside].max()
+    assert row[3] == inside.sum()
+    assert np.isclose(row[2], values[inside].sum())
+
+
+def test_downsample_picks_the_coarsest_level_that_resolves_points():
+    store, times, values = _filled_store(2)
+    end = times[-1]
+
+    resolution, bucket_times, rows = asyncio.run(store.downsample("m1", "temp", end - 60, end, 100))
+    assert resolution == 0.0
+    assert len(bucket_times) == 100
+    inside = times >= end - 60
+    assert rows[:, 0].min() == values[inside].min()
+
+    resolution, bucket_times, rows = asyncio.run(store.downsample("m1", "temp", end - 7200, end, 100))
+    assert resolution == 60.0
+    assert len(bucket_times) <= 100
+    # The minute still filling up comes from the finer levels
+    row_times, _ = store.get("m1", "temp").rows(end - 7200, end, 2)
+    assert row_times[-1] == end
+    assert np.allclose(rows[:, 2].mean(), values.mean(), atol=0.05)
+
+    resolution, picked, rows = asyncio.run(store.downsample("m1", "temp", end - 600, end, 50, "lttb"))
+    assert resolution == 1.0
+    assert len(picked) == 50 and rows.shape == (50, 1)
+    assert np.all(np.diff(picked) > 0)
+
+
+def test_lttb_keeps_spikes_and_endpoints():
+    times = np.arange(1000.0)
+    values = np.zeros(1000)
+    values[437] = 10.0
+    selected = lttb(times, values, 20)
+    assert len(selected) == 20
+    assert selected[0] == 0 and selected[-1] == 999
+    assert 437 in selected
+    assert lttb(times[:5], values[:5], 20).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_series_endpoint(client, user_token_headers, test_machine_data):
+    store, times, _ = _filled_store(1)
+    original_overrides = app.dependency_overrides.copy()
+    app.dependency_overrides[deps.get_series_store] = lambda: store
+    try:
+        machine = client.post(
+            "/api/v1/machines/", headers=user_token_headers, json=test_machine_data
+        ).json()
+        store.channels[(machine["id"], "temp")] = store.channels.pop(("m1", "temp"))
+        url = f"/api/v1/machines/{machine['id']}/series/temp"
+        end = float(times[-1])
+
+        response = client.get(url, headers=user_token_headers, params={"from": end - 600, "to": end, "points": 60})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["resolution"] == 1.0 and body["method"] == "minmax"
+        assert len(body["points"]) == 60 and len(body["points"][0]) == 4
+
+        response = client.get(url, headers=user_token_headers, params={"to": end, "method": "lttb", "points": 30})
+        assert response.json()["from"] == end - 3600
+        assert [len(point) for point in response.json()["points"]] == [2] * 30
+
+        empty = client.get(f"/api/v1/machines/{machine['id']}/series/nope", headers=user_token_headers)
+        assert empty.json()["points"] == []
+        assert client.get(url, headers=user_token_headers, params={"from": end, "to": end}).status_code == 400
+        assert client.get(url, headers=user_token_headers, params={"points": 1}).status_code == 422
+        for bounds in ({"from": "-inf"}, {"to": "inf"}, {"from": "nan"}, {"to": "NaN"}):
+            assert client.get(url, headers=user_token_headers, params=bounds).status_code == 422
+        assert client.get("/api/v1/machines/nope/series/temp", headers=user_token_headers).status_code == 404
+    finally:
+        app.dependency_overrides = original_overrides
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.engine import ExecutionEngine, ExecutionRuntime, SimulatorDriver, TraceEntry, run_simulated, simulate
+
+
+def _set(output, value):
+    return {"id": f"set-{output}-{value}", "type": "set_output", "outputId": output, "value": value}
+
+
+def _wait(seconds):
+    return {"id": f"wait-{seconds}", "type": "wait", "duration": seconds * 1000}
+
+
+def _blink(count, seconds):
+    return [{"id": "l", "type": "loop", "count": count, "steps": [
+        _set("led", True), _wait(seconds), _set("led", False), _wait(seconds),
+    ]}]
+
+
+def test_an_hour_of_waits_runs_in_virtual_time():
+    started = time.perf_counter()
+    result = simulate(_blink(360, 5))
+    assert time.perf_counter() - started < 5
+    assert result.elapsed == 3600
+    assert len(result.trace) == 720
+    assert result.trace[:2] == [
+        TraceEntry(0.0, "output", "simulator", "led", True),
+        TraceEntry(5.0, "output", "simulator", "led", False),
+    ]
+    # Same plan, same trace
+    assert simulate(_blink(360, 5)).trace == result.trace
+
+
+def test_stimuli_drive_conditions_and_side_effects_are_traced():
+    actions = [
+        _wait(30),
+        {
+            "id": "c",
+            "type": "conditional",
+            "condition": {"type": "input", "inputId": "door", "operator": "eq", "value": True},
+            "trueSteps": [{"id": "h", "type": "http_request", "method": "post", "url": "http://x/alarm"}],
+            "falseSteps": [_set("led", False)],
+        },
+        {"id": "p", "type": "parallel", "steps": [
+            {"id": "pa", "type": "loop", "count": 1, "steps": [_wait(2), _set("a", 1)]},
+            {"id": "pb", "type": "loop", "count": 1, "steps": [_wait(1), _set("b", 1)]},
+        ]},
+    ]
+    result = simulate(actions, machine_id="m1", stimuli=[(10, ("m1", "door"), True)])
+    assert [(entry.time, entry.kind, entry.target) for entry in result.trace] == [
+        (30.0, "input", "door"),
+        (30.0, "http", "POST http://x/alarm"),
+        (31.0, "output", "b"),
+        (32.0, "output", "a"),
+    ]
+    assert result.elapsed == 32
+
+
+def test_runtime_picks_the_simulator_engine_by_machine_type():
+    driver = SimulatorDriver()
+    runtime = ExecutionRuntime(
+        ExecutionEngine(driver=None), engines_by_type={"simulator": ExecutionEngine(driver)}
+    )
+    event = SimpleNamespace(id="e", name="blink", actions=_blink(60, 60), machine_id="m1")
+
+    async def main():
+        execution = runtime.submit(event, machine_type="simulator")
+        await execution.task
+        return execution, asyncio.get_running_loop().time()
+
+    execution, now = run_simulated(main())
+    assert execution.status == "completed"
+    assert now == 7200
+    assert driver.state.outputs == {("m1", "led"): False}
+    assert len(driver.trace) == 120
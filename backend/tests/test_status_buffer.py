@@ -0,0 +1,90 @@
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+from app.crud.status_buffer import StatusBuffer
+
+
+def _machine(db: Session, name, ip):
+    return crud.machine.create(db, obj_in=schemas.MachineCreate(
+        name=name, type="raspberry_pi", ip_address=ip, port=8000, status="offline",
+    ))
+
+
+def _stored_status(db: Session, machine_id):
+    return db.scalar(select(models.Machine.status).where(models.Machine.id == machine_id))
+
+
+def test_statuses_coalesce_and_flush_in_one_update(db_session: Session, monkeypatch):
+    buffer = StatusBuffer(crud.machine)
+    monkeypatch.setattr(crud.machine, "status_buffer", buffer)
+    first = _machine(db_session, "first", "10.6.0.1")
+    second = _machine(db_session, "second", "10.6.0.2")
+    for status in ("online", "error", "online"):
+        crud.machine.set_status(id=first.id, status=status)
+    crud.machine.set_status(id=second.id, status="error")
+    assert buffer.stats()["coalesced"] == 2
+
+    # Reads see the buffered values before anything is written
+    db_session.expire_all()
+    assert crud.machine.get(db_session, id=first.id).status == "online"
+    assert _stored_status(db_session, first.id) == "offline"
+    rows, _ = crud.machine.get_rows(db_session, fields=["id", "status"])
+    assert dict(rows) == {first.id: "online", second.id: "error"}
+    # The overlay doesn't make the loaded object dirty
+    assert not db_session.dirty
+
+    updates = []
+    listener = lambda conn, cursor, statement, *args: updates.append(statement)
+    event.listen(db_session.get_bind(), "before_cursor_execute", listener)
+    try:
+        assert buffer.flush(db_session) == 2
+    finally:
+        event.remove(db_session.get_bind(), "before_cursor_execute", listener)
+    machine_updates = [s for s in updates if s.startswith("UPDATE machines")]
+    assert len(machine_updates) == 1
+    assert _stored_status(db_session, first.id) == "online"
+    assert _stored_status(db_session, second.id) == "error"
+    assert buffer.flush(db_session) == 0
+
+
+def test_direct_writes_supersede_buffered_status(db_session: Session, monkeypatch):
+    buffer = StatusBuffer(crud.machine)
+    monkeypatch.setattr(crud.machine, "status_buffer", buffer)
+    machine = _machine(db_session, "direct", "10.6.0.3")
+    crud.machine.set_status(id=machine.id, status="error")
+    crud.machine.update_status_by_id(db_session, id=machine.id, status="online")
+    assert buffer.get(machine.id) is None
+    assert crud.machine.get(db_session, id=machine.id).status == "online"
+
+    crud.machine.set_status(id=machine.id, status="error")
+    crud.machine.remove_by_id(db_session, id=machine.id)
+    assert buffer.flush(db_session) == 0
+
+
+def test_statuses_being_flushed_stay_visible_until_committed(db_session: Session, monkeypatch):
+    buffer = StatusBuffer(crud.machine)
+    monkeypatch.setattr(crud.machine, "status_buffer", buffer)
+    first = _machine(db_session, "first", "10.6.0.4")
+    second = _machine(db_session, "second", "10.6.0.5")
+    crud.machine.set_status(id=first.id, status="online")
+    crud.machine.set_status(id=second.id, status="error")
+    seen = {}
+
+    def update_multi(db, *, objs_in):
+        db_session.expire_all()
+        seen["status"] = crud.machine.get(db_session, id=first.id).status
+        # A direct write lands while the batch is in flight
+        buffer.discard([second.id])
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(crud.machine, "update_multi", update_multi)
+    try:
+        buffer.flush(db_session)
+    except RuntimeError:
+        pass
+    assert seen["status"] == "online"
+    # The failed batch goes back to the buffer, minus the superseded status
+    assert buffer.get(first.id) == "online"
+    assert buffer.get(second.id) is None
+    assert buffer.stats()["pending"] == 1
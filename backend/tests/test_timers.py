@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, timezone
+
+from app.engine import ExecutionEngine, PlanCache, compile_actions
+from app.engine.conditions import next_fire_time
+from app.engine.timers import TimeTrigger, TimingWheel
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_timers_fire_in_order_and_never_early():
+    clock = FakeClock()
+    wheel = TimingWheel(tick=0.01, slots=16, levels=3, clock=clock)
+    fired = []
+    # Spread across all three levels (16, 256 and 4096 ticks)
+    for delay in (0.05, 0.15, 3.0, 0.004, 30.0):
+        wheel.call_later(delay, fired.append, delay)
+
+    clock.now += 0.001
+    assert wheel.advance() == 0
+    clock.now += 0.01
+    assert wheel.advance() == 1 and fired == [0.004]
+    clock.now = 1000.149
+    wheel.advance()
+    assert fired == [0.004, 0.05]
+    clock.now = 1003.0
+    wheel.advance()
+    assert fired == [0.004, 0.05, 0.15, 3.0]
+    clock.now = 1100.0
+    wheel.advance()
+    assert fired[-1] == 30.0
+    stats = wheel.stats()
+    assert stats["pending"] == 0 and stats["fired"] == 5
+    assert sum(stats["drift_histogram"].values()) == 5
+
+
+def test_cancel_is_constant_time_and_counted():
+    clock = FakeClock()
+    wheel = TimingWheel(tick=0.01, slots=16, levels=2, clock=clock)
+    fired = []
+    timers = [wheel.call_later(i * 0.1, fired.append, i) for i in range(1, 11)]
+    for timer in timers[::2]:
+        timer.cancel()
+    timers[0].cancel()  # a second cancel is a no-op
+    assert wheel.stats()["pending"] == 5
+    clock.now += 2
+    wheel.advance()
+    assert fired == [2, 4, 6, 8, 10]
+    assert wheel.stats()["cancelled"] == 5
+
+
+def test_skips_idle_stretches():
+    clock = FakeClock()
+    wheel = TimingWheel(tick=0.01, slots=16, levels=4, clock=clock)
+    wheel.call_later(400.0, lambda: None)
+    assert wheel.next_deadline() > clock.now + 1
+    clock.now += 400
+    assert wheel.advance() == 1
+
+
+def test_engine_waits_through_the_wheel():
+    async def main():
+        wheel = TimingWheel(tick=0.005)
+        engine = ExecutionEngine(None, PlanCache(4), timers=wheel)
+        plan = compile_actions([{"id": "w", "type": "wait", "duration": 20}] * 3)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(engine.run(plan) for _ in range(50)))
+        elapsed = loop.time() - started
+        await wheel.stop()
+        return elapsed, wheel.stats()
+
+    elapsed, stats = asyncio.run(main())
+    assert 0.06 <= elapsed < 0.5
+    assert stats["fired"] == 150
+    assert stats["drift_ms_max"] < 100
+
+
+def test_next_fire_time_for_time_of_day_triggers():
+    monday_noon = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+    after = {"type": "time", "operator": "after", "time": "08:30", "timezone": "UTC"}
+    assert next_fire_time(after, monday_noon) == datetime(2024, 1, 2, 8, 30, tzinfo=timezone.utc)
+    weekend = {**after, "weekdays": [0, 6]}
+    assert next_fire_time(weekend, monday_noon).date().isoformat() == "2024-01-06"
+    new_york = {"type": "time", "operator": "between", "time": "09:00", "time2": "17:00", "timezone": "America/New_York"}
+    # 09:00 EST is 14:00 UTC
+    assert next_fire_time(new_york, monday_noon).astimezone(timezone.utc).hour == 14
+
+
+def test_time_trigger_rearms_after_firing():
+    clock = FakeClock()
+    wheel = TimingWheel(tick=1.0, slots=64, levels=4, clock=clock)
+    wall = [datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)]
+    fired = []
+    trigger = TimeTrigger(
+        wheel,
+        {"type": "time", "operator": "after", "time": "13:00", "timezone": "UTC"},
+        fired.append,
+        now=lambda: wall[0],
+    )
+    assert trigger.arm().hour == 13
+    clock.now += 3600
+    wall[0] = datetime(2024, 1, 1, 13, 0, tzinfo=timezone.utc)
+    wheel.advance()
+    assert [f.hour for f in fired] == [13]
+    assert trigger.fire_at.day == 2
+    trigger.cancel()
+    assert wheel.stats()["pending"] == 0
+
+
+def test_wheel_driver_starts_once_per_loop_and_not_without_one():
+    wheel = TimingWheel(tick=0.01)
+    wheel.start()
+    assert wheel._task is None
+
+    async def main():
+        wheel.start()
+        task = wheel._task
+        wheel.start()
+        assert wheel._task is task and not task.done()
+        await wheel.close()
+        assert wheel._task is None and task.cancelled()
+
+    asyncio.run(main())
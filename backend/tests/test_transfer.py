@@ -0,0 +1,157 @@
+import asyncio
+import json
+
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.api import ndjson
+from app.core.config import settings
+from app.models import Event, Machine
+
+
+def _seed(db_session: Session):
+    machine = Machine(name="Exported", type="simulator", ip_address="10.5.0.1", port=80)
+    db_session.add(machine)
+    db_session.flush()
+    db_session.add_all([
+        Event(name="bound", trigger={"type": "manual"}, actions=[{"type": "wait"}], machine_id=machine.id),
+        Event(name="unbound", trigger={"type": "manual"}, actions=[]),
+    ])
+    db_session.commit()
+    return machine.id
+
+
+def _export(client: TestClient, headers: dict):
+    response = client.get(f"{settings.API_V1_STR}/export", headers=headers)
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.headers["content-type"].startswith(ndjson.MEDIA_TYPE)
+    return response.text
+
+
+def test_iter_lines_splits_across_chunks():
+    async def chunks():
+        for chunk in (b'{"a": 1}\n{"b"', b': 2}\n\n', b'{"c": 3}'):
+            yield chunk
+
+    async def collect():
+        return [item async for item in ndjson.iter_lines(chunks(), 64)]
+
+    assert asyncio.run(collect()) == [(1, b'{"a": 1}'), (2, b'{"b": 2}'), (4, b'{"c": 3}')]
+
+
+def test_export_nests_events_under_machines(
+    client: TestClient, db_session: Session, user_token_headers: dict, monkeypatch
+):
+    monkeypatch.setattr(settings, "TRANSFER_BATCH_SIZE", 1)
+    machine_id = _seed(db_session)
+
+    lines = [json.loads(line) for line in _export(client, user_token_headers).splitlines()]
+    assert [line["kind"] for line in lines] == ["machine", "event"]
+    assert lines[0]["id"] == machine_id
+    assert [e["name"] for e in lines[0]["events"]] == ["bound"]
+    assert lines[0]["events"][0]["actions"] == [{"type": "wait"}]
+    assert lines[1]["name"] == "unbound"
+    assert lines[1]["machine_id"] is None
+
+
+def test_import_round_trips_an_export(
+    client: TestClient, db_session: Session, user_token_headers: dict, monkeypatch
+):
+    monkeypatch.setattr(settings, "TRANSFER_BATCH_SIZE", 2)
+    machine_id = _seed(db_session)
+    backup = _export(client, user_token_headers)
+    db_session.query(Event).delete()
+    db_session.query(Machine).delete()
+    db_session.commit()
+
+    response = client.post(
+        f"{settings.API_V1_STR}/import",
+        content=backup + "not json\n",
+        headers={**user_token_headers, "Content-Type": ndjson.MEDIA_TYPE},
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    summary = response.json()
+    assert summary["created"] == {"machines": 1, "events": 2}
+    assert summary["error_count"] == 1
+    assert summary["errors"][0] == {"line": 3, "detail": "Invalid JSON"}
+
+    restored = db_session.get(Machine, machine_id)
+    assert [e.name for e in restored.events] == ["bound"]
+
+    # Importing the same backup again updates in place
+    response = client.post(
+        f"{settings.API_V1_STR}/import", content=backup, headers=user_token_headers
+    )
+    assert response.json()["updated"] == {"machines": 1, "events": 2}
+    assert db_session.query(Event).count() == 2
+
+
+def test_import_reports_invalid_records(client: TestClient, user_token_headers: dict):
+    body = "\n".join([
+        json.dumps({"kind": "machine", "name": "No port", "type": "simulator", "ip_address": "10.5.0.2"}),
+        json.dumps({"name": "Orphan", "trigger": {}, "actions": [], "machine_id": "missing"}),
+    ])
+    response = client.post(
+        f"{settings.API_V1_STR}/import", content=body, headers=user_token_headers
+    )
+    summary = response.json()
+    assert summary["created"] == {"machines": 0, "events": 0}
+    assert [e["line"] for e in summary["errors"]] == [1, 2]
+    assert summary["errors"][1]["detail"] == "Machine not found"
+
+
+def test_import_reports_duplicate_new_ids(client: TestClient, user_token_headers: dict):
+    machine_id, event_id = "5e0c2a8e-0000-4000-8000-000000000001", "5e0c2a8e-0000-4000-8000-000000000002"
+    body = "\n".join([
+        json.dumps({"kind": "machine", "id": machine_id, "name": "A", "type": "simulator", "ip_address": "10.5.0.3", "port": 80}),
+        json.dumps({"kind": "machine", "id": machine_id, "name": "B", "type": "simulator", "ip_address": "10.5.0.4", "port": 80}),
+        json.dumps({"kind": "event", "id": event_id, "name": "first", "trigger": {}, "actions": []}),
+        json.dumps({"kind": "event", "id": event_id, "name": "second", "trigger": {}, "actions": []}),
+    ])
+    response = client.post(
+        f"{settings.API_V1_STR}/import", content=body, headers=user_token_headers
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    summary = response.json()
+    assert summary["created"] == {"machines": 1, "events": 1}
+    assert [(e["line"], e["detail"]) for e in summary["errors"]] == [
+        (2, "Duplicate machine id in this import."),
+        (4, "Duplicate event id in this import."),
+    ]
+
+
+def test_import_updates_check_uniqueness(
+    client: TestClient, db_session: Session, user_token_headers: dict
+):
+    machines = [
+        Machine(name=f"M{i}", type="simulator", ip_address=f"10.5.1.{i}", port=80) for i in range(3)
+    ]
+    events = [Event(name=name, trigger={"type": "manual"}, actions=[]) for name in ("x", "y", "z")]
+    db_session.add_all(machines + events)
+    db_session.commit()
+
+    def machine(i, ip):
+        return {"kind": "machine", "id": machines[i].id, "name": f"M{i}", "type": "simulator", "ip_address": ip, "port": 80}
+
+    def event(i, name):
+        return {"kind": "event", "id": events[i].id, "name": name, "trigger": {}, "actions": []}
+
+    body = "\n".join(json.dumps(record) for record in [
+        machine(0, "10.5.1.1"),  # held by M1
+        machine(1, "10.5.1.1"),  # its own address
+        machine(2, "10.5.1.9"),
+        machine(0, "10.5.1.9"),  # taken by the line before
+        event(0, "y"),
+        event(1, "w"),
+        event(2, "w"),
+    ])
+    response = client.post(
+        f"{settings.API_V1_STR}/import", content=body, headers=user_token_headers
+    )
+    summary = response.json()
+    assert summary["updated"] == {"machines": 2, "events": 1}
+    assert [e["line"] for e in summary["errors"]] == [1, 4, 5, 7]
+    db_session.expire_all()
+    assert db_session.get(Machine, machines[0].id).ip_address == "10.5.1.0"
+    assert sorted(name for (name,) in db_session.query(Event.name)) == ["w", "x", "z"]
@@ -0,0 +1,181 @@
+import asyncio
+
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.engine import IngestPipeline, MachineState, TriggerDispatcher
+from app.engine.conditions import referenced_inputs
+from app.engine.timers import TimingWheel
+from app.engine.triggers import TriggerIndex, trigger_index
+from app.schemas import FrameBatch
+
+
+def _trigger(input_id, machine_id=None):
+    condition = {"type": "input", "inputId": input_id, "operator": "eq", "value": True}
+    if machine_id:
+        condition["machineId"] = machine_id
+    return condition
+
+
+def test_referenced_inputs_walks_the_tree():
+    tree = {
+        "type": "and",
+        "conditions": [
+            _trigger("button1"),
+            {"type": "not", "condition": _trigger("door", machine_id="m2")},
+            {
+                "type": "compare",
+                "left": {"type": "input", "inputId": "temp"},
+                "operator": "gt",
+                "right": {"type": "value", "value": 30},
+            },
+        ],
+    }
+    assert referenced_inputs(tree, "m1") == {("m1", "button1"), ("m2", "door"), ("m1", "temp")}
+    assert referenced_inputs({"type": "schedule", "schedule": "0 * * * *"}) == set()
+
+
+def test_index_lookups_and_incremental_updates():
+    index = TriggerIndex()
+    index.index_event("bound", _trigger("button1"), "m1")
+    index.index_event("any", _trigger("button1"), None)
+    index.index_event("cron", {"type": "schedule", "schedule": "0 * * * *"}, None)
+
+    assert index.events_for_input("m1", "button1") == {"bound", "any"}
+    assert index.events_for_input("m2", "button1") == {"any"}
+    assert index.events_for_input("m1", "other") == set()
+    assert index.events_for_type("schedule") == {"cron"}
+
+    index.index_event("bound", _trigger("door"), "m1")
+    assert index.events_for_input("m1", "button1") == {"any"}
+    index.index_event("any", _trigger("button1"), None, enabled=False)
+    index.discard("cron")
+    assert index.events_for_inputs([("m1", "button1"), ("m1", "door")]) == {"bound"}
+    assert index.stats()["types"] == {"input": 1}
+
+
+def test_index_follows_crud_writes(db_session: Session, test_machine_data):
+    index = TriggerIndex()
+    machine_id = crud.machine.create(db_session, obj_in=schemas.MachineCreate(**test_machine_data)).id
+    first = crud.event.create(
+        db_session,
+        obj_in=schemas.EventCreate(name="first", trigger=_trigger("button1"), actions=[], machine_id=machine_id),
+    ).id
+    index.sync(db_session)
+    assert index.events_for_input(machine_id, "button1") == {first}
+
+    # The module-level index is the one CRUD marks stale
+    index.mark_stale()
+    second = crud.event.create(
+        db_session,
+        obj_in=schemas.EventCreate(name="second", trigger=_trigger("button1"), actions=[]),
+    ).id
+    crud.event.toggle_by_id(db_session, id=first, enabled=False)
+    index.sync(db_session)
+    assert index.events_for_input(machine_id, "button1") == {second}
+
+    crud.event.toggle_by_id(db_session, id=first, enabled=True)
+    crud.machine.remove_by_id(db_session, id=machine_id)
+    index.mark_stale()
+    index.sync(db_session)
+    # The re-enabled event went with its machine
+    assert index.events_for_input(machine_id, "button1") == {second}
+    # Nothing changed since: no resync needed
+    assert not index.stale
+
+
+def test_event_commits_mark_the_index_stale(db_session: Session):
+    trigger_index.stale = False
+    crud.event.create(
+        db_session, obj_in=schemas.EventCreate(name="stale", trigger=_trigger("b"), actions=[])
+    )
+    assert trigger_index.stale
+
+
+class _Runtime:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, event, *, machine_id=None, machine_type=None, priority=0):
+        self.submitted.append((event.name, machine_id))
+
+
+def test_ingested_inputs_fire_only_their_triggers_on_rising_edges(
+    db_session: Session, test_machine_data, async_session_factory, monkeypatch
+):
+    monkeypatch.setattr(crud.machine.status_buffer, "session_factory", None)
+    machine_id = crud.machine.create(db_session, obj_in=schemas.MachineCreate(**test_machine_data)).id
+    for name, trigger, bound in (
+        ("button", _trigger("button1"), machine_id),
+        ("hot", {"type": "input", "inputId": "temp", "operator": "gt", "value": 30}, None),
+    ):
+        crud.event.create(
+            db_session,
+            obj_in=schemas.EventCreate(name=name, trigger=trigger, actions=[], machine_id=bound),
+        )
+    index, state, runtime = TriggerIndex(), MachineState(), _Runtime()
+    index.sync(db_session)
+    dispatcher = TriggerDispatcher(
+        index, state, runtime, lambda: Session(db_session.get_bind()), async_session_factory
+    )
+    pipeline = IngestPipeline(state, sinks=[dispatcher])
+
+    async def ingest(*frames):
+        pipeline.submit(FrameBatch.validate_python(frames))
+        await asyncio.gather(*dispatcher._tasks)
+
+    async def main():
+        await ingest((machine_id, 1.0, {"button1": True, "temp": 20}, {}))
+        await ingest((machine_id, 1.1, {"button1": True, "temp": 35}, {}))
+        await ingest((machine_id, 1.2, {"button1": False}, {}), (machine_id, 1.3, {"button1": True}, {}))
+        await ingest(("other", 1.4, {"temp": 40}, {}))
+        await ingest((machine_id, 1.5, {"level": 1}, {}))
+
+    asyncio.run(main())
+    # Held inputs don't refire, and only the button's last value in a batch counts
+    assert runtime.submitted == [("button", machine_id), ("hot", machine_id)]
+    # "other" isn't a known machine, so its trigger evaluated but didn't run
+    assert dispatcher.stats()["evaluated"] == 6
+    crud.machine.status_buffer.discard([machine_id, "other"])
+
+
+def test_time_triggers_fire_from_the_wheel_and_follow_the_index(
+    db_session: Session, test_machine_data, async_session_factory
+):
+    machine_id = crud.machine.create(db_session, obj_in=schemas.MachineCreate(**test_machine_data)).id
+    daily = {"type": "time", "operator": "after", "time": "08:30", "timezone": "UTC"}
+    event_id = crud.event.create(
+        db_session,
+        obj_in=schemas.EventCreate(name="daily", trigger=daily, actions=[], machine_id=machine_id),
+    ).id
+    clock = [1000.0]
+    wheel = TimingWheel(tick=1.0, slots=64, levels=4, clock=lambda: clock[0])
+    index, runtime = TriggerIndex(), _Runtime()
+    dispatcher = TriggerDispatcher(
+        index, MachineState(), runtime, lambda: Session(db_session.get_bind()),
+        async_session_factory, timers=wheel,
+    )
+
+    async def main():
+        dispatcher.start()
+        await dispatcher._sync_task
+        assert dispatcher.stats()["scheduled"] == 1
+        # At most a day away; the wheel's driver was started by arming
+        clock[0] += 86401
+        assert wheel.advance() == 1
+        await asyncio.gather(*dispatcher._tasks)
+        assert runtime.submitted == [("daily", machine_id)]
+        # Re-armed for the next day
+        assert wheel.stats()["pending"] == 1
+
+        # Disabling the event marks the index stale, and the resync disarms it
+        crud.event.toggle_by_id(db_session, id=event_id, enabled=False)
+        index.mark_stale()
+        await asyncio.sleep(0)
+        await dispatcher._sync_task
+        assert dispatcher.stats()["scheduled"] == 0
+        assert wheel.stats()["pending"] == 0
+        await dispatcher.close()
+        await wheel.stop()
+
+    asyncio.run(main())